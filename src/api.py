@@ -1,12 +1,18 @@
 """FastAPI backend for 10-K RAG Assistant."""
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import uvicorn
 
 from src.assistant import TenKAssistant, create_assistant
-from src.config import TARGET_COMPANIES
+from src.config import PEER_CONTEXT_MAX_TOKENS, TARGET_COMPANIES
+from src.document_processor import SECTION_MAPPINGS
+from src.index_watcher import get_index_watcher
+from src.input_parser import parse_in_worker, shutdown_parser_pool
+from src.rag_engine import shutdown_prefetch_pool
+from src.section_diff import diff_filing_section
 
 
 app = FastAPI(
@@ -27,6 +33,9 @@ app.add_middleware(
 # Session storage (in production, use Redis or database)
 sessions: Dict[str, TenKAssistant] = {}
 
+# Shared, hot-reloaded vector index used by every session
+index_watcher = get_index_watcher()
+
 
 class ChatRequest(BaseModel):
     """Chat request model."""
@@ -47,6 +56,7 @@ class GenerateRequest(BaseModel):
     ticker: str
     fiscal_year: str
     financial_data: Optional[Dict] = None
+    financial_text: Optional[str] = None  # Pasted statements (HTML, markdown or text), parsed server-side
     business_inputs: Optional[Dict] = None
 
 
@@ -62,6 +72,39 @@ class GenerateResponse(BaseModel):
     audit_log_path: Optional[str] = None
 
 
+class CompareRequest(BaseModel):
+    """Peer comparison request model."""
+    tickers: List[str]
+    topic: str  # e.g. "risk discussion" or "supply chain exposure"
+    section: Optional[str] = None  # Section key, e.g. "item_1a_risk_factors"
+    context_budget: int = PEER_CONTEXT_MAX_TOKENS
+
+
+class CompareResponse(BaseModel):
+    """Peer comparison response model."""
+    comparison: str
+    citations: Optional[list] = None
+    citations_by_company: Optional[Dict[str, List[int]]] = None
+    confidence: Optional[Dict] = None
+    missing_companies: Optional[List[str]] = None
+    audit_log_path: Optional[str] = None
+
+
+@app.on_event("startup")
+async def start_index_watcher():
+    """Load the published index and watch for new versions."""
+    index_watcher.snapshot()
+    index_watcher.start()
+
+
+@app.on_event("shutdown")
+async def stop_index_watcher():
+    """Stop the background index watcher, input parser workers and prefetch threads."""
+    index_watcher.stop()
+    shutdown_parser_pool()
+    shutdown_prefetch_pool()
+
+
 @app.get("/")
 async def root():
     """Root endpoint."""
@@ -72,7 +115,11 @@ async def root():
             "/companies - List available companies",
             "/chat - Interactive chat endpoint",
             "/generate - Direct generation endpoint",
+            "/compare - Peer comparison across companies",
+            "/diff/{ticker} - Section changes since the previous filing",
             "/reset - Reset conversation session",
+            "/index - Live vector index version",
+            "/sessions/{session_id}/routing - Chat turns answered without an LLM call",
         ]
     }
 
@@ -92,6 +139,15 @@ async def list_companies():
     }
 
 
+@app.get("/index")
+async def index_status():
+    """Report the live vector index version."""
+    return {
+        "live_version": index_watcher.version,
+        "poll_interval_seconds": index_watcher.poll_interval,
+    }
+
+
 @app.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     """Interactive chat endpoint."""
@@ -99,12 +155,13 @@ async def chat(request: ChatRequest):
     
     # Get or create session
     if session_id not in sessions:
-        sessions[session_id] = create_assistant()
+        sessions[session_id] = create_assistant(index_watcher)
     
     assistant = sessions[session_id]
     
     try:
-        response = assistant.process_message(request.message)
+        # Parsing pasted statements and LLM calls block; keep them off the event loop
+        response = await run_in_threadpool(assistant.process_message, request.message)
         return ChatResponse(
             response=response,
             state=assistant.context.state.value,
@@ -118,10 +175,10 @@ async def chat(request: ChatRequest):
 @app.post("/chat/start", response_model=ChatResponse)
 async def start_chat(session_id: str):
     """Start a new chat session."""
-    sessions[session_id] = create_assistant()
+    sessions[session_id] = create_assistant(index_watcher)
     assistant = sessions[session_id]
     
-    response = assistant._get_initial_response()
+    response = await run_in_threadpool(assistant._get_initial_response)
     assistant._add_message("assistant", response)
     
     return ChatResponse(
@@ -150,53 +207,122 @@ async def generate_direct(request: GenerateRequest):
             detail=f"Unknown ticker: {ticker}. Available: {list(TARGET_COMPANIES.keys())}"
         )
     
-    assistant = create_assistant()
+    assistant = create_assistant(index_watcher)
     assistant.context.ticker = ticker
     assistant.context.company_name = TARGET_COMPANIES[ticker]["name"]
     assistant.context.fiscal_year = request.fiscal_year
     
+    try:
+        return await run_in_threadpool(_generate, assistant, ticker, request)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _generate(assistant: TenKAssistant, ticker: str, request: GenerateRequest) -> GenerateResponse:
+    """Run the blocking generation steps of /generate (in a worker thread)."""
     response = GenerateResponse()
     
-    try:
-        # Generate Business section with citations and confidence
-        business_text, business_meta = assistant.rag_engine.generate_business_section(
+    financial_data = dict(request.financial_data or {})
+    if request.financial_text:
+        financial_data.update(parse_in_worker(request.financial_text))
+    
+    # Generate Business section with citations and confidence
+    business_text, business_meta = assistant.rag_engine.generate_business_section(
+        ticker,
+        request.fiscal_year,
+        include_citations=True,
+    )
+    response.business_section = business_text
+    response.citations = business_meta.get("citations", [])
+    response.confidence = business_meta.get("confidence", {})
+    
+    # Generate MD&A if financial data provided
+    if financial_data:
+        mda_text, mda_meta = assistant.rag_engine.generate_mda_section(
             ticker,
             request.fiscal_year,
+            financial_data,
             include_citations=True,
+            include_yoy_analysis=True,
+        )
+        response.mda_section = mda_text
+        response.citations = mda_meta.get("citations", [])
+        response.confidence = mda_meta.get("confidence", {})
+        response.yoy_analysis = mda_meta.get("yoy_analysis", [])
+    else:
+        # Return questions for missing data
+        response.missing_data_questions = assistant.rag_engine.ask_clarifying_questions(
+            ticker,
+            request.fiscal_year,
         )
-        response.business_section = business_text
-        response.citations = business_meta.get("citations", [])
-        response.confidence = business_meta.get("confidence", {})
-        
-        # Generate MD&A if financial data provided
-        if request.financial_data:
-            mda_text, mda_meta = assistant.rag_engine.generate_mda_section(
-                ticker,
-                request.fiscal_year,
-                request.financial_data,
-                include_citations=True,
-                include_yoy_analysis=True,
-            )
-            response.mda_section = mda_text
-            response.citations = mda_meta.get("citations", [])
-            response.confidence = mda_meta.get("confidence", {})
-            response.yoy_analysis = mda_meta.get("yoy_analysis", [])
-        else:
-            # Return questions for missing data
-            response.missing_data_questions = assistant.rag_engine.ask_clarifying_questions(
-                ticker,
-                request.fiscal_year,
-            )
-        
-        # Save and return audit log path
-        response.audit_log_path = assistant.rag_engine.save_audit_log()
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    
+    # Save and return audit log path
+    response.audit_log_path = assistant.rag_engine.save_audit_log()
     
     return response
 
 
+@app.post("/compare", response_model=CompareResponse)
+async def compare_peers(request: CompareRequest):
+    """Compare a topic across companies in one draft, with per-company citations."""
+    tickers = list(dict.fromkeys(ticker.upper() for ticker in request.tickers))
+    unknown = [ticker for ticker in tickers if ticker not in TARGET_COMPANIES]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown tickers: {unknown}. Available: {list(TARGET_COMPANIES.keys())}"
+        )
+    if len(tickers) < 2:
+        raise HTTPException(status_code=400, detail="Provide at least two tickers to compare")
+    if request.section and request.section not in SECTION_MAPPINGS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown section: {request.section}. Available: {list(SECTION_MAPPINGS.keys())}"
+        )
+    
+    assistant = create_assistant(index_watcher)
+    
+    try:
+        text, metadata = await run_in_threadpool(
+            assistant.rag_engine.generate_peer_comparison,
+            tickers,
+            request.topic,
+            request.section,
+            True,
+            request.context_budget,
+        )
+        return CompareResponse(
+            comparison=text,
+            citations=metadata.get("citations", []),
+            citations_by_company=metadata.get("citations_by_company", {}),
+            confidence=metadata.get("confidence", {}),
+            missing_companies=metadata.get("missing_companies", []),
+            audit_log_path=assistant.rag_engine.save_audit_log(),
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/diff/{ticker}")
+async def diff_section(
+    ticker: str,
+    section: str = "item_1a_risk_factors",
+    old_year: Optional[str] = None,
+    new_year: Optional[str] = None,
+):
+    """Paragraph-level changes of a section between two fiscal years, with a compact summary."""
+    ticker = ticker.upper()
+    if section not in SECTION_MAPPINGS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown section: {section}. Available: {list(SECTION_MAPPINGS.keys())}"
+        )
+    result = await run_in_threadpool(diff_filing_section, ticker, section, old_year, new_year)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Need two stored filings of {ticker} to compare")
+    return {**result.to_dict(), "summary": result.change_summary()}
+
+
 @app.get("/sessions/{session_id}/audit")
 async def get_audit_log(session_id: str):
     """Get audit log summary for a session."""
@@ -206,6 +332,15 @@ async def get_audit_log(session_id: str):
     return sessions[session_id].rag_engine.get_audit_summary()
 
 
+@app.get("/sessions/{session_id}/routing")
+async def get_routing_stats(session_id: str):
+    """Share of a session's free-form chat turns the local intent router answered."""
+    if session_id not in sessions:
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    return sessions[session_id].intent_router.stats.to_dict()
+
+
 @app.get("/sessions/{session_id}/content")
 async def get_generated_content(session_id: str):
     """Get all generated content for a session."""
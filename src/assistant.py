@@ -1,6 +1,7 @@
 """Interactive 10-K Assistant with conversation management."""
 import re
-from typing import Dict, List, Optional, Any
+import time
+from typing import Dict, List, Optional, Any, Tuple
 from enum import Enum
 from dataclasses import dataclass, field
 from langchain_openai import ChatOpenAI
@@ -8,6 +9,9 @@ from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
 
 from src.config import OPENAI_API_KEY, LLM_MODEL, TARGET_COMPANIES
 from src.rag_engine import RAGEngine
+from src.index_watcher import IndexWatcher
+from src.input_parser import parse_in_worker
+from src.intent_router import IntentRouter, find_company
 
 
 class ConversationState(Enum):
@@ -33,6 +37,11 @@ class ConversationContext:
     operational_inputs: Dict[str, Any] = field(default_factory=dict)
     generated_sections: Dict[str, str] = field(default_factory=dict)
     messages: List[Dict[str, str]] = field(default_factory=list)
+    pending_filing: Optional[Tuple[str, Optional[str]]] = None  # (ticker, year) awaiting confirmation
+
+
+_CONFIRM_RE = re.compile(r"^\s*(?:yes|y|yep|yeah|sure|ok(?:ay)?|confirm(?:ed)?|go ahead|proceed)\b", re.I)
+_DECLINE_RE = re.compile(r"^\s*(?:no|n|nope|cancel|stay|keep(?: working)?|never ?mind)\b", re.I)
 
 
 class TenKAssistant:
@@ -57,32 +66,28 @@ Available companies for 10-K generation:
 NVDA (NVIDIA), MSFT (Microsoft), KO (Coca-Cola), NKE (Nike), 
 AMZN (Amazon), DASH (DoorDash), TJX (TJX Companies), DRI (Darden Restaurants)"""
 
-    def __init__(self):
+    def __init__(self, index_watcher: Optional[IndexWatcher] = None):
         self.llm = ChatOpenAI(
             model=LLM_MODEL,
             openai_api_key=OPENAI_API_KEY,
             temperature=0.7,
         )
-        self.rag_engine = RAGEngine()
+        self.rag_engine = RAGEngine(index_watcher=index_watcher)
         self.context = ConversationContext()
+        self.intent_router = IntentRouter()
 
     def reset(self):
         """Reset the conversation context."""
         self.context = ConversationContext()
+        self.rag_engine.clear_session()
 
     def _add_message(self, role: str, content: str):
         """Add a message to conversation history."""
         self.context.messages.append({"role": role, "content": content})
 
     def _parse_ticker(self, text: str) -> Optional[str]:
-        """Extract ticker from user input."""
-        text_upper = text.upper()
-        for ticker in TARGET_COMPANIES:
-            if ticker in text_upper:
-                return ticker
-            if TARGET_COMPANIES[ticker]["name"].upper() in text_upper:
-                return ticker
-        return None
+        """Extract ticker from user input (a ticker or company name as a whole word)."""
+        return find_company(text)
 
     def _parse_year(self, text: str) -> Optional[str]:
         """Extract fiscal year from user input."""
@@ -92,89 +97,9 @@ AMZN (Amazon), DASH (DoorDash), TJX (TJX Companies), DRI (Darden Restaurants)"""
             return match.group()
         return None
 
-    def _parse_html_table(self, html: str) -> Dict[str, Any]:
-        """Parse HTML table to extract financial data."""
-        from bs4 import BeautifulSoup
-        data = {}
-        
-        soup = BeautifulSoup(html, 'html.parser')
-        tables = soup.find_all('table')
-        
-        for table in tables:
-            rows = table.find_all('tr')
-            headers = []
-            
-            for row in rows:
-                cells = row.find_all(['td', 'th'])
-                cell_texts = [c.get_text(strip=True) for c in cells]
-                
-                if not headers:
-                    # First row with content becomes headers
-                    if any(cell_texts):
-                        headers = cell_texts
-                elif len(cell_texts) >= 2:
-                    metric = cell_texts[0]
-                    values = cell_texts[1:]
-                    if metric and values[0]:
-                        data[metric] = values[0]
-                        if len(values) >= 2 and values[1]:
-                            data[f"{metric} (Prior Year)"] = values[1]
-        
-        return data
-
     def _parse_financial_data(self, text: str) -> Dict[str, Any]:
         """Parse financial data from user input (supports Markdown, HTML, plain text)."""
-        data = {}
-        
-        # Try to parse HTML table first
-        if '<table' in text.lower() or '<tr' in text.lower():
-            html_data = self._parse_html_table(text)
-            data.update(html_data)
-        
-        # Try to parse markdown table
-        if '|' in text:
-            lines = text.strip().split('\n')
-            headers = []
-            for line in lines:
-                if '|' in line and '---' not in line:
-                    cells = [c.strip() for c in line.split('|') if c.strip()]
-                    if not headers:
-                        headers = cells
-                    elif len(cells) >= 2:
-                        metric = cells[0]
-                        values = cells[1:]
-                        if len(values) >= 1:
-                            data[metric] = values[0]
-                        if len(values) >= 2:
-                            data[f"{metric} (Prior Year)"] = values[1]
-        
-        # Parse key-value patterns (plain text)
-        patterns = [
-            r'(?i)(revenue|sales)[\s:]*\$?([\d,.]+)\s*(billion|million|B|M)?',
-            r'(?i)(growth|increase|decrease)[\s:]*(-?[\d,.]+)%?',
-            r'(?i)(operating income|net income|EBITDA)[\s:]*\$?([\d,.]+)\s*(billion|million|B|M)?',
-            r'(?i)(cash flow|FCF|free cash flow)[\s:]*\$?([\d,.]+)\s*(billion|million|B|M)?',
-            r'(?i)(margin)[\s:]*(-?[\d,.]+)%',
-            r'(?i)(segment|division)[\s:]+([^\n,]+)',
-            r'(?i)(launched|discontinued|acquired|partnered)[\s:]+([^\n]+)',
-        ]
-        
-        for pattern in patterns:
-            matches = re.findall(pattern, text)
-            for match in matches:
-                key = match[0].strip()
-                value = match[1].strip()
-                unit = match[2].strip() if len(match) > 2 else ""
-                if unit:
-                    value = f"{value} {unit}"
-                if key not in data:
-                    data[key] = value
-        
-        # Also store raw input for LLM to process
-        if text.strip():
-            data["raw_input"] = text.strip()
-        
-        return data
+        return parse_in_worker(text)
 
     def _get_initial_response(self) -> str:
         """Generate initial greeting."""
@@ -231,6 +156,12 @@ What fiscal year would you like to generate the filing for?
         """Process user message and generate response."""
         self._add_message("user", user_message)
         
+        # Reply to a request to switch away from existing drafts
+        response = self._confirm_switch(user_message) if self.context.pending_filing else None
+        if response is not None:
+            self._add_message("assistant", response)
+            return response
+        
         # State machine logic
         if self.context.state == ConversationState.INITIAL:
             # Try to extract company and year from initial message
@@ -246,6 +177,7 @@ What fiscal year would you like to generate the filing for?
                     self.context.state = ConversationState.GENERATING_BUSINESS
                     response = self._generate_and_ask_financial()
                 else:
+                    self.rag_engine.prefetch(ticker)
                     self.context.state = ConversationState.AWAITING_YEAR
                     response = self._ask_for_year()
             else:
@@ -257,6 +189,7 @@ What fiscal year would you like to generate the filing for?
             if ticker:
                 self.context.ticker = ticker
                 self.context.company_name = TARGET_COMPANIES[ticker]["name"]
+                self.rag_engine.prefetch(ticker)
                 self.context.state = ConversationState.AWAITING_YEAR
                 response = self._ask_for_year()
             else:
@@ -274,10 +207,15 @@ What fiscal year would you like to generate the filing for?
         elif self.context.state == ConversationState.AWAITING_FINANCIAL_DATA:
             # Parse financial data from user input
             parsed_data = self._parse_financial_data(user_message)
-            self.context.financial_data.update(parsed_data)
-            
-            # Generate MD&A with provided data
-            response = self._generate_mda_section()
+            has_figures = any(key != "raw_input" for key in parsed_data)
+            if not has_figures and self.intent_router.classify(user_message).name not in ("chat", "revise"):
+                # A routine request (sources, switch company, ...) rather than data
+                response = self._handle_general_query(user_message)
+            else:
+                self.context.financial_data.update(parsed_data)
+                
+                # Generate MD&A with provided data
+                response = self._generate_mda_section()
         
         else:
             # Handle follow-up questions or new requests
@@ -317,6 +255,9 @@ Let me first retrieve information from prior filings and generate the Business s
         except Exception as e:
             response += f"*[Note: Unable to generate Business section from prior filings. Error: {str(e)}. Please ensure the 10-K filing has been downloaded and indexed.]*"
         
+        # Retrieve MD&A context while the user gathers the financial data
+        self.rag_engine.prefetch(self.context.ticker, self.context.fiscal_year, sections=("mda",))
+        
         response += """
 
 ---
@@ -382,34 +323,165 @@ Please let me know how I can help further."""
         self.context.state = ConversationState.COMPLETE
         return response
 
+    def _revise_mda_section(self, parsed_data: Dict[str, Any], request: str) -> str:
+        """Revise the MD&A draft with new data, regenerating only the subsections it affects."""
+        previous = dict(self.context.financial_data)
+        changes = {key: value for key, value in parsed_data.items() if previous.get(key) != value}
+        self.context.financial_data.update(parsed_data)
+        if "mda" not in self.context.generated_sections:
+            return self._generate_mda_section()
+        if not changes:
+            return "Those figures match the ones already in the MD&A draft, so there are no changes to make."
+        
+        try:
+            mda_section, metadata = self.rag_engine.revise_mda_section(
+                self.context.ticker,
+                self.context.fiscal_year,
+                changes,
+                previous,
+                request=request,
+            )
+        except Exception as e:
+            return f"*[Error revising MD&A: {str(e)}]*"
+        self.context.generated_sections["mda"] = mda_section
+        self.context.generated_sections["mda_metadata"] = metadata
+        
+        revised = metadata.get("revised_subsections")
+        if revised:
+            response = f"I've updated the following parts of the MD&A with your data: **{', '.join(revised)}**. The rest of the draft is unchanged."
+        else:
+            response = "I've regenerated the MD&A section with your data."
+        response += """
+
+---
+
+## Item 7. Management's Discussion and Analysis of Financial Condition and Results of Operations (Revised Draft)
+
+"""
+        response += mda_section
+        if metadata.get("yoy_table"):
+            response += metadata["yoy_table"]
+        response += self.rag_engine.get_citation_references()
+        return response
+
+    def _revise_business_section(self, request: str) -> str:
+        """Revise the Business draft as requested, regenerating only the subsections it affects."""
+        try:
+            business_section = self.rag_engine.update_business_section(
+                self.context.ticker,
+                self.context.fiscal_year,
+                self.context.generated_sections["business"],
+                {"Update": request},
+            )
+        except Exception as e:
+            return f"*[Error revising Business section: {str(e)}]*"
+        self.context.generated_sections["business"] = business_section
+        return f"""I've updated the Business section as requested.
+
+---
+
+## Item 1. Business (Revised Draft)
+
+{business_section}"""
+
+    def _start_filing(self, ticker: str, year: Optional[str]) -> str:
+        """Start over on a company's filing: generate right away if the year is known, else ask for it."""
+        self.reset()
+        self.context.ticker = ticker
+        self.context.company_name = TARGET_COMPANIES[ticker]["name"]
+        if year:
+            self.context.fiscal_year = year
+            self.context.state = ConversationState.GENERATING_BUSINESS
+            return self._generate_and_ask_financial()
+        self.rag_engine.prefetch(ticker)
+        self.context.state = ConversationState.AWAITING_YEAR
+        return self._ask_for_year()
+
+    def _request_switch(self, ticker: str, year: Optional[str]) -> str:
+        """Start on another filing, asking first if that would discard drafts."""
+        if not self.context.generated_sections:
+            return self._start_filing(ticker, year)
+        self.context.pending_filing = (ticker, year)
+        target = TARGET_COMPANIES[ticker]["name"] + (f" (FY{year})" if year else "")
+        current = f"{self.context.company_name} FY{self.context.fiscal_year}"
+        return (
+            f"Switching to {target} will discard the current drafts for {current}. "
+            "Reply **yes** to switch, or **no** to keep working on them."
+        )
+
+    def _confirm_switch(self, user_message: str) -> Optional[str]:
+        """Act on the reply to _request_switch; None if the turn is something else, handled as usual."""
+        ticker, year = self.context.pending_filing
+        self.context.pending_filing = None
+        if _CONFIRM_RE.match(user_message):
+            return self._start_filing(ticker, year)
+        if _DECLINE_RE.match(user_message):
+            return f"Okay, continuing with {self.context.company_name} FY{self.context.fiscal_year}."
+        return None
+
+    def _answer_locally(self, intent: str) -> Optional[str]:
+        """Answer a routine turn from the session's state, or None if it needs more than that."""
+        sections = self.context.generated_sections
+        if intent == "sources":
+            references = self.rag_engine.get_citation_references().strip().strip("-").strip()
+            return references or "No sources have been cited yet. Sources appear once a section is drafted."
+        if intent == "confidence":
+            indicator = self.rag_engine.get_confidence_indicator().strip()
+            return indicator or "There is no draft to assess yet. A confidence assessment comes with each drafted section."
+        if intent == "show_business":
+            if "business" not in sections:
+                return "The Business section hasn't been drafted yet."
+            return f"## Item 1. Business (Draft)\n\n{sections['business']}"
+        if intent == "show_mda":
+            if "mda" not in sections:
+                return "The MD&A section hasn't been drafted yet."
+            return f"## Item 7. Management's Discussion and Analysis of Financial Condition and Results of Operations (Draft)\n\n{sections['mda']}"
+        if intent == "audit":
+            return f"Audit log saved to: `{self.rag_engine.save_audit_log()}`"
+        if intent == "help":
+            return self._get_initial_response()
+        if intent == "reset":
+            self.reset()
+            return self._get_initial_response()
+        return None
+
     def _handle_general_query(self, query: str) -> str:
-        """Handle general queries or follow-up requests."""
+        """Handle general queries or follow-up requests.
+
+        Routine turns (sources, confidence, showing drafts, switching
+        company or year, ...) are recognized by the local intent router and
+        answered without an LLM call; the rest go to the chat model.
+        """
+        started = time.perf_counter()
         query_lower = query.lower()
+        intent = self.intent_router.classify(query)
         
         # Check if starting new generation
-        if any(word in query_lower for word in ["generate", "create", "draft", "new"]):
+        if intent.name == "switch" or any(word in query_lower for word in ["generate", "create", "draft", "new"]):
             ticker = self._parse_ticker(query)
+            year = self._parse_year(query)
+            if intent.name == "switch" and not ticker and year:
+                ticker = self.context.ticker
             if ticker:
-                self.reset()
-                self.context.ticker = ticker
-                self.context.company_name = TARGET_COMPANIES[ticker]["name"]
-                year = self._parse_year(query)
-                if year:
-                    self.context.fiscal_year = year
-                    self.context.state = ConversationState.GENERATING_BUSINESS
-                    return self._generate_and_ask_financial()
-                else:
-                    self.context.state = ConversationState.AWAITING_YEAR
-                    return self._ask_for_year()
+                self.intent_router.stats.record("switch", local=not year, seconds=time.perf_counter() - started)
+                return self._request_switch(ticker, year)
+        
+        response = self._answer_locally(intent.name)
+        if response is not None:
+            self.intent_router.stats.record(intent.name, local=True, seconds=time.perf_counter() - started)
+            return response
         
         # Check if providing more data
         if self.context.state == ConversationState.COMPLETE:
             if any(word in query_lower for word in ["revise", "update", "change", "add"]):
+                if "business" in query_lower and "business" in self.context.generated_sections:
+                    self.intent_router.stats.record("revise", local=False)
+                    return self._revise_business_section(query)
                 # Parse any additional data
                 parsed_data = self._parse_financial_data(query)
                 if parsed_data:
-                    self.context.financial_data.update(parsed_data)
-                    return self._generate_mda_section()
+                    self.intent_router.stats.record("revise", local=False)
+                    return self._revise_mda_section(parsed_data, query)
         
         # Default: conversational response
         messages = [
@@ -423,6 +495,7 @@ User's message: {query}
 
 Respond helpfully as a legal assistant would.""")
         ]
+        self.intent_router.stats.record(intent.name, local=False)
         
         response = self.llm.invoke(messages)
         return response.content
@@ -432,7 +505,7 @@ Respond helpfully as a legal assistant would.""")
         return self.context.generated_sections
 
 
-def create_assistant() -> TenKAssistant:
+def create_assistant(index_watcher: Optional[IndexWatcher] = None) -> TenKAssistant:
     """Factory function to create assistant instance."""
-    return TenKAssistant()
+    return TenKAssistant(index_watcher=index_watcher)
 
@@ -101,6 +101,79 @@ class AuditLogger:
             },
         )
 
+    def log_input_compression(
+        self,
+        section: str,
+        tokens_before: int,
+        tokens_after: int,
+        budget: int,
+        dropped: List[str],
+        ticker: Optional[str] = None,
+        fiscal_year: Optional[str] = None,
+    ) -> AuditEntry:
+        """Log user input left out of a prompt to stay within its token budget."""
+        return self._create_entry(
+            event_type="input_compression",
+            content={
+                "section": section,
+                "dropped": dropped,
+            },
+            ticker=ticker,
+            fiscal_year=fiscal_year,
+            metadata={
+                "tokens_before": tokens_before,
+                "tokens_after": tokens_after,
+                "budget": budget,
+                "dropped_count": len(dropped),
+            },
+        )
+
+    def log_claim_verification(
+        self,
+        section: str,
+        checked: int,
+        unsupported: List[Dict[str, Any]],
+        ticker: Optional[str] = None,
+        fiscal_year: Optional[str] = None,
+    ) -> AuditEntry:
+        """Log generated sentences their cited sources don't support."""
+        return self._create_entry(
+            event_type="claim_verification",
+            content={
+                "section": section,
+                "unsupported": unsupported,
+            },
+            ticker=ticker,
+            fiscal_year=fiscal_year,
+            metadata={
+                "sentences_checked": checked,
+                "unsupported_count": len(unsupported),
+            },
+        )
+
+    def log_fact_check(
+        self,
+        section: str,
+        checked: int,
+        unmatched: List[Dict[str, Any]],
+        ticker: Optional[str] = None,
+        fiscal_year: Optional[str] = None,
+    ) -> AuditEntry:
+        """Log generated figures found in neither the provided data nor the sources."""
+        return self._create_entry(
+            event_type="fact_check",
+            content={
+                "section": section,
+                "unmatched": unmatched,
+            },
+            ticker=ticker,
+            fiscal_year=fiscal_year,
+            metadata={
+                "figures_checked": checked,
+                "unmatched_count": len(unmatched),
+            },
+        )
+
     def log_generation(
         self,
         section: str,  # "business" or "mda"
@@ -109,8 +182,10 @@ class AuditLogger:
         confidence_score: Optional[Dict[str, Any]] = None,
         ticker: Optional[str] = None,
         fiscal_year: Optional[str] = None,
+        index_version: Optional[str] = None,
+        metrics: Optional[Dict[str, Any]] = None,
     ) -> AuditEntry:
-        """Log a generated section."""
+        """Log a generated section (metrics: prompt token counts, stage timings)."""
         return self._create_entry(
             event_type="generation",
             content={
@@ -124,6 +199,8 @@ class AuditLogger:
                 "sources_count": len(sources_used),
                 "sources": sources_used,
                 "confidence": confidence_score,
+                "index_version": index_version,
+                "metrics": metrics or {},
             },
         )
 
@@ -210,6 +287,8 @@ class AuditLogger:
             elif entry.event_type == "generation":
                 report += f"**Section:** {entry.content.get('section', 'N/A')}\n"
                 report += f"**Text Length:** {entry.content.get('text_length', 0)} characters\n"
+                if entry.metadata.get("index_version"):
+                    report += f"**Index Version:** {entry.metadata['index_version']}\n"
                 if entry.metadata.get("confidence"):
                     conf = entry.metadata["confidence"]
                     report += f"**Confidence:** {conf.get('overall', 'N/A')}\n"
@@ -0,0 +1,179 @@
+"""Throughput benchmarks for the performance-sensitive pipeline stages."""
+import statistics
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from src.document_processor import SECTION_MAPPINGS, StructuredChunker, _build_text_splitter, clean_text
+from src.filing_store import list_filings, load_filing_file
+from src.input_parser import parse_financial_input
+from src.tokens import count_tokens_batch
+from src.yoy_analysis import MetricPanel, YoYAnalyzer
+
+
+def _load_bundled_sections(tickers: Optional[List[str]] = None) -> List[str]:
+    """Load the raw indexed sections of the bundled filings."""
+    sections = []
+    for _, _, path in list_filings(tickers):
+        filing = load_filing_file(path)
+        for section_key in SECTION_MAPPINGS:
+            content = filing.get("sections", {}).get(section_key, "")
+            if content and len(content) >= 100:
+                sections.append(content)
+    return sections
+
+
+def _token_stats(chunks: List[str]) -> Dict[str, Any]:
+    """Summarize chunk token sizes (computed outside the timed region)."""
+    counts = count_tokens_batch(chunks)
+    if not counts:
+        return {"mean_tokens": 0, "stdev_tokens": 0, "max_tokens": 0}
+    return {
+        "mean_tokens": round(statistics.mean(counts), 1),
+        "stdev_tokens": round(statistics.pstdev(counts), 1),
+        "max_tokens": max(counts),
+    }
+
+
+def benchmark_chunkers(tickers: Optional[List[str]] = None, repeat: int = 3) -> List[Dict[str, Any]]:
+    """Compare the recursive splitter against the structured chunker."""
+    sections = _load_bundled_sections(tickers)
+    total_mb = sum(len(s.encode("utf-8")) for s in sections) / 1e6
+    splitter = _build_text_splitter()
+    chunker = StructuredChunker()
+
+    def run_recursive() -> List[str]:
+        chunks = []
+        for section in sections:
+            chunks.extend(splitter.split_text(clean_text(section)))
+        return chunks
+
+    def run_structured() -> List[str]:
+        chunks = []
+        for section in sections:
+            chunks.extend(c.text for c in chunker.split(section))
+        return chunks
+
+    results = []
+    for name, run in [("recursive", run_recursive), ("structured", run_structured)]:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            chunks = run()
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        results.append({
+            "chunker": name,
+            "sections": len(sections),
+            "input_mb": round(total_mb, 2),
+            "chunks": len(chunks),
+            "seconds": round(best, 3),
+            "mb_per_second": round(total_mb / best, 2) if best else None,
+            **_token_stats(chunks),
+        })
+    return results
+
+
+def benchmark_yoy(
+    metrics: int = 100, periods: int = 10, companies: int = 50, repeat: int = 3
+) -> List[Dict[str, Any]]:
+    """Compare per-pair YoYAnalyzer.analyze_data calls against one MetricPanel analysis.
+
+    Both start from the same formatted value strings (e.g. "$12.34B") for
+    metrics x companies series over consecutive fiscal years.
+    """
+    rng = np.random.default_rng(0)
+    growth = rng.normal(1.05, 0.1, size=(metrics, periods, companies))
+    values = rng.uniform(1, 100, size=(metrics, 1, companies)) * np.cumprod(growth, axis=1)
+    names = [f"Metric {m}" for m in range(metrics)]
+    years = [str(2015 + p) for p in range(periods)]
+    text = np.char.add(np.char.add("$", np.char.mod("%.2f", values)), "B")
+    records = [
+        (f"CO{c}", names[m], years[p], text[m, p, c])
+        for c in range(companies) for m in range(metrics) for p in range(periods)
+    ]
+
+    def run_loop() -> int:
+        analyzer = YoYAnalyzer()
+        results = 0
+        for c in range(companies):
+            for p in range(1, periods):
+                data = {}
+                for m, name in enumerate(names):
+                    data[name] = text[m, p, c]
+                    data[f"{name} (Prior Year)"] = text[m, p - 1, c]
+                results += len(analyzer.analyze_data(data))
+        return results
+
+    def run_panel() -> int:
+        analysis = MetricPanel.from_records(records).analyze()
+        return int(np.count_nonzero(~np.isnan(analysis.change_percent)))
+
+    results = []
+    for name, run in [("loop", run_loop), ("panel", run_panel)]:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            changes = run()
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        results.append({
+            "analyzer": name,
+            "series": metrics * companies,
+            "periods": periods,
+            "yoy_changes": changes,
+            "seconds": round(best, 3),
+            "changes_per_second": round(changes / best) if best else None,
+        })
+    return results
+
+
+def _synthetic_statement(kind: str, rows: int) -> str:
+    """A pasted statement export with `rows` line items (html, markdown or text)."""
+    rng = np.random.default_rng(0)
+    values = rng.uniform(1, 999, size=(rows, 2))
+    if kind == "html":
+        body = "".join(
+            f"<tr><td><span>Line item {i}</span></td><td>$&nbsp;{a:,.1f}</td><td>$&nbsp;{b:,.1f}</td></tr>\n"
+            for i, (a, b) in enumerate(values)
+        )
+        return f"<html><body><p>Consolidated statements</p><table><tr><th></th><th>2024</th><th>2023</th></tr>\n{body}</table></body></html>"
+    if kind == "markdown":
+        body = "".join(f"| Line item {i} | ${a:,.1f}M | ${b:,.1f}M |\n" for i, (a, b) in enumerate(values))
+        return "| Metric | 2024 | 2023 |\n|---|---|---|\n" + body
+    return "".join(
+        f"Segment {i}: revenue ${a:,.1f} million, operating income ${b:,.1f}M, margin {b / a:.1%}\n"
+        for i, (a, b) in enumerate(values)
+    )
+
+
+def benchmark_input_parser(rows: List[int] = (2_000, 20_000, 80_000), repeat: int = 3) -> List[Dict[str, Any]]:
+    """Throughput of the pasted-input parser on large synthetic statement exports."""
+    results = []
+    for kind in ("html", "markdown", "text"):
+        for count in rows:
+            text = _synthetic_statement(kind, count)
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                data = parse_financial_input(text)
+                timings.append(time.perf_counter() - start)
+            best = min(timings)
+            size_mb = len(text.encode("utf-8")) / 1e6
+            results.append({
+                "format": kind,
+                "rows": count,
+                "input_mb": round(size_mb, 2),
+                "fields": len(data) - ("raw_input" in data),
+                "seconds": round(best, 3),
+                "mb_per_second": round(size_mb / best, 2) if best else None,
+            })
+    return results
+
+
+BENCHMARKS: Dict[str, Callable[[], List[Dict[str, Any]]]] = {
+    "chunker": benchmark_chunkers,
+    "yoy": benchmark_yoy,
+    "input-parser": benchmark_input_parser,
+}
@@ -1,8 +1,10 @@
 """Source citations and confidence indicators for generated content."""
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass
 from langchain_core.documents import Document
 
+from src.config import RETRIEVAL_STRONG_SCORE
+
 
 @dataclass
 class Citation:
@@ -14,6 +16,7 @@ class Citation:
     chunk_index: int
     relevance_score: float
     excerpt: str
+    fiscal_year: str = ""
 
 
 @dataclass
@@ -54,23 +57,33 @@ class CitationManager:
             chunk_index=meta.get("chunk_index", 0),
             relevance_score=relevance_score,
             excerpt=document.page_content[:200] + "..." if len(document.page_content) > 200 else document.page_content,
+            fiscal_year=str(meta.get("fiscal_year") or ""),
         )
         self.citations.append(citation)
         return self.citation_counter
 
-    def format_citations_for_prompt(self, documents: List[Document]) -> Tuple[str, Dict[int, Citation]]:
-        """Format documents with citation markers for LLM prompt."""
+    def format_citations_for_prompt(
+        self,
+        documents: List[Document],
+        contents: Optional[List[str]] = None,
+    ) -> Tuple[str, Dict[int, Citation]]:
+        """Format documents with citation markers for LLM prompt.
+
+        contents optionally replaces each document's text in the prompt (e.g.
+        compressed to its relevant sentences); citations keep the original.
+        """
         self.reset()
         citation_map = {}
         formatted_parts = []
         
-        for doc in documents:
-            cite_id = self.add_citation(doc)
+        for i, doc in enumerate(documents):
+            cite_id = self.add_citation(doc, doc.metadata.get("relevance_score", 0.0))
             citation_map[cite_id] = self.citations[-1]
             
             meta = doc.metadata
-            header = f"[Source {cite_id}] ({meta.get('company_name', 'Unknown')} - {meta.get('section', 'Unknown')} - Filed: {meta.get('filing_date', 'Unknown')})"
-            formatted_parts.append(f"{header}\n{doc.page_content}")
+            header = f"[Source {cite_id}] ({meta.get('company_name', 'Unknown')} - {meta.get('section', 'Unknown')} - FY{meta.get('fiscal_year') or '?'} - Filed: {meta.get('filing_date', 'Unknown')})"
+            text = contents[i] if contents is not None else doc.page_content
+            formatted_parts.append(f"{header}\n{text}")
         
         return "\n\n---\n\n".join(formatted_parts), citation_map
 
@@ -92,6 +105,7 @@ class CitationManager:
                 "company": c.company,
                 "section": c.section,
                 "filing_date": c.filing_date,
+                "fiscal_year": c.fiscal_year,
                 "chunk_index": c.chunk_index,
                 "relevance_score": c.relevance_score,
                 "excerpt": c.excerpt,
@@ -118,13 +132,14 @@ class ConfidenceCalculator:
         provided_data: Dict[str, Any],
         retrieved_docs: List[Document],
         section: str = "mda",
+        fiscal_year: Optional[str] = None,
     ) -> ConfidenceScore:
         """Calculate confidence score for generated content."""
         # Calculate data coverage
         data_coverage = self._calculate_data_coverage(provided_data, section)
         
         # Calculate source quality
-        source_quality = self._calculate_source_quality(retrieved_docs)
+        source_quality = self._calculate_source_quality(retrieved_docs, fiscal_year)
         
         # Overall confidence
         overall = (data_coverage * 0.6 + source_quality * 0.4)
@@ -160,8 +175,12 @@ class ConfidenceCalculator:
         
         return min(1.0, coverage + 0.3)  # Base 0.3 for having some data
 
-    def _calculate_source_quality(self, docs: List[Document]) -> float:
-        """Calculate quality of retrieved sources."""
+    def _calculate_source_quality(self, docs: List[Document], fiscal_year: Optional[str] = None) -> float:
+        """Calculate quality of retrieved sources.
+
+        When retrieval scored the chunks, their mean similarity carries most
+        of the weight: a few strong matches beat many weak ones.
+        """
         if not docs:
             return 0.0
         
@@ -175,6 +194,12 @@ class ConfidenceCalculator:
         # Check recency (prefer recent filings)
         recency_scores = []
         for doc in docs:
+            source_year = doc.metadata.get("fiscal_year")
+            if fiscal_year and source_year and str(fiscal_year).isdigit():
+                # Years between the source filing and the one being drafted
+                age = int(fiscal_year) - int(source_year)
+                recency_scores.append(1.0 if age <= 1 else 0.8 if age == 2 else 0.5)
+                continue
             filing_date = doc.metadata.get("filing_date", "")
             if "2024" in filing_date or "2025" in filing_date:
                 recency_scores.append(1.0)
@@ -185,6 +210,15 @@ class ConfidenceCalculator:
         
         recency_score = sum(recency_scores) / len(recency_scores) if recency_scores else 0.5
         
+        relevance = [d.metadata["relevance_score"] for d in docs if "relevance_score" in d.metadata]
+        if relevance:
+            relevance_score = min(1.0, max(0.0, sum(relevance) / len(relevance) / RETRIEVAL_STRONG_SCORE))
+            quantity_score = min(1.0, len(docs) / 4)
+            return (
+                relevance_score * 0.4 + quantity_score * 0.1
+                + diversity_score * 0.2 + recency_score * 0.3
+            )
+        
         return (quantity_score * 0.3 + diversity_score * 0.3 + recency_score * 0.4)
 
     def _generate_reasoning(
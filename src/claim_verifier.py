@@ -0,0 +1,167 @@
+"""Lexical verification that generated sentences are supported by the sources they cite."""
+import re
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from langchain_core.documents import Document
+
+from src.compression import fold_plural, split_sentences
+from src.config import CLAIM_SUPPORT_THRESHOLD
+
+
+_CITATION_RE = re.compile(r"\[Sources?\s+([\d,\s]+(?:and\s+\d+)?)\]", re.I)
+# Citations placed after a sentence's full stop belong to that sentence
+_TRAILING_CITATIONS_RE = re.compile(r"([.!?])((?:\s*\[Sources?\s+[^\]]+\])+)")
+_TOKEN_RE = re.compile(r"[a-z]+|\d+(?:\.\d+)?")
+_MARKDOWN_RE = re.compile(r"^\s*(?:#+|[-*•]|\d+\.)\s+|\*\*|__")
+_STOPWORDS = {
+    "the", "and", "for", "with", "from", "that", "this", "its", "their", "our", "are",
+    "was", "were", "has", "have", "had", "which", "into", "such", "other", "also", "been",
+    "will", "would", "could", "may", "can", "not", "but", "all", "any", "more", "than",
+    "company", "companies", "fiscal", "year", "years",
+}
+_SPACE_BEFORE_PUNCT_RE = re.compile(r"\s+([.,;:!?])")
+_MIN_CLAIM_WORDS = 6  # Shorter lines are headings or fragments, not claims
+
+
+def _terms(text: str) -> List[str]:
+    """Content words and numbers of a text, lowercased, with plurals folded."""
+    terms = []
+    for token in _TOKEN_RE.findall(text.lower().replace(",", "")):
+        if token in _STOPWORDS or (len(token) < 3 and not token[0].isdigit()):
+            continue
+        terms.append(fold_plural(token))
+    return terms
+
+
+def _bigrams(terms: List[str]) -> Set[Tuple[str, str]]:
+    return set(zip(terms, terms[1:]))
+
+
+def cited_sources(sentence: str) -> List[int]:
+    """Source numbers cited in a sentence, e.g. "[Source 2]" or "[Sources 1, 3]"."""
+    ids = []
+    for match in _CITATION_RE.finditer(sentence):
+        ids.extend(int(n) for n in re.findall(r"\d+", match.group(1)))
+    return ids
+
+
+@dataclass
+class SentenceSupport:
+    """Support of one generated sentence by its cited (or best matching) source."""
+    sentence: str
+    cited: List[int]
+    score: float
+    best_source: Optional[int]
+    supported: bool
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "sentence": self.sentence,
+            "cited": self.cited,
+            "score": round(self.score, 2),
+            "best_source": self.best_source,
+        }
+
+
+@dataclass
+class VerificationReport:
+    """Per-sentence support of a generated draft."""
+    checked: int
+    supported: int
+    unsupported: List[SentenceSupport] = field(default_factory=list)
+    uncited: int = 0
+    milliseconds: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "sentences_checked": self.checked,
+            "supported": self.supported,
+            "uncited": self.uncited,
+            "unsupported": [s.to_dict() for s in self.unsupported],
+            "milliseconds": round(self.milliseconds, 2),
+        }
+
+
+class ClaimVerifier:
+    """Scores how well the retrieved chunks back each sentence of a draft.
+
+    Each source (numbered as in the prompt, from 1) is indexed as a set of
+    content terms and term bigrams. A sentence's support by a source is the
+    share of its terms found in the source, averaged with the share of its
+    bigrams, so paraphrases score partially and copied phrasing fully.
+    Cited sentences are scored against their citations; uncited ones
+    against the best source found through the term index.
+    """
+
+    def __init__(self, documents: List[Document], threshold: float = CLAIM_SUPPORT_THRESHOLD):
+        self.threshold = threshold
+        self.terms: Dict[int, Set[str]] = {}
+        self.bigrams: Dict[int, Set[Tuple[str, str]]] = {}
+        self.postings: Dict[str, Set[int]] = defaultdict(set)
+        for source_id, doc in enumerate(documents, start=1):
+            terms = _terms(doc.page_content)
+            self.terms[source_id] = set(terms)
+            self.bigrams[source_id] = _bigrams(terms)
+            for term in self.terms[source_id]:
+                self.postings[term].add(source_id)
+
+    def support(self, terms: List[str], source_id: int) -> float:
+        """Share of a sentence's terms and bigrams found in a source."""
+        if source_id not in self.terms or not terms:
+            return 0.0
+        unique = set(terms)
+        term_share = len(unique & self.terms[source_id]) / len(unique)
+        bigrams = _bigrams(terms)
+        if not bigrams:
+            return term_share
+        return (term_share + len(bigrams & self.bigrams[source_id]) / len(bigrams)) / 2
+
+    def _best_source(self, terms: List[str]) -> Tuple[Optional[int], float]:
+        """Most supportive source among those sharing a term with the sentence."""
+        candidates: Set[int] = set()
+        for term in set(terms):
+            candidates |= self.postings.get(term, set())
+        best, best_score = None, 0.0
+        for source_id in sorted(candidates):
+            score = self.support(terms, source_id)
+            if score > best_score:
+                best, best_score = source_id, score
+        return best, best_score
+
+    def check_sentence(self, sentence: str) -> Optional[SentenceSupport]:
+        """Support of one sentence, or None when it is too short to be a claim."""
+        cited = cited_sources(sentence)
+        text = " ".join(_MARKDOWN_RE.sub("", _CITATION_RE.sub(" ", sentence)).split())
+        text = _SPACE_BEFORE_PUNCT_RE.sub(r"\1", text)
+        if len(text.split()) < _MIN_CLAIM_WORDS:
+            return None
+        terms = _terms(text)
+        if cited:
+            scores = {source_id: self.support(terms, source_id) for source_id in cited}
+            best = max(scores, key=scores.get)
+            score = scores[best]
+        else:
+            best, score = self._best_source(terms)
+        return SentenceSupport(text, cited, score, best, score >= self.threshold)
+
+    def verify(self, generated_text: str) -> VerificationReport:
+        """Check every sentence of a draft."""
+        started = time.perf_counter()
+        report = VerificationReport(checked=0, supported=0)
+        text = _TRAILING_CITATIONS_RE.sub(r"\2\1", generated_text)
+        for line in text.split("\n"):
+            for sentence in split_sentences(line):
+                result = self.check_sentence(sentence)
+                if result is None:
+                    continue
+                report.checked += 1
+                report.uncited += not result.cited
+                if result.supported:
+                    report.supported += 1
+                else:
+                    report.unsupported.append(result)
+        report.milliseconds = (time.perf_counter() - started) * 1000
+        return report
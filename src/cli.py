@@ -1,16 +1,17 @@
 """Command-line interface for 10-K RAG Assistant."""
 import sys
-from typing import Optional
+from typing import List, Optional
 import typer
 from rich.console import Console
 from rich.markdown import Markdown
 from rich.panel import Panel
 from rich.prompt import Prompt
+from rich.table import Table
 
 from src.assistant import create_assistant, TenKAssistant
 from src.sec_downloader import SECDownloader
 from src.document_processor import DocumentProcessor
-from src.config import TARGET_COMPANIES
+from src.config import TARGET_COMPANIES, FILING_YEARS
 
 app = typer.Typer(help="SEC 10-K RAG Assistant CLI")
 console = Console()
@@ -68,14 +69,17 @@ def chat():
 def download(
     ticker: Optional[str] = typer.Argument(None, help="Company ticker (e.g., NVDA)"),
     all_companies: bool = typer.Option(False, "--all", "-a", help="Download all companies"),
+    force: bool = typer.Option(False, "--force", "-f", help="Re-parse even if the filing is unchanged"),
+    years: int = typer.Option(FILING_YEARS, "--years", "-y", help="Fiscal years of 10-Ks to keep"),
 ):
     """Download 10-K filings from SEC EDGAR."""
     downloader = SECDownloader()
     
     if all_companies:
         console.print("[bold]Downloading 10-K filings for all companies...[/bold]")
-        results = downloader.download_all_companies()
-        console.print(f"[green]Downloaded {len(results)} filings[/green]")
+        results = downloader.download_all_companies(force=force, years=years)
+        unchanged = sum(1 for r in results if r.get("unchanged"))
+        console.print(f"[green]Downloaded {len(results) - unchanged} filings ({unchanged} unchanged)[/green]")
     elif ticker:
         ticker = ticker.upper()
         if ticker not in TARGET_COMPANIES:
@@ -83,17 +87,87 @@ def download(
             console.print(f"Available: {', '.join(TARGET_COMPANIES.keys())}")
             raise typer.Exit(1)
         
-        console.print(f"[bold]Downloading 10-K for {ticker}...[/bold]")
-        result = downloader.download_company_10k(ticker)
-        if result:
-            console.print(f"[green]Successfully downloaded {ticker} 10-K[/green]")
-        else:
+        console.print(f"[bold]Downloading {years} years of 10-Ks for {ticker}...[/bold]")
+        results = downloader.download_company_history(ticker, years=years, force=force)
+        for result in results:
+            label = f"{ticker} FY{result['fiscal_year']} 10-K"
+            if result.get("unchanged"):
+                console.print(f"[green]{label} is already up to date[/green]")
+            else:
+                console.print(f"[green]Successfully downloaded {label}[/green]")
+        if not results:
             console.print(f"[red]Failed to download {ticker} 10-K[/red]")
     else:
         console.print("[yellow]Please specify a ticker or use --all flag[/yellow]")
         console.print(f"Available tickers: {', '.join(TARGET_COMPANIES.keys())}")
 
 
+@app.command()
+def reparse(
+    tickers: Optional[List[str]] = typer.Argument(None, help="Company tickers (default: all archived)"),
+    workers: Optional[int] = typer.Option(None, "--workers", "-w", help="Worker processes (default: all cores)"),
+):
+    """Re-run section extraction over archived raw filings (offline)."""
+    import time
+    from src.sec_downloader import reparse_archive
+    from src.config import INDEX_WORKERS
+    
+    tickers = [t.upper() for t in tickers] if tickers else None
+    console.print("[bold]Re-parsing archived filings...[/bold]")
+    start = time.perf_counter()
+    reparsed = reparse_archive(tickers, workers=workers or INDEX_WORKERS)
+    elapsed = time.perf_counter() - start
+    
+    if not reparsed:
+        console.print("[yellow]No archived filings found. Run 'download' or 'ingest' first.[/yellow]")
+        return
+    console.print(f"[green]Re-parsed {len(reparsed)} filings in {elapsed:.1f}s: {', '.join(sorted(reparsed))}[/green]")
+    console.print("Run 'index --rebuild' to re-index the updated sections.")
+
+
+@app.command()
+def facts(
+    tickers: Optional[List[str]] = typer.Argument(None, help="Company tickers (default: all)"),
+    from_file: Optional[str] = typer.Option(None, "--file", "-f", help="Load a companyfacts JSON file instead of downloading (one ticker)"),
+):
+    """Download XBRL company facts into the local financial store."""
+    from src.financial_facts import METRIC_CONCEPTS, format_fact, get_financial_store
+
+    tickers = [t.upper() for t in tickers] if tickers else list(TARGET_COMPANIES.keys())
+    unknown = [t for t in tickers if t not in TARGET_COMPANIES]
+    if unknown:
+        console.print(f"[red]Unknown ticker(s): {', '.join(unknown)}[/red]")
+        raise typer.Exit(1)
+    if from_file and len(tickers) != 1:
+        console.print("[red]--file needs exactly one ticker[/red]")
+        raise typer.Exit(1)
+
+    downloader = SECDownloader()
+    latest = {}
+    for ticker in tickers:
+        if from_file:
+            company_facts = get_financial_store().ingest_file(from_file, TARGET_COMPANIES[ticker]["cik"])
+        else:
+            company_facts = downloader.download_company_facts(ticker)
+        if not company_facts or not company_facts.fiscal_years():
+            console.print(f"[yellow]No annual facts for {ticker}[/yellow]")
+            continue
+        fiscal_year = company_facts.fiscal_years()[-1]
+        latest[f"{ticker} FY{fiscal_year}"] = company_facts.metrics_for_year(fiscal_year)
+
+    if not latest:
+        return
+    table = Table(title="Latest fiscal year as reported")
+    table.add_column("Metric")
+    for column in latest:
+        table.add_column(column, justify="right")
+    for name in METRIC_CONCEPTS:
+        table.add_row(name, *[
+            format_fact(*reported[name]) if name in reported else "-" for reported in latest.values()
+        ])
+    console.print(table)
+
+
 @app.command()
 def index(
     rebuild: bool = typer.Option(False, "--rebuild", "-r", help="Rebuild vector store from scratch"),
@@ -111,12 +185,78 @@ def index(
             processor.build_vector_store()
         else:
             processor.get_or_create_vector_store()
-        console.print("[green]Vector store ready![/green]")
+        console.print(f"[green]Vector store ready! (version: {processor.index_version})[/green]")
+        if processor.last_build_stats:
+            _print_build_stats(processor.last_build_stats)
     except Exception as e:
         console.print(f"[red]Error: {e}[/red]")
         raise typer.Exit(1)
 
 
+@app.command()
+def ingest(
+    tickers: Optional[List[str]] = typer.Argument(None, help="Company tickers (default: all)"),
+    years: int = typer.Option(FILING_YEARS, "--years", "-y", help="Fiscal years of 10-Ks per company"),
+):
+    """Download, parse, chunk, embed and index filings as one streaming pipeline."""
+    from src.ingest_pipeline import IngestPipeline
+    
+    tickers = [t.upper() for t in tickers] if tickers else list(TARGET_COMPANIES.keys())
+    unknown = [t for t in tickers if t not in TARGET_COMPANIES]
+    if unknown:
+        console.print(f"[red]Unknown ticker(s): {', '.join(unknown)}[/red]")
+        raise typer.Exit(1)
+    
+    console.print(f"[bold]Ingesting {', '.join(tickers)}...[/bold]")
+    result = IngestPipeline(years=years).run(tickers)
+    
+    table = Table(title="Ingest pipeline stages")
+    for column in ["Stage", "Workers", "In", "Out", "Errors", "Busy (s)", "Blocked (s)", "Items/s/worker"]:
+        table.add_column(column)
+    for m in result.stages:
+        table.add_row(
+            m.name, str(m.workers), str(m.items_in), str(m.items_out), str(m.errors),
+            f"{m.busy_seconds:.2f}", f"{m.blocked_seconds:.2f}", f"{m.items_per_second:.2f}",
+        )
+    console.print(table)
+    console.print(
+        f"Wall time {result.wall_seconds:.2f}s "
+        f"(slowest stage {result.slowest_stage_seconds:.2f}s, "
+        f"sum of stages {sum(m.busy_seconds / m.workers for m in result.stages):.2f}s)"
+    )
+    if result.index_version:
+        console.print(f"[green]Indexed {result.filings} filings / {result.chunks} chunks "
+                      f"(version: {result.index_version})[/green]")
+    else:
+        console.print("[yellow]Nothing was indexed[/yellow]")
+
+
+def _print_build_stats(stats) -> None:
+    """Print per-stage timing of an index build."""
+    table = Table(title="Index build stages")
+    table.add_column("Stage")
+    table.add_column("Seconds", justify="right")
+    table.add_column("Detail")
+    table.add_row("Load filings", f"{stats.load_seconds:.2f}", f"{stats.filings} filings")
+    table.add_row(
+        "Clean + chunk",
+        f"{stats.chunk_seconds:.2f}",
+        f"{stats.sections} sections, {stats.chunk_cpu_seconds:.2f}s CPU on {stats.workers} workers",
+    )
+    if stats.dedup:
+        table.add_row(
+            "Deduplicate",
+            "",
+            f"{stats.dedup.chunks_saved} of {stats.dedup.chunks_in} chunks collapsed "
+            f"({stats.dedup.exact_duplicates} exact, {stats.dedup.near_duplicates} near), "
+            f"{stats.dedup.embedding_calls_saved()} embedding calls / "
+            f"{stats.dedup.tokens_saved} tokens saved",
+        )
+    table.add_row("Embed + insert", f"{stats.embed_seconds:.2f}", f"{stats.chunks} chunks")
+    table.add_row("Total (overlapped)", f"{stats.total_seconds:.2f}", "")
+    console.print(table)
+
+
 @app.command()
 def generate(
     ticker: str = typer.Argument(..., help="Company ticker (e.g., NVDA)"),
@@ -135,7 +275,14 @@ def generate(
     console.print(f"[bold]Generating Business section for {ticker} FY{year}...[/bold]")
     
     try:
-        business_section = assistant.rag_engine.generate_business_section(ticker, year)
+        business_section, metadata = assistant.rag_engine.generate_business_section(ticker, year)
+        context_tokens = metadata.get("context_tokens") or {}
+        if context_tokens:
+            console.print(
+                f"[dim]Context {context_tokens['before']:,} -> {context_tokens['after']:,} tokens, "
+                f"prompt {metadata['prompt_tokens']:,} tokens, "
+                f"generated in {metadata['latency_seconds']['total']:.1f}s[/dim]"
+            )
         
         output_text = f"""# {TARGET_COMPANIES[ticker]['name']} ({ticker})
 # Form 10-K - Fiscal Year {year}
@@ -161,6 +308,88 @@ def generate(
         raise typer.Exit(1)
 
 
+@app.command()
+def summarize(
+    tickers: Optional[List[str]] = typer.Argument(None, help="Company tickers (default: all)"),
+    sections: Optional[List[str]] = typer.Option(None, "--section", "-s", help="Section keys to summarize (default: all indexed sections)"),
+    latest: bool = typer.Option(False, "--latest", help="Only each company's latest filing"),
+    workers: Optional[int] = typer.Option(None, "--workers", "-w", help="Concurrent LLM calls"),
+    extractive: bool = typer.Option(False, "--extractive", help="Use lead sentences instead of the LLM (no API calls)"),
+):
+    """Precompute map-reduce summaries of filing sections (resumes interrupted runs)."""
+    from src.document_processor import SECTION_MAPPINGS
+    from src.summarizer import ExtractiveSummaryLLM, SectionSummarizer
+    
+    tickers = [t.upper() for t in tickers] if tickers else None
+    unknown = [t for t in tickers or [] if t not in TARGET_COMPANIES]
+    unknown += [s for s in sections or [] if s not in SECTION_MAPPINGS]
+    if unknown:
+        console.print(f"[red]Unknown ticker(s) or section(s): {', '.join(unknown)}[/red]")
+        raise typer.Exit(1)
+    
+    summarizer = SectionSummarizer(
+        llm=ExtractiveSummaryLLM() if extractive else None,
+        **({"workers": workers} if workers else {}),
+    )
+    stats = summarizer.run(tickers, sections, latest_only=latest)
+    console.print(
+        f"[green]{stats.sections} sections: {stats.already_done} already summarized, "
+        f"{stats.resumed} resumed from checkpoints, {stats.llm_calls} LLM calls "
+        f"in {stats.seconds:.1f}s[/green]"
+    )
+    if stats.empty:
+        console.print(f"[yellow]{stats.empty} section(s) had no text to summarize[/yellow]")
+    if stats.errors:
+        console.print(f"[yellow]{stats.errors} section(s) failed; rerun to resume them[/yellow]")
+
+
+@app.command()
+def diff(
+    ticker: str = typer.Argument(..., help="Company ticker"),
+    section: str = typer.Option("item_1a_risk_factors", "--section", "-s", help="Section key (e.g. item_7_mda)"),
+    old_year: Optional[str] = typer.Option(None, "--from", help="Older fiscal year (default: the one before --to)"),
+    new_year: Optional[str] = typer.Option(None, "--to", help="Newer fiscal year (default: latest stored)"),
+    summary: bool = typer.Option(False, "--summary", help="Print a compact, prompt-sized change summary instead of the paragraphs"),
+):
+    """Show what changed in a section since the previous year's filing."""
+    from src.document_processor import SECTION_MAPPINGS
+    from src.section_diff import diff_filing_section
+    
+    ticker = ticker.upper()
+    if section not in SECTION_MAPPINGS:
+        console.print(f"[red]Unknown section: {section}. Available: {', '.join(SECTION_MAPPINGS)}[/red]")
+        raise typer.Exit(1)
+    
+    result = diff_filing_section(ticker, section, old_year, new_year)
+    if result is None:
+        console.print(f"[yellow]Need two stored filings of {ticker} to compare "
+                      f"(see python main.py download --years 2)[/yellow]")
+        raise typer.Exit(1)
+    
+    if summary:
+        console.print(result.change_summary())
+        return
+    
+    counts = result.counts()
+    console.print(
+        f"[bold]{ticker} {SECTION_MAPPINGS[section]}: FY{result.old_year} -> FY{result.new_year}[/bold] "
+        f"({result.unchanged} unchanged, " + ", ".join(f"{n} {kind}" for kind, n in counts.items()) + ")"
+    )
+    colors = {"added": "green", "removed": "red", "modified": "yellow", "moved": "blue"}
+    table = Table()
+    table.add_column("Change")
+    table.add_column("Paragraph")
+    for change in result.changes:
+        text = change.new_text or change.old_text
+        if change.kind == "modified":
+            text = " ".join(
+                [f"[green]+ {s}[/green]" for s in change.added_sentences]
+                + [f"[red]- {s}[/red]" for s in change.removed_sentences]
+            ) or text
+        table.add_row(f"[{colors[change.kind]}]{change.kind}[/{colors[change.kind]}]", text[:400])
+    console.print(table)
+
+
 @app.command()
 def companies():
     """List available companies."""
@@ -169,6 +398,32 @@ def companies():
         console.print(f"  [cyan]{ticker}[/cyan] - {info['name']} (CIK: {info['cik']})")
 
 
+@app.command()
+def bench(
+    name: str = typer.Argument(..., help="Benchmark to run (e.g., chunker)"),
+):
+    """Run a throughput benchmark and print the results."""
+    from src.benchmarks import BENCHMARKS
+    
+    if name not in BENCHMARKS:
+        console.print(f"[red]Unknown benchmark: {name}[/red]")
+        console.print(f"Available: {', '.join(BENCHMARKS.keys())}")
+        raise typer.Exit(1)
+    
+    console.print(f"[bold]Running {name} benchmark...[/bold]")
+    rows = BENCHMARKS[name]()
+    if not rows:
+        console.print("[yellow]No results (is there data to benchmark on?)[/yellow]")
+        return
+    
+    table = Table(title=f"{name} benchmark")
+    for column in rows[0].keys():
+        table.add_column(column)
+    for row in rows:
+        table.add_row(*(str(v) for v in row.values()))
+    console.print(table)
+
+
 @app.command()
 def serve(
     host: str = typer.Option("0.0.0.0", "--host", "-h", help="Host to bind to"),
@@ -0,0 +1,327 @@
+"""Extractive compression of prompt inputs: user-provided data and retrieved chunks."""
+import heapq
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from src.config import CONTEXT_MIN_SCORE_RATIO
+from src.tokens import count_tokens, count_tokens_batch, truncate_to_tokens
+
+
+# Terms that make a line relevant to an MD&A discussion, with weights
+_MDA_TERMS = {
+    "revenue": 3.0, "sales": 3.0, "net income": 3.0, "operating income": 3.0,
+    "gross profit": 2.5, "margin": 2.5, "earnings per share": 2.5, "eps": 2.5,
+    "cash flow": 2.5, "liquidity": 2.5, "capital expenditure": 2.0, "debt": 2.0,
+    "segment": 2.0, "growth": 2.0, "increase": 1.5, "decrease": 1.5, "decline": 1.5,
+    "expenses": 1.5, "cost of": 1.5, "guidance": 1.5, "outlook": 1.5,
+    "acquisition": 1.5, "acquired": 1.5, "launched": 1.5, "restructuring": 1.5,
+    "impairment": 1.5, "dividend": 1.0, "repurchase": 1.0, "employees": 1.0,
+    "customers": 1.0, "backlog": 1.0, "tax": 1.0, "interest": 1.0, "inflation": 1.0,
+    "foreign exchange": 1.0, "currency": 1.0,
+}
+_TERM_RE = re.compile(
+    r"(?i)\b(" + "|".join(re.escape(t) for t in sorted(_MDA_TERMS, key=len, reverse=True)) + r")"
+)
+_FIGURE_RE = re.compile(r"(?i)\$\s?\d|\d\s?%|\d\s*(?:billion|million|thousand)\b|\d[BM]\b")
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+(?=[A-Z(\"$])")
+_NUMBER_RE = re.compile(r"\d[\d,.]*")
+_WORD_RE = re.compile(r"[a-z][a-z0-9&'-]*")
+_STOPWORDS = {
+    "the", "and", "for", "with", "from", "that", "this", "its", "their", "our",
+    "are", "was", "were", "has", "have", "which", "into", "such", "other", "also",
+}
+_ELISION = "[...]"
+# Cross-references to 10-K items repeat the words of the section queries; ignore them when scoring
+_BOILERPLATE_RE = re.compile(
+    r"(?i)management[’']s discussion and analysis of financial condition and results of operations"
+    r"|quantitative and qualitative disclosures about market risk"
+    r"|notes to (?:the )?consolidated financial statements"
+    r"|(?:part [iv]+, )?item \d+[a-c]?\b"
+)
+
+# BM25 parameters for sentence scoring
+_BM25_K1 = 1.2
+_BM25_B = 0.75
+
+_FIELD_WEIGHT = 2.0  # Parsed fields are the primary source of current-year figures
+_REDUNDANT_WEIGHT = 0.2  # Raw table rows already captured as parsed fields
+
+
+@dataclass
+class CompressedInput:
+    """User data that fits the prompt budget, plus what was left out."""
+    fields: Dict[str, Any]
+    raw_input: str
+    tokens_before: int
+    tokens_after: int
+    budget: int
+    dropped: List[str] = field(default_factory=list)
+
+    @property
+    def compressed(self) -> bool:
+        return bool(self.dropped)
+
+
+def _raw_units(raw_input: str) -> List[Tuple[str, int]]:
+    """Split raw input into (unit, line number) pairs: table rows and sentences."""
+    units = []
+    for line_no, line in enumerate(raw_input.split("\n")):
+        line = line.strip()
+        if not line:
+            continue
+        if "|" in line:
+            units.append((line, line_no))
+            continue
+        for sentence in _SENTENCE_SPLIT_RE.split(line):
+            if sentence.strip():
+                units.append((sentence.strip(), line_no))
+    return units
+
+
+def score_units(texts: List[str]) -> np.ndarray:
+    """MD&A relevance of each text unit: weighted key terms plus reported figures."""
+    scores = np.zeros(len(texts), dtype=np.float64)
+    for i, text in enumerate(texts):
+        terms = {match.lower() for match in _TERM_RE.findall(text)}
+        figures = len(_FIGURE_RE.findall(text))
+        scores[i] = sum(_MDA_TERMS[t] for t in terms) + min(figures, 3)
+    return scores
+
+
+def compress_user_input(financial_data: Dict[str, Any], budget: int) -> CompressedInput:
+    """Keep the parsed fields, table rows and sentences most relevant to MD&A within budget tokens.
+
+    Units are ranked by relevance per square-root token (so long, dense
+    rows aren't crowded out by short fragments), with a mild preference for
+    earlier input and a penalty for templated repeats, then filled greedily;
+    kept units stay in input order.
+    """
+    fields = {k: v for k, v in financial_data.items() if k != "raw_input"}
+    raw_input = financial_data.get("raw_input") or ""
+
+    field_lines = [f"- {key}: {value}" for key, value in fields.items()]
+    raw_units = _raw_units(raw_input)
+    texts = field_lines + [unit for unit, _ in raw_units]
+    tokens = np.array(count_tokens_batch(texts), dtype=np.float64)
+    total = int(tokens.sum())
+    if total <= budget:
+        return CompressedInput(fields, raw_input, total, total, budget)
+
+    scores = score_units(texts) + 1.0
+    scores[:len(field_lines)] *= _FIELD_WEIGHT
+    known = {key.lower() for key in fields}
+    for i, (unit, _) in enumerate(raw_units, start=len(field_lines)):
+        if "|" in unit and unit.strip("| ").split("|")[0].strip().lower() in known:
+            scores[i] *= _REDUNDANT_WEIGHT
+    # Templated repeats (same text up to the numbers) add little after the first few
+    seen: Dict[str, int] = {}
+    repeats = np.zeros(len(texts), dtype=np.float64)
+    for i, text in enumerate(texts):
+        shape = _NUMBER_RE.sub("#", text.lower())
+        repeats[i] = seen.get(shape, 0)
+        seen[shape] = repeats[i] + 1
+    positions = np.arange(len(texts)) / max(len(texts), 1)
+    priority = (
+        scores / np.sqrt(np.maximum(tokens, 1.0)) * (1.0 - 0.25 * positions) / (1.0 + repeats)
+    )
+
+    keep = np.zeros(len(texts), dtype=bool)
+    used = 0
+    for i in np.argsort(-priority, kind="stable"):
+        if used + tokens[i] <= budget:
+            keep[i] = True
+            used += int(tokens[i])
+
+    kept_fields = {
+        key: value for (key, value), kept in zip(fields.items(), keep[:len(field_lines)]) if kept
+    }
+    lines: Dict[int, List[str]] = {}
+    for (unit, line_no), kept in zip(raw_units, keep[len(field_lines):]):
+        if kept:
+            lines.setdefault(line_no, []).append(unit)
+    return CompressedInput(
+        fields=kept_fields,
+        raw_input="\n".join(" ".join(units) for units in lines.values()),
+        tokens_before=total,
+        tokens_after=used,
+        budget=budget,
+        dropped=[text for text, kept in zip(texts, keep) if not kept],
+    )
+
+
+def user_input_budget(fixed_prompt_tokens: int, prompt_cap: int, user_cap: int) -> int:
+    """Tokens left for user data: the user cap, or what the rest of the prompt leaves under the prompt cap."""
+    remaining = prompt_cap - fixed_prompt_tokens
+    return max(0, min(user_cap, remaining))
+
+
+def context_overflow(fixed_prompt_tokens: int, user_tokens: int, prompt_cap: int, user_cap: int) -> int:
+    """Tokens the retrieved context must give up so user data keeps its reserve under the prompt cap.
+
+    The reserve is a quarter of the user cap (or all of the user data if
+    smaller), so the current-year figures survive an oversized context.
+    """
+    reserve = min(user_tokens, math.ceil(user_cap / 4))
+    return max(0, fixed_prompt_tokens + reserve - prompt_cap)
+
+
+def fit_contents(contents: List[str], budget: int) -> List[str]:
+    """Truncate chunk texts to fit a total token budget, longest chunks first.
+
+    Every chunk is cut to the same largest token count at which all of them
+    fit (shorter chunks stay whole), so no source disappears and [Source N]
+    numbering is unchanged. Cut chunks end with "[...]".
+    """
+    counts = count_tokens_batch(contents)
+    if sum(counts) <= budget:
+        return list(contents)
+    elision = count_tokens(" " + _ELISION)
+
+    def size(cap: int) -> int:
+        return sum(n if n <= cap else cap + elision for n in counts)
+
+    low, high = 0, max(counts)
+    while low < high:
+        cap = (low + high + 1) // 2
+        if size(cap) <= budget:
+            low = cap
+        else:
+            high = cap - 1
+    return [
+        text if n <= low else f"{truncate_to_tokens(text, low)} {_ELISION}"
+        for text, n in zip(contents, counts)
+    ]
+
+
+def balanced_allocation(token_counts: List[List[int]], budget: int) -> List[int]:
+    """How many leading chunks of each group fit the budget, shared evenly between groups.
+
+    Water-filling: the next chunk always goes to the group that would have
+    the fewest tokens after adding it, so small groups are filled first and
+    budget they can't use goes to the others. A group stops at its first
+    chunk that doesn't fit, keeping its chunks a prefix of its ranking.
+    """
+    kept = [0] * len(token_counts)
+    used = [0] * len(token_counts)
+    total = 0
+    heap = [(counts[0], g) for g, counts in enumerate(token_counts) if counts]
+    heapq.heapify(heap)
+    while heap:
+        after, g = heapq.heappop(heap)
+        tokens = token_counts[g][kept[g]]
+        if total + tokens > budget:
+            continue
+        total += tokens
+        used[g] = after
+        kept[g] += 1
+        if kept[g] < len(token_counts[g]):
+            heapq.heappush(heap, (used[g] + token_counts[g][kept[g]], g))
+    return kept
+
+
+@dataclass
+class CompressedContext:
+    """Retrieved chunk texts reduced to their query-relevant sentences (same order as the chunks)."""
+    contents: List[str]
+    tokens_before: int
+    tokens_after: int
+
+
+def fold_plural(word: str) -> str:
+    """Crude plural folding so "revenues" matches "revenue" (shared by every lexical matcher)."""
+    if len(word) > 4 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def split_sentences(text: str) -> List[str]:
+    """Lines and sentences of a chunk, in order."""
+    sentences = []
+    for line in text.split("\n"):
+        for sentence in _SENTENCE_SPLIT_RE.split(line.strip()):
+            if sentence.strip():
+                sentences.append(sentence.strip())
+    return sentences
+
+
+def score_sentences(query: str, sentences: List[str]) -> np.ndarray:
+    """BM25 score of each sentence against the query terms, over the retrieved sentences."""
+    terms: Dict[str, int] = {}
+    for word in _WORD_RE.findall(query.lower()):
+        if len(word) > 2 and word not in _STOPWORDS:
+            terms.setdefault(fold_plural(word), len(terms))
+    if not terms or not sentences:
+        return np.zeros(len(sentences), dtype=np.float64)
+
+    rows: List[int] = []
+    cols: List[int] = []
+    lengths = np.zeros(len(sentences), dtype=np.float64)
+    for i, sentence in enumerate(sentences):
+        words = _WORD_RE.findall(_BOILERPLATE_RE.sub(" ", sentence).lower())
+        lengths[i] = len(words)
+        for word in words:
+            t = terms.get(fold_plural(word))
+            if t is not None:
+                rows.append(i)
+                cols.append(t)
+
+    tf = np.zeros((len(sentences), len(terms)), dtype=np.float64)
+    np.add.at(tf, (rows, cols), 1.0)
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log1p((len(sentences) - df + 0.5) / (df + 0.5))
+    length_norm = 1 - _BM25_B + _BM25_B * lengths / max(lengths.mean(), 1.0)
+    saturated = tf * (_BM25_K1 + 1) / (tf + _BM25_K1 * length_norm[:, None])
+    return saturated @ idf
+
+
+def compress_context(
+    query: str,
+    documents: List[Document],
+    min_score_ratio: float = CONTEXT_MIN_SCORE_RATIO,
+    keep_short: int = 3,
+    min_keep_fraction: float = 0.25,
+) -> CompressedContext:
+    """Keep only the sentences of each chunk that are relevant to the query.
+
+    All sentences of all chunks are scored in one pass; a sentence is kept
+    if it scores at least min_score_ratio of the best sentence. Every chunk
+    also keeps its best min_keep_fraction of sentences and short chunks are
+    kept whole, so no source disappears and [Source N] numbering is
+    unchanged. Elided runs are marked with "[...]".
+    """
+    originals = [doc.page_content for doc in documents]
+    per_doc = [split_sentences(text) for text in originals]
+    flat = [sentence for sentences in per_doc for sentence in sentences]
+    scores = score_sentences(query, flat)
+    tokens_before = sum(count_tokens_batch(originals))
+    if not flat or scores.max() <= 0:
+        return CompressedContext(originals, tokens_before, tokens_before)
+
+    threshold = min_score_ratio * scores.max()
+    contents = []
+    start = 0
+    for original, sentences in zip(originals, per_doc):
+        chunk_scores = scores[start:start + len(sentences)]
+        start += len(sentences)
+        if len(sentences) <= keep_short:
+            contents.append(original)
+            continue
+        keep = chunk_scores >= threshold
+        floor = max(1, math.ceil(min_keep_fraction * len(sentences)))
+        keep[np.argsort(-chunk_scores, kind="stable")[:floor]] = True
+        parts: List[str] = []
+        previous = -1
+        for j in np.flatnonzero(keep):
+            if j != previous + 1:
+                parts.append(_ELISION)
+            parts.append(sentences[j])
+            previous = j
+        if previous != len(sentences) - 1:
+            parts.append(_ELISION)
+        contents.append(" ".join(parts))
+    return CompressedContext(contents, tokens_before, sum(count_tokens_batch(contents)))
@@ -10,11 +10,16 @@ BASE_DIR = Path(__file__).parent.parent
 DATA_DIR = BASE_DIR / "data"
 FILINGS_DIR = DATA_DIR / "filings"
 VECTOR_DB_DIR = DATA_DIR / "vector_db"
+RAW_FILINGS_DIR = DATA_DIR / "raw_filings"
+HTTP_CACHE_DIR = DATA_DIR / "http_cache"
+FINANCIALS_DIR = DATA_DIR / "financials"
+SUMMARIES_DIR = DATA_DIR / "summaries"
 
 # Create directories
 DATA_DIR.mkdir(exist_ok=True)
 FILINGS_DIR.mkdir(exist_ok=True)
 VECTOR_DB_DIR.mkdir(exist_ok=True)
+RAW_FILINGS_DIR.mkdir(exist_ok=True)
 
 # API Keys
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
@@ -26,7 +31,77 @@ EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
 # RAG settings
 CHUNK_SIZE = 2000
 CHUNK_OVERLAP = 200
-TOP_K_RETRIEVAL = 8
+# "structured" (heading/sentence aware, token targeted) or "recursive" (character based)
+CHUNK_STRATEGY = os.getenv("CHUNK_STRATEGY", "structured")
+CHUNK_TOKENS = 450
+CHUNK_OVERLAP_TOKENS = 45
+TOP_K_RETRIEVAL = 8  # Most chunks retrieved per search
+
+# Adaptive k: cut the ranked chunks at a cosine similarity floor or a sharp drop in similarity
+RETRIEVAL_MIN_SCORE = float(os.getenv("RETRIEVAL_MIN_SCORE", "0.2"))
+RETRIEVAL_SCORE_GAP = float(os.getenv("RETRIEVAL_SCORE_GAP", "0.1"))
+RETRIEVAL_MIN_K = 2  # Chunks kept even when every score is weak
+RETRIEVAL_STRONG_SCORE = 0.5  # Mean similarity that counts as fully relevant sources
+# Adjacent chunks added on each side of a hit, so text split across a chunk boundary stays whole
+RETRIEVAL_NEIGHBOURS = int(os.getenv("RETRIEVAL_NEIGHBOURS", "1"))
+
+# Retrieved chunks are reduced to their query-relevant sentences before prompting
+CONTEXT_COMPRESSION = os.getenv("CONTEXT_COMPRESSION", "true").lower() == "true"
+CONTEXT_MIN_SCORE_RATIO = 0.3  # Keep sentences scoring at least this share of the best sentence
+
+# Prompt budgets (tokens)
+PEER_CONTEXT_MAX_TOKENS = int(os.getenv("PEER_CONTEXT_MAX_TOKENS", "6000"))  # Retrieved context shared by compared companies
+PROMPT_MAX_TOKENS = int(os.getenv("PROMPT_MAX_TOKENS", "12000"))
+USER_INPUT_MAX_TOKENS = int(os.getenv("USER_INPUT_MAX_TOKENS", "3000"))  # User data share of the prompt
+
+# Offline section summaries (python main.py summarize)
+SUMMARY_WORKERS = int(os.getenv("SUMMARY_WORKERS", "4"))  # Concurrent LLM calls
+SUMMARY_MAP_CHUNKS = 4  # Index chunks summarized per map call
+SUMMARY_REDUCE_FANOUT = 6  # Summaries combined per reduce call
+SUMMARY_MAP_WORDS = 200  # Length asked of each map summary
+SUMMARY_REDUCE_WORDS = 400  # Length asked of each combined summary, including the section summary
+# Generation uses a prior-year section summary plus a few precise chunks when one exists
+SUMMARY_CONTEXT = os.getenv("SUMMARY_CONTEXT", "true").lower() == "true"
+SUMMARY_PRECISE_K = 3  # Chunks retrieved alongside a summary
+
+# Post-generation check that cited sources support each sentence (no LLM call)
+CLAIM_VERIFICATION = os.getenv("CLAIM_VERIFICATION", "true").lower() == "true"
+CLAIM_SUPPORT_THRESHOLD = 0.35  # Share of a sentence's terms/bigrams found in its cited source
+# Post-generation check of MD&A figures against provided data and sources (no LLM call)
+FACT_CHECK = os.getenv("FACT_CHECK", "true").lower() == "true"
+
+# Local routing of routine chat turns (no LLM call)
+INTENT_MIN_SCORE = 0.45  # Cosine similarity to an intent's examples below which a turn goes to the LLM
+INTENT_FEATURES = 2 ** 12  # Hashed word and word-pair features
+
+# Section diff between filing years (python main.py diff)
+DIFF_MIN_WORDS = 4  # Shorter lines (page numbers, table-of-contents entries) are not paragraphs
+DIFF_MODIFIED_THRESHOLD = 0.3  # Estimated Jaccard similarity of word 3-grams for a reworded paragraph
+DIFF_SUMMARY_MAX_TOKENS = 800  # Size of the prompt-ready change summary (`diff --summary`)
+
+# Filing history settings
+FILING_YEARS = int(os.getenv("FILING_YEARS", "3"))  # Fiscal years of 10-Ks kept per company
+
+# Index build settings
+INDEX_WORKERS = int(os.getenv("INDEX_WORKERS", str(os.cpu_count() or 1)))
+EMBEDDING_BATCH_SIZE = 256
+DEDUP_ENABLED = os.getenv("INDEX_DEDUP", "true").lower() == "true"
+DEDUP_THRESHOLD = 0.85  # Estimated Jaccard similarity for near-duplicates
+
+# Streaming ingest (cli ingest) settings
+INGEST_QUEUE_SIZE = 4  # Bounded queue between stages; full queues apply backpressure
+INGEST_DOWNLOAD_WORKERS = 2  # Keep well under SEC's 10 requests/second limit
+
+# Pasted financial input parsing
+INPUT_PARSER_POOL_BYTES = int(os.getenv("INPUT_PARSER_POOL_BYTES", "262144"))  # Larger inputs parse in a worker process
+INPUT_PARSER_WORKERS = 2
+
+# Background retrieval ahead of generation (RAGEngine.prefetch), shared by all sessions
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "2"))
+
+# Index publishing / hot reload settings
+INDEX_POLL_INTERVAL = float(os.getenv("INDEX_POLL_INTERVAL", "30"))  # seconds
+INDEX_KEEP_VERSIONS = 3
 
 # Target companies for 10-K filings
 TARGET_COMPANIES = {
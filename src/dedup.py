@@ -0,0 +1,194 @@
+"""Near-duplicate chunk detection with MinHash signatures and LSH banding."""
+import hashlib
+import re
+import zlib
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+from langchain_core.documents import Document
+
+from src.config import DEDUP_THRESHOLD, EMBEDDING_BATCH_SIZE
+
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_WORD_RE = re.compile(r"\w+")
+
+
+def normalize_for_hash(text: str) -> str:
+    """Lowercase and collapse everything but words, for exact-duplicate hashing."""
+    return " ".join(_WORD_RE.findall(text.lower()))
+
+
+class MinHasher:
+    """Vectorized MinHash over word shingles."""
+
+    def __init__(self, num_perm: int = 64, shingle_size: int = 5, seed: int = 1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, _MERSENNE_PRIME, size=(num_perm, 1)).astype(np.uint64)
+        self._b = rng.randint(0, _MERSENNE_PRIME, size=(num_perm, 1)).astype(np.uint64)
+
+    def shingle_hashes(self, text: str) -> np.ndarray:
+        """Stable 32-bit hashes of the word k-grams of a text."""
+        words = _WORD_RE.findall(text.lower())
+        k = self.shingle_size
+        if len(words) < k:
+            shingles = [" ".join(words)] if words else []
+        else:
+            shingles = [" ".join(words[i:i + k]) for i in range(len(words) - k + 1)]
+        return np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in set(shingles)),
+            dtype=np.uint64,
+        )
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature (num_perm,) of a text."""
+        hashes = self.shingle_hashes(text)
+        if hashes.size == 0:
+            return np.full(self.num_perm, _MERSENNE_PRIME, dtype=np.uint64)
+        # (a * x + b) mod p for every permutation/shingle pair; fits in uint64
+        permuted = (self._a * (hashes % _MERSENNE_PRIME) + self._b) % _MERSENNE_PRIME
+        return permuted.min(axis=1)
+
+    @staticmethod
+    def similarity(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+        """Estimated Jaccard similarity of two signatures."""
+        return float(np.mean(sig_a == sig_b))
+
+
+class LSHIndex:
+    """Banded locality-sensitive hashing over MinHash signatures."""
+
+    def __init__(self, num_perm: int = 64, bands: int = 8):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._buckets: List[Dict[bytes, List[int]]] = [defaultdict(list) for _ in range(bands)]
+        self.signatures: List[np.ndarray] = []
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [
+            signature[i * self.rows:(i + 1) * self.rows].tobytes()
+            for i in range(self.bands)
+        ]
+
+    def candidates(self, signature: np.ndarray) -> Set[int]:
+        """Ids of stored signatures sharing at least one band."""
+        found: Set[int] = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            found.update(self._buckets[band].get(key, ()))
+        return found
+
+    def insert(self, signature: np.ndarray) -> int:
+        """Store a signature and return its id."""
+        item_id = len(self.signatures)
+        self.signatures.append(signature)
+        for band, key in enumerate(self._band_keys(signature)):
+            self._buckets[band][key].append(item_id)
+        return item_id
+
+    def query(self, signature: np.ndarray, threshold: float) -> Optional[int]:
+        """Most similar stored id at or above threshold, if any."""
+        best_id, best_score = None, threshold
+        for item_id in self.candidates(signature):
+            score = MinHasher.similarity(signature, self.signatures[item_id])
+            if score >= best_score:
+                best_id, best_score = item_id, score
+        return best_id
+
+
+@dataclass
+class DedupStats:
+    """Counts of chunks collapsed during an index build."""
+    chunks_in: int = 0
+    chunks_kept: int = 0
+    exact_duplicates: int = 0
+    near_duplicates: int = 0
+    tokens_saved: int = 0
+
+    @property
+    def chunks_saved(self) -> int:
+        return self.exact_duplicates + self.near_duplicates
+
+    def embedding_calls_saved(self, batch_size: int = EMBEDDING_BATCH_SIZE) -> int:
+        """Embedding requests avoided at the given batch size."""
+        def calls(n: int) -> int:
+            return -(-n // batch_size)
+        return calls(self.chunks_in) - calls(self.chunks_kept)
+
+
+def _provenance_entry(metadata: Dict) -> Dict:
+    return {
+        "section": metadata.get("section"),
+        "section_key": metadata.get("section_key"),
+        "chunk_index": metadata.get("chunk_index"),
+        "fiscal_year": metadata.get("fiscal_year"),
+        "filing_date": metadata.get("filing_date"),
+    }
+
+
+class ChunkDeduplicator:
+    """Collapses exact and near-duplicate chunks to one canonical document.
+
+    Duplicates are only collapsed within one company's filing for one fiscal
+    year, so per-company and per-year retrieval filters keep working. The
+    canonical document records every location the text appeared in under
+    metadata["provenance"].
+    """
+
+    def __init__(self, threshold: float = DEDUP_THRESHOLD, num_perm: int = 64, bands: int = 8):
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm=num_perm)
+        self.num_perm = num_perm
+        self.bands = bands
+        self.stats = DedupStats()
+        self._exact: Dict[tuple, Document] = {}
+        self._lsh: Dict[tuple, LSHIndex] = {}
+        self._lsh_docs: Dict[tuple, List[Document]] = defaultdict(list)
+        self.canonical_with_duplicates: Dict[int, Document] = {}
+
+    def _collapse(self, canonical: Document, duplicate: Document) -> None:
+        meta = canonical.metadata
+        if "provenance" not in meta:
+            meta["provenance"] = [_provenance_entry(meta)]
+        meta["provenance"].append(_provenance_entry(duplicate.metadata))
+        meta["duplicate_count"] = len(meta["provenance"]) - 1
+        # Every section the text appeared in, so section filters still match
+        meta["section_keys"] = sorted({p["section_key"] for p in meta["provenance"]})
+        self.canonical_with_duplicates[id(canonical)] = canonical
+        self.stats.tokens_saved += duplicate.metadata.get("token_count", 0)
+
+    def add(self, doc: Document) -> bool:
+        """Register a chunk. Returns True if it is new and should be embedded."""
+        self.stats.chunks_in += 1
+        partition = (doc.metadata.get("ticker", ""), doc.metadata.get("fiscal_year", ""))
+
+        exact_key = (
+            *partition,
+            hashlib.sha1(normalize_for_hash(doc.page_content).encode("utf-8")).hexdigest(),
+        )
+        canonical = self._exact.get(exact_key)
+        if canonical is not None:
+            self.stats.exact_duplicates += 1
+            self._collapse(canonical, doc)
+            return False
+
+        lsh = self._lsh.get(partition)
+        if lsh is None:
+            lsh = self._lsh[partition] = LSHIndex(self.num_perm, self.bands)
+        signature = self.hasher.signature(doc.page_content)
+        match_id = lsh.query(signature, self.threshold)
+        if match_id is not None:
+            self.stats.near_duplicates += 1
+            self._collapse(self._lsh_docs[partition][match_id], doc)
+            return False
+
+        lsh.insert(signature)
+        self._lsh_docs[partition].append(doc)
+        self._exact[exact_key] = doc
+        self.stats.chunks_kept += 1
+        return True
@@ -1,24 +1,350 @@
 """Document processing and vectorization for 10-K filings."""
-import json
+import os
 import re
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import FAISS
 from langchain_core.documents import Document
 
+from src.dedup import ChunkDeduplicator, DedupStats
+from src.filing_store import list_filings, load_filing, load_filing_file
+from src.tokens import count_tokens, count_tokens_batch
+from src.vector_index import PartitionedIndex, fuse_results
 from src.config import (
-    FILINGS_DIR,
     VECTOR_DB_DIR,
     OPENAI_API_KEY,
     EMBEDDING_MODEL,
     CHUNK_SIZE,
     CHUNK_OVERLAP,
+    CHUNK_STRATEGY,
+    CHUNK_TOKENS,
+    CHUNK_OVERLAP_TOKENS,
+    INDEX_KEEP_VERSIONS,
+    INDEX_WORKERS,
+    EMBEDDING_BATCH_SIZE,
+    DEDUP_ENABLED,
 )
 
 
+# Published index versions live in VECTOR_DB_DIR/<version>; CURRENT names the live one
+INDEX_POINTER = VECTOR_DB_DIR / "CURRENT"
+LEGACY_INDEX_NAME = "faiss_index"
+
+
+def get_published_index_version() -> Optional[str]:
+    """Return the name of the currently published index version."""
+    if INDEX_POINTER.exists():
+        version = INDEX_POINTER.read_text(encoding="utf-8").strip()
+        if version:
+            return version
+    # Indexes built before versioning was introduced
+    if (VECTOR_DB_DIR / LEGACY_INDEX_NAME).exists():
+        return LEGACY_INDEX_NAME
+    return None
+
+
+SECTION_MAPPINGS = {
+    "item_1_business": "Item 1 - Business",
+    "item_1a_risk_factors": "Item 1A - Risk Factors",
+    "item_7_mda": "Item 7 - MD&A",
+    "item_7a_market_risk": "Item 7A - Market Risk",
+}
+
+
+@dataclass
+class IndexBuildStats:
+    """Per-stage timing of a vector store build."""
+    filings: int = 0
+    sections: int = 0
+    chunks: int = 0
+    load_seconds: float = 0.0  # Reading filing JSON (main process)
+    chunk_seconds: float = 0.0  # Wall time until the last section was chunked
+    chunk_cpu_seconds: float = 0.0  # Summed clean/split time across workers
+    embed_seconds: float = 0.0  # Time spent in embedding + index insert calls
+    total_seconds: float = 0.0
+    workers: int = 1
+    dedup: Optional[DedupStats] = None
+
+
+def chunk_id(metadata: dict) -> str:
+    """Stable docstore id of a chunk."""
+    return (
+        f"{metadata['ticker']}:{metadata.get('fiscal_year', '')}:"
+        f"{metadata['section_key']}:{metadata['chunk_index']}"
+    )
+
+
+def clean_text(text: str) -> str:
+    """Clean and normalize text content."""
+    # Remove excessive whitespace
+    text = re.sub(r'\s+', ' ', text)
+    # Remove page numbers and headers
+    text = re.sub(r'Page \d+ of \d+', '', text)
+    text = re.sub(r'Table of Contents', '', text, flags=re.IGNORECASE)
+    # Normalize quotes
+    text = text.replace('"', '"').replace('"', '"')
+    text = text.replace(''', "'").replace(''', "'")
+    return text.strip()
+
+
+def _build_text_splitter() -> RecursiveCharacterTextSplitter:
+    """Create the text splitter used for chunking sections."""
+    return RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        separators=["\n\n", "\n", ". ", " ", ""],
+        length_function=len,
+    )
+
+
+@lru_cache(maxsize=1)
+def _worker_text_splitter() -> RecursiveCharacterTextSplitter:
+    """Per-process text splitter, built once per worker."""
+    return _build_text_splitter()
+
+
+# 10-K structure patterns used by the structured chunker
+_LINE_RE = re.compile(r'[^\n]+')
+_ITEM_HEADING_RE = re.compile(r'^(?:PART\s+[IV]+\b|ITEM\s+\d+[A-C]?\b)', re.IGNORECASE)
+_NUMERIC_LINE_RE = re.compile(r'^[\s$%()\[\],.\-–—\d]*$')
+_SENTENCE_END_RE = re.compile(r'[.!?]["”’)\]]*\s+(?=[A-Z“"(])')
+
+
+@dataclass
+class TextChunk:
+    """A chunk produced by the structured chunker."""
+    text: str
+    char_start: int  # Offsets into the raw (uncleaned) section text
+    char_end: int
+    token_count: int
+    heading: str
+
+
+@dataclass
+class _Unit:
+    """An unsplittable span: a heading, a sentence, or a table block."""
+    start: int
+    end: int
+    kind: str  # "heading", "text", "table"
+    tokens: int
+
+
+class StructuredChunker:
+    """Single-pass, token-targeted chunker aware of 10-K structure.
+
+    Section text is walked line by line once: headings start a new chunk,
+    table lines are kept together as one block, and prose is packed sentence
+    by sentence up to the token target. Every unit is tokenized exactly once,
+    so cost is linear in the section length.
+    """
+
+    def __init__(
+        self,
+        chunk_tokens: int = CHUNK_TOKENS,
+        overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+    ):
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.min_chunk_tokens = chunk_tokens // 4
+
+    def _classify_lines(self, text: str) -> List[tuple]:
+        """Classify each non-empty line as heading, table or text."""
+        lines = []
+        for match in _LINE_RE.finditer(text):
+            line = match.group().strip()
+            if not line:
+                continue
+            if _NUMERIC_LINE_RE.match(line):
+                kind = "table"
+            elif _ITEM_HEADING_RE.match(line) and len(line) <= 120:
+                kind = "heading"
+            elif len(line) <= 100 and line[-1] not in ".,;:" and line[0].isupper():
+                kind = "label"  # heading, or a table row label; resolved below
+            else:
+                kind = "text"
+            lines.append([match.start(), match.end(), kind])
+        
+        # Short labels next to numeric lines are table row labels, not headings
+        for i, line in enumerate(lines):
+            if line[2] != "label":
+                continue
+            prev_table = i > 0 and lines[i - 1][2] == "table"
+            next_table = i + 1 < len(lines) and lines[i + 1][2] == "table"
+            line[2] = "table" if prev_table or next_table else "heading"
+        return lines
+
+    def _iter_units(self, text: str) -> Iterator[_Unit]:
+        """Yield headings, sentences and grouped table blocks in order."""
+        spans = []
+        for start, end, kind in self._classify_lines(text):
+            if kind == "text":
+                sentence_start = start
+                for match in _SENTENCE_END_RE.finditer(text, start, end):
+                    spans.append((sentence_start, match.end(), "text"))
+                    sentence_start = match.end()
+                if sentence_start < end:
+                    spans.append((sentence_start, end, "text"))
+            else:
+                spans.append((start, end, kind))
+        
+        token_counts = count_tokens_batch([text[s:e] for s, e, _ in spans])
+        
+        table: Optional[_Unit] = None
+        for (start, end, kind), tokens in zip(spans, token_counts):
+            if kind == "table":
+                if table and table.tokens + tokens <= self.chunk_tokens:
+                    table.end = end
+                    table.tokens += tokens
+                    continue
+                if table:
+                    yield table
+                table = _Unit(start, end, kind, tokens)
+                continue
+            if table:
+                yield table
+                table = None
+            yield _Unit(start, end, kind, tokens)
+        if table:
+            yield table
+
+    def split(self, text: str) -> List[TextChunk]:
+        """Split section text into structure-aligned chunks."""
+        chunks: List[TextChunk] = []
+        current: List[_Unit] = []
+        current_tokens = 0
+        heading = ""  # Most recent heading
+        chunk_heading = ""  # Heading the current chunk started under
+        
+        def has_body() -> bool:
+            return any(u.kind != "heading" for u in current)
+        
+        def flush():
+            if not has_body():
+                return
+            chunk_text = clean_text(text[current[0].start:current[-1].end])
+            chunks.append(TextChunk(
+                text=chunk_text,
+                char_start=current[0].start,
+                char_end=current[-1].end,
+                token_count=count_tokens(chunk_text),
+                heading=chunk_heading,
+            ))
+        
+        for unit in self._iter_units(text):
+            if unit.kind == "heading":
+                # Headings start a new chunk unless the current one is too small
+                # to stand alone (e.g. a heading followed only by a page number)
+                if has_body() and current_tokens >= self.min_chunk_tokens:
+                    flush()
+                    current, current_tokens = [], 0
+                unit_text = clean_text(text[unit.start:unit.end])
+                if current and not has_body():
+                    # Consecutive headings (e.g. "ITEM 7." + title) form one heading
+                    heading = f"{heading} {unit_text}"
+                else:
+                    heading = unit_text
+                if not has_body():
+                    chunk_heading = heading
+                current.append(unit)
+                current_tokens += unit.tokens
+                continue
+            
+            if current_tokens + unit.tokens > self.chunk_tokens and has_body():
+                flush()
+                # Carry trailing sentences forward as overlap
+                overlap: List[_Unit] = []
+                overlap_tokens = 0
+                for prev in reversed(current):
+                    if prev.kind != "text" or overlap_tokens + prev.tokens > self.overlap_tokens:
+                        break
+                    overlap.insert(0, prev)
+                    overlap_tokens += prev.tokens
+                current, current_tokens = overlap, overlap_tokens
+                chunk_heading = heading
+            
+            current.append(unit)
+            current_tokens += unit.tokens
+        
+        flush()
+        return chunks
+
+
+@lru_cache(maxsize=1)
+def _worker_structured_chunker() -> StructuredChunker:
+    """Per-process structured chunker, built once per worker."""
+    return StructuredChunker()
+
+
+def chunk_section(
+    filing_meta: dict,
+    section_key: str,
+    content: str,
+    strategy: str = CHUNK_STRATEGY,
+) -> List[Document]:
+    """Clean and split one filing section into documents.
+
+    Module-level so it can run in worker processes.
+    """
+    base_metadata = {
+        "ticker": filing_meta["ticker"],
+        "company_name": filing_meta["company_name"],
+        "fiscal_year": filing_meta.get("fiscal_year", ""),
+        "filing_date": filing_meta["filing_date"],
+        "section": SECTION_MAPPINGS[section_key],
+        "section_key": section_key,
+        "chunker": strategy,
+    }
+    
+    if strategy == "structured":
+        chunks = _worker_structured_chunker().split(content)
+        return [
+            Document(
+                page_content=chunk.text,
+                metadata={
+                    **base_metadata,
+                    "chunk_index": i,
+                    "total_chunks": len(chunks),
+                    "token_count": chunk.token_count,
+                    "char_start": chunk.char_start,
+                    "char_end": chunk.char_end,
+                    "heading": chunk.heading,
+                }
+            )
+            for i, chunk in enumerate(chunks)
+        ]
+    
+    content = clean_text(content)
+    chunks = _worker_text_splitter().split_text(content)
+    
+    return [
+        Document(
+            page_content=chunk,
+            metadata={
+                **base_metadata,
+                "chunk_index": i,
+                "total_chunks": len(chunks),
+            }
+        )
+        for i, chunk in enumerate(chunks)
+    ]
+
+
+def _timed_chunk_section(filing_meta: dict, section_key: str, content: str):
+    """Worker entry point returning documents and the CPU time spent."""
+    start = time.perf_counter()
+    docs = chunk_section(filing_meta, section_key, content)
+    return filing_meta["ticker"], docs, time.perf_counter() - start
+
+
 class DocumentProcessor:
     """Processes 10-K filings and creates vector store."""
 
@@ -27,134 +353,238 @@ class DocumentProcessor:
             model=EMBEDDING_MODEL,
             openai_api_key=OPENAI_API_KEY,
         )
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=CHUNK_SIZE,
-            chunk_overlap=CHUNK_OVERLAP,
-            separators=["\n\n", "\n", ". ", " ", ""],
-            length_function=len,
-        )
+        self.text_splitter = _build_text_splitter()
         self.vector_store: Optional[FAISS] = None
+        self.index_version: Optional[str] = None
+        self.last_build_stats: Optional[IndexBuildStats] = None
+        self._partitioned_index: Optional[PartitionedIndex] = None
 
-    def load_filing(self, ticker: str) -> Optional[dict]:
-        """Load a 10-K filing from disk."""
-        filing_path = FILINGS_DIR / f"{ticker}_10k.json"
-        if not filing_path.exists():
-            print(f"Filing not found: {filing_path}")
-            return None
-        
-        with open(filing_path, "r", encoding="utf-8") as f:
-            return json.load(f)
+    def load_filing(self, ticker: str, fiscal_year: Optional[str] = None) -> Optional[dict]:
+        """Load a 10-K filing (default: the latest fiscal year) from disk."""
+        filing = load_filing(ticker, fiscal_year)
+        if filing is None:
+            print(f"Filing not found: {ticker} {fiscal_year or 'latest'}")
+        return filing
 
     def create_documents_from_filing(self, filing_data: dict) -> List[Document]:
         """Create LangChain documents from a 10-K filing."""
         documents = []
-        ticker = filing_data["ticker"]
-        company_name = filing_data["company_name"]
-        filing_date = filing_data["filing_date"]
-        
+        for section_key, content in self._iter_sections(filing_data):
+            documents.extend(chunk_section(filing_data, section_key, content))
+        return documents
+
+    @staticmethod
+    def _iter_sections(filing_data: dict) -> Iterator[tuple]:
+        """Yield (section_key, content) for sections worth indexing."""
         sections = filing_data.get("sections", {})
-        
-        # Process each section
-        section_mappings = {
-            "item_1_business": "Item 1 - Business",
-            "item_1a_risk_factors": "Item 1A - Risk Factors",
-            "item_7_mda": "Item 7 - MD&A",
-            "item_7a_market_risk": "Item 7A - Market Risk",
-        }
-        
-        for section_key, section_name in section_mappings.items():
+        for section_key in SECTION_MAPPINGS:
             content = sections.get(section_key, "")
-            if not content or len(content) < 100:
-                continue
-            
-            # Clean the content
-            content = self._clean_text(content)
-            
-            # Split into chunks
-            chunks = self.text_splitter.split_text(content)
-            
-            for i, chunk in enumerate(chunks):
-                doc = Document(
-                    page_content=chunk,
-                    metadata={
-                        "ticker": ticker,
-                        "company_name": company_name,
-                        "filing_date": filing_date,
-                        "section": section_name,
-                        "section_key": section_key,
-                        "chunk_index": i,
-                        "total_chunks": len(chunks),
-                    }
-                )
-                documents.append(doc)
-        
-        return documents
+            if content and len(content) >= 100:
+                yield section_key, content
 
     def _clean_text(self, text: str) -> str:
         """Clean and normalize text content."""
-        # Remove excessive whitespace
-        text = re.sub(r'\s+', ' ', text)
-        # Remove page numbers and headers
-        text = re.sub(r'Page \d+ of \d+', '', text)
-        text = re.sub(r'Table of Contents', '', text, flags=re.IGNORECASE)
-        # Normalize quotes
-        text = text.replace('"', '"').replace('"', '"')
-        text = text.replace(''', "'").replace(''', "'")
-        return text.strip()
-
-    def build_vector_store(self, tickers: Optional[List[str]] = None) -> FAISS:
-        """Build vector store from 10-K filings."""
-        all_documents = []
+        return clean_text(text)
+
+    def _iter_documents_parallel(
+        self,
+        tickers: List[str],
+        stats: IndexBuildStats,
+    ) -> Iterator[List[Document]]:
+        """Load filings and chunk their sections in a process pool.
+
+        Filings are read in the main process while earlier sections are already
+        being cleaned and split by workers; chunk lists are yielded as soon as
+        each section finishes so embedding can start immediately.
+        """
+        chunk_start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=stats.workers) as executor:
+            futures = []
+            # Every stored fiscal year of each company
+            for _, _, path in list_filings(tickers):
+                load_start = time.perf_counter()
+                filing_data = load_filing_file(path)
+                stats.load_seconds += time.perf_counter() - load_start
+                
+                stats.filings += 1
+                filing_meta = {
+                    "ticker": filing_data["ticker"],
+                    "company_name": filing_data["company_name"],
+                    "fiscal_year": filing_data["fiscal_year"],
+                    "filing_date": filing_data["filing_date"],
+                }
+                for section_key, content in self._iter_sections(filing_data):
+                    futures.append(executor.submit(
+                        _timed_chunk_section, filing_meta, section_key, content
+                    ))
+                    stats.sections += 1
+            
+            for future in as_completed(futures):
+                ticker, docs, cpu_seconds = future.result()
+                stats.chunk_cpu_seconds += cpu_seconds
+                stats.chunk_seconds = time.perf_counter() - chunk_start
+                if docs:
+                    print(f"  {ticker} FY{docs[0].metadata['fiscal_year']} {docs[0].metadata['section']}: {len(docs)} chunks")
+                yield docs
+
+    def build_vector_store(
+        self,
+        tickers: Optional[List[str]] = None,
+        dedup: bool = DEDUP_ENABLED,
+    ) -> FAISS:
+        """Build vector store from 10-K filings.
+
+        Chunks stream from the process pool into batched embedding calls, so
+        embedding overlaps with the CPU-bound cleaning and splitting. Exact and
+        near-duplicate chunks are collapsed before they reach the embedder.
+        """
+        build_start = time.perf_counter()
+        stats = IndexBuildStats(workers=max(1, INDEX_WORKERS))
+        deduplicator = ChunkDeduplicator() if dedup else None
+        self.vector_store = None
         
         # Get list of tickers to process
         if tickers is None:
-            filing_files = list(FILINGS_DIR.glob("*_10k.json"))
-            tickers = [f.stem.replace("_10k", "").upper() for f in filing_files]
+            tickers = sorted({ticker for ticker, _, _ in list_filings()})
         
-        print(f"Processing filings for: {tickers}")
+        print(f"Processing filings for: {tickers} ({stats.workers} workers)")
         
-        for ticker in tickers:
-            filing_data = self.load_filing(ticker)
-            if filing_data:
-                docs = self.create_documents_from_filing(filing_data)
-                all_documents.extend(docs)
-                print(f"  {ticker}: {len(docs)} chunks")
+        pending: List[Document] = []
+        for docs in self._iter_documents_parallel(tickers, stats):
+            if deduplicator:
+                docs = [doc for doc in docs if deduplicator.add(doc)]
+            pending.extend(docs)
+            while len(pending) >= EMBEDDING_BATCH_SIZE:
+                batch, pending = pending[:EMBEDDING_BATCH_SIZE], pending[EMBEDDING_BATCH_SIZE:]
+                self._embed_batch(batch, stats)
+        if pending:
+            self._embed_batch(pending, stats)
         
-        if not all_documents:
+        if not self.vector_store:
             raise ValueError("No documents to process")
         
-        print(f"\nTotal documents: {len(all_documents)}")
-        print("Creating vector store...")
+        if deduplicator:
+            self._apply_provenance(deduplicator)
+            stats.dedup = deduplicator.stats
+            print(
+                f"Deduplicated {deduplicator.stats.chunks_saved} chunks "
+                f"({deduplicator.stats.exact_duplicates} exact, "
+                f"{deduplicator.stats.near_duplicates} near), "
+                f"saving {deduplicator.stats.embedding_calls_saved()} embedding calls"
+            )
         
-        self.vector_store = FAISS.from_documents(
-            all_documents,
-            self.embeddings,
-        )
+        print(f"\nTotal documents: {stats.chunks}")
         
         # Save vector store
         self.save_vector_store()
         
+        stats.total_seconds = time.perf_counter() - build_start
+        self.last_build_stats = stats
         return self.vector_store
 
-    def save_vector_store(self) -> None:
-        """Save vector store to disk."""
-        if self.vector_store:
-            self.vector_store.save_local(str(VECTOR_DB_DIR / "faiss_index"))
-            print(f"Vector store saved to {VECTOR_DB_DIR / 'faiss_index'}")
+    def _embed_batch(self, documents: List[Document], stats: IndexBuildStats) -> None:
+        """Embed a batch of documents and append it to the vector store."""
+        embed_start = time.perf_counter()
+        ids = [chunk_id(doc.metadata) for doc in documents]
+        if self.vector_store is None:
+            self.vector_store = FAISS.from_documents(documents, self.embeddings, ids=ids)
+        else:
+            self.vector_store.add_documents(documents, ids=ids)
+        stats.embed_seconds += time.perf_counter() - embed_start
+        stats.chunks += len(documents)
+
+    def _apply_provenance(self, deduplicator: ChunkDeduplicator) -> None:
+        """Copy duplicate provenance onto stored documents.
+
+        Duplicates can arrive after their canonical chunk was already embedded,
+        so provenance is written to the docstore once the build completes.
+        """
+        for doc in deduplicator.canonical_with_duplicates.values():
+            stored = self.vector_store.docstore.search(chunk_id(doc.metadata))
+            if isinstance(stored, Document):
+                for key in ("provenance", "duplicate_count", "section_keys"):
+                    stored.metadata[key] = doc.metadata[key]
 
-    def load_vector_store(self) -> Optional[FAISS]:
-        """Load vector store from disk."""
-        index_path = VECTOR_DB_DIR / "faiss_index"
+    def save_vector_store(self) -> Optional[str]:
+        """Save vector store as a new index version and publish it.
+
+        The version directory is written completely before the CURRENT pointer
+        is atomically replaced, so readers never observe a half-written index.
+        """
+        if not self.vector_store:
+            return None
+        
+        version = f"{LEGACY_INDEX_NAME}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+        self.vector_store.save_local(str(VECTOR_DB_DIR / version))
+        
+        tmp_pointer = INDEX_POINTER.with_suffix(".tmp")
+        tmp_pointer.write_text(version, encoding="utf-8")
+        os.replace(tmp_pointer, INDEX_POINTER)
+        self.index_version = version
+        print(f"Vector store saved to {VECTOR_DB_DIR / version} (published)")
+        
+        self._prune_index_versions()
+        return version
+
+    def _prune_index_versions(self) -> None:
+        """Remove old index versions, keeping the most recent few."""
+        versions = sorted(
+            p for p in VECTOR_DB_DIR.glob(f"{LEGACY_INDEX_NAME}_*") if p.is_dir()
+        )
+        current = get_published_index_version()
+        for path in versions[:-INDEX_KEEP_VERSIONS]:
+            if path.name != current:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def load_vector_store(self, version: Optional[str] = None) -> Optional[FAISS]:
+        """Load a vector store version (default: the published one) from disk."""
+        version = version or get_published_index_version()
+        if version is None:
+            return None
+        
+        index_path = VECTOR_DB_DIR / version
         if index_path.exists():
-            self.vector_store = FAISS.load_local(
+            store = FAISS.load_local(
                 str(index_path),
                 self.embeddings,
                 allow_dangerous_deserialization=True,
             )
-            print("Vector store loaded successfully")
+            self.attach_vector_store(store, version)
+            print(f"Vector store loaded successfully (version: {version})")
             return self.vector_store
         return None
 
+    def attach_vector_store(
+        self,
+        store: FAISS,
+        version: Optional[str],
+        partitioned_index: Optional[PartitionedIndex] = None,
+    ) -> None:
+        """Serve searches from an already loaded store (and its partitioned view)."""
+        self.vector_store = store
+        self.index_version = version
+        self._partitioned_index = partitioned_index
+
+    @property
+    def partitioned_index(self) -> PartitionedIndex:
+        """Partitioned view of the current store, rebuilt when the store changes."""
+        partitioned = self._partitioned_index
+        if (
+            partitioned is None
+            or partitioned.store is not self.vector_store
+            or partitioned.size != self.vector_store.index.ntotal
+        ):
+            partitioned = self._partitioned_index = PartitionedIndex(self.vector_store)
+        return partitioned
+
+    def available_fiscal_years(self, ticker: str) -> List[str]:
+        """Fiscal years indexed for a company, oldest first."""
+        if not self.vector_store:
+            self.load_vector_store()
+        if not self.vector_store:
+            return []
+        return self.partitioned_index.fiscal_years(ticker)
+
     def get_or_create_vector_store(self, tickers: Optional[List[str]] = None) -> FAISS:
         """Get existing vector store or create new one."""
         # Try to load existing
@@ -165,37 +595,89 @@ class DocumentProcessor:
         # Create new one
         return self.build_vector_store(tickers)
 
-    def similarity_search(
-        self, 
-        query: str, 
+    def similarity_search_with_scores(
+        self,
+        query: Union[str, List[str]],
         k: int = 5,
         filter_ticker: Optional[str] = None,
         filter_section: Optional[str] = None,
-    ) -> List[Document]:
-        """Search for relevant documents."""
+        fiscal_years: Optional[Iterable[str]] = None,
+    ) -> List[Tuple[Document, float]]:
+        """Search for relevant documents, best first, with their cosine similarity to the query.
+
+        Filtered searches only rank the chunks of the matching
+        (ticker, fiscal year, section) partitions. A list of query variants
+        is embedded in one request and searched as one matrix; each chunk
+        is ranked by its best similarity to any variant.
+        """
         if not self.vector_store:
             self.load_vector_store()
         
         if not self.vector_store:
             raise ValueError("No vector store available")
         
-        # Build filter
-        filter_dict = {}
-        if filter_ticker:
-            filter_dict["ticker"] = filter_ticker
-        if filter_section:
-            filter_dict["section_key"] = filter_section
-        
-        if filter_dict:
-            results = self.vector_store.similarity_search(
-                query, 
-                k=k,
-                filter=filter_dict,
-            )
+        queries = [query] if isinstance(query, str) else list(query)
+        if len(queries) == 1:
+            query_vectors = [self.embeddings.embed_query(queries[0])]
         else:
-            results = self.vector_store.similarity_search(query, k=k)
+            query_vectors = self.embeddings.embed_documents(queries)
+        per_query = self.partitioned_index.search(
+            query_vectors,
+            k=k,
+            ticker=filter_ticker,
+            fiscal_years=fiscal_years,
+            section=filter_section,
+        )
+        return per_query[0] if len(per_query) == 1 else fuse_results(per_query, k)
+
+    def similarity_search_by_ticker(
+        self,
+        query: Union[str, List[str]],
+        tickers: List[str],
+        k: int = 5,
+        filter_section: Optional[str] = None,
+        fiscal_years: Optional[Dict[str, Iterable[str]]] = None,
+    ) -> Dict[str, List[Tuple[Document, float]]]:
+        """Top k chunks of each company for the same query, from one embedding call and one search.
+
+        fiscal_years optionally maps each ticker to the years to search.
+        """
+        if not self.vector_store:
+            self.load_vector_store()
         
-        return results
+        if not self.vector_store:
+            raise ValueError("No vector store available")
+        
+        queries = [query] if isinstance(query, str) else list(query)
+        if len(queries) == 1:
+            query_vectors = [self.embeddings.embed_query(queries[0])]
+        else:
+            query_vectors = self.embeddings.embed_documents(queries)
+        per_ticker = self.partitioned_index.search_by_ticker(
+            query_vectors,
+            k=k,
+            tickers=tickers,
+            fiscal_years=fiscal_years,
+            section=filter_section,
+        )
+        return {
+            ticker: per_query[0] if len(per_query) == 1 else fuse_results(per_query, k)
+            for ticker, per_query in per_ticker.items()
+        }
+
+    def similarity_search(
+        self, 
+        query: Union[str, List[str]], 
+        k: int = 5,
+        filter_ticker: Optional[str] = None,
+        filter_section: Optional[str] = None,
+        fiscal_years: Optional[Iterable[str]] = None,
+    ) -> List[Document]:
+        """Search for relevant documents."""
+        results = self.similarity_search_with_scores(
+            query, k, filter_ticker, filter_section, fiscal_years
+        )
+        return [doc for doc, _ in results]
 
 
 def main():
@@ -0,0 +1,153 @@
+"""Subsection structure of generated drafts, so revisions regenerate only what new data touches."""
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Set
+
+from langchain_core.documents import Document
+
+from src.claim_verifier import cited_sources
+from src.compression import fold_plural
+from src.yoy_analysis import parse_value
+
+
+# "## Results of Operations", "**Liquidity and Capital Resources**" or a bare standard title
+_HEADING_RE = re.compile(r"^\s*(?:#{1,6}\s+(?P<markdown>.+?)|\*\*(?P<bold>[^*]{2,80})\*\*:?)\s*$")
+_STANDARD_TITLES = {
+    "overview", "results of operations", "liquidity and capital resources",
+    "critical accounting estimates", "critical accounting policies", "segment results",
+    "general", "products", "products and services", "segments", "competition",
+    "human capital", "research and development", "government regulation",
+}
+_WORD_RE = re.compile(r"[a-z][a-z&'-]+")
+_IGNORED_WORDS = {
+    "the", "and", "for", "with", "from", "that", "this", "our", "its", "new", "add", "added",
+    "update", "updated", "prior", "year", "current", "total", "fiscal", "company",
+    "revise", "change", "please", "section", "business", "mda", "draft",
+}
+# Subsection titles, and the field words routed to them when no subsection mentions a field
+_ROUTES = {
+    "results": {"revenue", "sale", "income", "margin", "expense", "cost", "profit", "earning", "eps", "segment"},
+    "liquidity": {"cash", "debt", "liquidity", "capital", "dividend", "repurchase", "borrowing", "expenditure", "capex"},
+    "critical": {"estimate", "impairment", "goodwill", "reserve", "tax", "accounting"},
+    "segment": {"segment", "division", "region", "geographic"},
+    "product": {"product", "service", "launch", "launched", "platform", "brand"},
+    "competition": {"competition", "competitor", "competitive", "market"},
+    "human capital": {"employee", "headcount", "workforce", "people"},
+}
+_MENTION_SHARE = 0.5  # Share of a field's words a subsection must mention to be affected
+
+
+@dataclass
+class Subsection:
+    """A heading line (empty for text before the first heading) and the text under it."""
+    heading: str
+    title: str
+    body: str
+
+    @property
+    def text(self) -> str:
+        return self.heading + self.body
+
+
+@dataclass
+class Draft:
+    """A generated section kept by the session for incremental revision.
+
+    sources are the retrieved chunks in [Source N] order and citations the
+    matching citation records, so revised subsections cite the same numbers.
+    """
+    section: str  # "business" or "mda"
+    ticker: str
+    fiscal_year: str
+    subsections: List[Subsection]
+    sources: List[Document] = field(default_factory=list)
+    citations: List[Dict[str, Any]] = field(default_factory=list)
+
+    @property
+    def text(self) -> str:
+        return "".join(subsection.text for subsection in self.subsections)
+
+    @classmethod
+    def from_text(cls, section: str, ticker: str, fiscal_year: str, text: str, **kwargs) -> "Draft":
+        return cls(section, ticker, str(fiscal_year), split_subsections(text), **kwargs)
+
+    def cited(self, index: int) -> List[int]:
+        """Source numbers cited in a subsection, in order of first citation."""
+        return list(dict.fromkeys(cited_sources(self.subsections[index].body)))
+
+
+def _heading_title(line: str) -> str:
+    """Title of a heading line, or "" if the line isn't one."""
+    match = _HEADING_RE.match(line)
+    if match:
+        return (match["markdown"] or match["bold"]).strip().strip("*:").strip()
+    if line.strip().rstrip(":").lower() in _STANDARD_TITLES:
+        return line.strip().rstrip(":")
+    return ""
+
+
+def split_subsections(text: str) -> List[Subsection]:
+    """Split a draft at its heading lines; joining the parts' text gives the draft back unchanged."""
+    subsections = [Subsection("", "", "")]
+    for line in text.splitlines(keepends=True):
+        title = _heading_title(line)
+        if title:
+            subsections.append(Subsection(line, title, ""))
+        else:
+            subsections[-1].body += line
+    if not subsections[0].body and len(subsections) > 1:
+        subsections.pop(0)
+    return subsections
+
+
+def _words(text: str) -> Set[str]:
+    """Content words of a text, lowercased, with plurals folded."""
+    words = set()
+    for word in _WORD_RE.findall(text.lower()):
+        if word in _IGNORED_WORDS or len(word) < 3:
+            continue
+        words.add(fold_plural(word))
+    return words
+
+
+def _figure(value: Any) -> str:
+    """The number of a value as a draft would state it, e.g. "130.5" for "$130.5B" ("" if too short to be telling)."""
+    number, _ = parse_value(str(value))
+    figure = f"{abs(number):.10g}"
+    return figure if len(figure.replace(".", "")) >= 3 else ""
+
+
+def affected_subsections(
+    subsections: List[Subsection],
+    changes: Dict[str, Any],
+    previous: Dict[str, Any],
+) -> List[int]:
+    """Indexes of the subsections that changed fields (name -> new value) touch.
+
+    A subsection is affected by a field when it states the field's previous
+    figure or mentions most of the words of its name and value. A field no
+    subsection mentions goes to the subsection mentioning it most, else to
+    the subsection whose title routes its words (e.g. cash -> Liquidity),
+    else to the first titled subsection.
+    """
+    bodies = [_words(subsection.body) for subsection in subsections]
+    affected: Set[int] = set()
+    for name, value in changes.items():
+        terms = _words(f"{name} {value}")
+        old_figure = _figure(previous.get(name, ""))
+        shares = [len(terms & body) / len(terms) if terms else 0.0 for body in bodies]
+        hits = {
+            i for i, subsection in enumerate(subsections)
+            if shares[i] >= _MENTION_SHARE or (old_figure and old_figure in subsection.body.replace(",", ""))
+        }
+        if not hits and max(shares, default=0.0) > 0:
+            hits = {max(range(len(shares)), key=shares.__getitem__)}
+        if not hits:
+            hits = {
+                i for i, subsection in enumerate(subsections)
+                if any(route in subsection.title.lower() and terms & words for route, words in _ROUTES.items())
+            }
+        if not hits:
+            hits = {next((i for i, s in enumerate(subsections) if s.title), 0)}
+        affected |= hits
+    return sorted(affected)
@@ -0,0 +1,222 @@
+"""Numeric consistency check of generated drafts against the figures they were given."""
+import math
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from langchain_core.documents import Document
+
+from src.yoy_analysis import YoYMetric, parse_values
+
+
+# "$1,234.5 million", "(12.3)%", "$2.1B", "45 percent": a number with a currency sign and/or unit
+_FIGURE_RE = re.compile(
+    r"(?P<currency>\$)?\s*\(?(?P<number>\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?)\)?"
+    r"(?:\s?(?P<word>billion|million|thousand|percent(?:age points?)?)\b"
+    r"|(?P<symbol>%|bn\b|[BMK]\b))?",
+    re.I,
+)
+_SCALES = {
+    "billion": 1e9, "bn": 1e9, "b": 1e9,
+    "million": 1e6, "m": 1e6,
+    "thousand": 1e3, "k": 1e3,
+}
+# Filings state table amounts without a unit ("in millions"); such numbers may be at any of these scales
+_IMPLIED_SCALES = (1.0, 1e3, 1e6)
+_UNITS_NOTE_RE = re.compile(r"\bin\s+(billions|millions|thousands)\b", re.I)
+# A table cell: a line (or "|" cell) holding only an amount, as tables are flattened in filing text
+_CELL_RE = re.compile(r"^\s*\$?\s*\(?\s*\$?\s*\d[\d,]*(?:\.\d+)?\s*\)?\s*%?\s*$")
+_YEAR_LIKE_RE = re.compile(r"^(?:19|20)\d{2}$")
+_MAX_DIGITS = 6  # Precision up to which reference figures are indexed
+# Least precision at which retrieved text confirms a figure: stated amounts, and bare table numbers
+_MIN_TEXT_DIGITS = 2
+_MIN_TABLE_DIGITS = 3
+_CONTEXT_WORDS = 8  # Words of its sentence reported before a figure
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+|\n")
+
+
+@dataclass
+class Figure:
+    """A number in a draft, normalized to dollars ("USD") or percent ("%")."""
+    text: str
+    value: float
+    unit: str
+    context: str
+    digits: int = 1  # Significant digits it is stated to
+    source: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"figure": self.text, "unit": self.unit, "context": self.context}
+
+
+@dataclass
+class FactCheckReport:
+    """Figures of a draft and those found in none of the reference data."""
+    checked: int
+    matched: int
+    unmatched: List[Figure] = field(default_factory=list)
+    sources: Dict[str, int] = field(default_factory=dict)  # Matches per reference source
+    milliseconds: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "figures_checked": self.checked,
+            "matched": self.matched,
+            "matched_by_source": self.sources,
+            "unmatched": [figure.to_dict() for figure in self.unmatched],
+            "milliseconds": round(self.milliseconds, 2),
+        }
+
+
+def _significant_digits(number: str) -> int:
+    """Digits a figure is stated to, e.g. 3 for "60.9" and 4 for "1,234"."""
+    digits = number.replace(",", "").replace(".", "").lstrip("0")
+    return max(len(digits), 1)
+
+
+def _key(unit: str, value: float, digits: int) -> str:
+    """Hash key of a value rounded to a number of significant digits."""
+    return f"{unit}:{abs(value):.{digits - 1}e}"
+
+
+def extract_figures(text: str) -> List[Figure]:
+    """Dollar amounts and percentages in a text, with the words leading up to each.
+
+    Bare numbers (years, counts, item and source numbers) are skipped.
+    """
+    figures = []
+    for match in _FIGURE_RE.finditer(text):
+        unit_text = (match["word"] or match["symbol"] or "").lower()
+        if not match["currency"] and not unit_text:
+            continue
+        value = float(match["number"].replace(",", ""))
+        if unit_text == "%" or unit_text.startswith("percent"):
+            unit = "%"
+        else:
+            unit = "USD"
+            value *= _SCALES.get(unit_text, 1.0)
+        before = _SENTENCE_END_RE.split(text[:match.start()])[-1].split()[-_CONTEXT_WORDS:]
+        figures.append(Figure(
+            text=match.group(0).strip(),
+            value=value,
+            unit=unit,
+            context=" ".join(before + [match.group(0).strip()]),
+            digits=_significant_digits(match["number"]),
+        ))
+    return figures
+
+
+class FactChecker:
+    """Matches the figures of a draft against a hash index of reference figures.
+
+    Every reference figure is indexed at each precision up to _MAX_DIGITS
+    significant digits (from 1 for provided data, from 2-3 for retrieved
+    text), so a draft figure is looked up at the precision it is written
+    to: "$60.9 billion" matches a reported 60,922 (millions) and "114%" a
+    computed 114.27%. Signs are ignored, as drafts state decreases as
+    positive amounts.
+    """
+
+    def __init__(self):
+        self.index: Dict[str, str] = {}  # Key -> first source holding the figure
+
+    def _add(self, source: str, value: float, units: Iterable[str], min_digits: int = 1):
+        if not math.isfinite(value) or value == 0:
+            return
+        for unit in units:
+            for digits in range(min_digits, _MAX_DIGITS + 1):
+                self.index.setdefault(_key(unit, value, digits), source)
+
+    def add_value(self, source: str, value: float, unit: str):
+        """Index a value with a parse_value unit ("B", "M", "%", "") or a reported unit ("USD", ...)."""
+        if unit == "%":
+            self._add(source, value, ["%"])
+        elif unit in ("B", "M"):
+            self._add(source, value * _SCALES[unit.lower()], ["USD"])
+        elif unit:
+            self._add(source, value, ["USD"])
+        else:
+            for scale in _IMPLIED_SCALES:
+                self._add(source, value * scale, ["USD"])
+
+    def add_text(self, source: str, text: str):
+        """Index the figures in a text, at _MIN_TEXT_DIGITS or more.
+
+        Bare numbers count only as table cells (at the stated "in millions"
+        scale, else at any of _IMPLIED_SCALES, and at _MIN_TABLE_DIGITS or
+        more) or, in text with a units note, at that scale. Years and the
+        bare numbers of prose (counts, item numbers) are skipped.
+        """
+        note = _UNITS_NOTE_RE.search(text)
+        stated = (_SCALES[note.group(1).lower()[:-1]],) if note else None
+        cells = {
+            cell.strip() for line in text.splitlines() for cell in line.split("|")
+            if _CELL_RE.match(cell)
+        }
+        for match in _FIGURE_RE.finditer(text):
+            value = float(match["number"].replace(",", ""))
+            unit_text = (match["word"] or match["symbol"] or "").lower()
+            if unit_text == "%" or unit_text.startswith("percent"):
+                self._add(source, value, ["%"], _MIN_TEXT_DIGITS)
+            elif unit_text:
+                self._add(source, value * _SCALES[unit_text], ["USD"], _MIN_TEXT_DIGITS)
+            elif _YEAR_LIKE_RE.match(match["number"]):
+                continue
+            elif match.group(0).strip() in cells or match["currency"] or stated:
+                # "$" marks an amount of a table stated in a unit; the scale then is the note's or any implied one
+                for scale in stated or _IMPLIED_SCALES:
+                    self._add(source, value * scale, ["USD"], _MIN_TABLE_DIGITS)
+
+    def add_financial_data(self, financial_data: Dict[str, Any], source: str = "provided"):
+        """Index user-provided values (parsed like YoYAnalyzer.parse_value) and raw input."""
+        fields = {k: v for k, v in financial_data.items() if k != "raw_input"}
+        numbers, units = parse_values(fields.values())
+        for value, unit in zip(numbers.tolist(), units.tolist()):
+            self.add_value(source, value, unit)
+        if financial_data.get("raw_input"):
+            self.add_text(source, financial_data["raw_input"])
+
+    def add_yoy_metrics(self, metrics: List[YoYMetric], source: str = "yoy"):
+        """Index analyzed metrics with their computed changes."""
+        for metric in metrics:
+            for value in (metric.current_value, metric.prior_value, metric.change_absolute):
+                if value is not None:
+                    self.add_value(source, value, metric.unit)
+            if metric.change_percent is not None:
+                self.add_value(source, metric.change_percent, "%")
+
+    def add_documents(self, documents: List[Document]):
+        """Index retrieved chunks, labeled as numbered in the prompt."""
+        for i, doc in enumerate(documents, start=1):
+            self.add_text(f"Source {i}", doc.page_content)
+
+    def lookup(self, figure: Figure) -> Optional[str]:
+        """Source of a figure, at the precision it is written to.
+
+        Retrieved text isn't indexed below _MIN_TEXT_DIGITS, so a figure
+        stated to fewer digits ("3%") is also looked up at that precision
+        and matches only a source stating the same figure ("3%", not "3.4%").
+        """
+        for digits in (figure.digits, _MIN_TEXT_DIGITS, _MIN_TABLE_DIGITS):
+            source = self.index.get(_key(figure.unit, figure.value, min(max(digits, figure.digits), _MAX_DIGITS)))
+            if source is not None:
+                return source
+        return None
+
+    def check(self, generated_text: str) -> FactCheckReport:
+        """Check every figure of a draft."""
+        started = time.perf_counter()
+        report = FactCheckReport(checked=0, matched=0)
+        seen: Set[Tuple[str, str]] = set()
+        for figure in extract_figures(generated_text):
+            report.checked += 1
+            figure.source = self.lookup(figure)
+            if figure.source is not None:
+                report.matched += 1
+                report.sources[figure.source] = report.sources.get(figure.source, 0) + 1
+            elif (figure.text, figure.context) not in seen:
+                seen.add((figure.text, figure.context))
+                report.unmatched.append(figure)
+        report.milliseconds = (time.perf_counter() - started) * 1000
+        return report
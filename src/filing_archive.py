@@ -0,0 +1,79 @@
+"""Compressed, content-addressed archive of raw 10-K primary documents."""
+import gzip
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from src.config import RAW_FILINGS_DIR
+
+
+class FilingArchive:
+    """Stores raw filing HTML gzip-compressed, keyed by accession number.
+
+    An accession number identifies an immutable EDGAR submission, so an
+    archived document never needs to be downloaded again. Each document has
+    a JSON sidecar with the filing metadata needed to re-parse it offline.
+    """
+
+    def __init__(self, root: Path = RAW_FILINGS_DIR):
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _html_path(self, accession_number: str) -> Path:
+        return self.root / f"{accession_number}.html.gz"
+
+    def _meta_path(self, accession_number: str) -> Path:
+        return self.root / f"{accession_number}.json"
+
+    def has(self, accession_number: str) -> bool:
+        """Check whether a filing is archived."""
+        return self._html_path(accession_number).exists() and self._meta_path(accession_number).exists()
+
+    def store(self, accession_number: str, html_content: str, metadata: Dict) -> Path:
+        """Archive a raw document (no-op if already archived)."""
+        html_path = self._html_path(accession_number)
+        if self.has(accession_number):
+            return html_path
+
+        raw = html_content.encode("utf-8")
+        tmp_path = html_path.with_suffix(".tmp")
+        with gzip.open(tmp_path, "wb", compresslevel=6) as f:
+            f.write(raw)
+        os.replace(tmp_path, html_path)
+
+        meta = {
+            **metadata,
+            "accession_number": accession_number,
+            "sha256": hashlib.sha256(raw).hexdigest(),
+            "raw_bytes": len(raw),
+            "compressed_bytes": html_path.stat().st_size,
+        }
+        with open(self._meta_path(accession_number), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        return html_path
+
+    def load(self, accession_number: str) -> Optional[str]:
+        """Load an archived raw document."""
+        html_path = self._html_path(accession_number)
+        if not html_path.exists():
+            return None
+        with gzip.open(html_path, "rb") as f:
+            return f.read().decode("utf-8")
+
+    def metadata(self, accession_number: str) -> Optional[Dict]:
+        """Load the sidecar metadata of an archived document."""
+        meta_path = self._meta_path(accession_number)
+        if not meta_path.exists():
+            return None
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def entries(self) -> List[Dict]:
+        """Metadata of every archived document."""
+        entries = []
+        for meta_path in sorted(self.root.glob("*.json")):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                entries.append(json.load(f))
+        return entries
@@ -0,0 +1,145 @@
+"""On-disk layout of parsed filings, partitioned by company and fiscal year."""
+import json
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from src.config import FILINGS_DIR
+from src.table_extractor import FilingTables, FinancialTable
+
+
+# {ticker}_{fiscal_year}_10k.json; {ticker}_10k.json is the pre-multi-year layout
+_YEAR_FILE_RE = re.compile(r"^([A-Z.\-]+)_(\d{4})_10k$")
+_LEGACY_FILE_RE = re.compile(r"^([A-Z.\-]+)_10k$")
+_DEI_FISCAL_YEAR_RE = re.compile(r"(?m)^(20\d{2})\nFY$")
+
+
+def filing_path(ticker: str, fiscal_year: Optional[str] = None) -> Path:
+    """Path of a filing file (legacy single-filing path if no fiscal year)."""
+    if fiscal_year:
+        return FILINGS_DIR / f"{ticker}_{fiscal_year}_10k.json"
+    return FILINGS_DIR / f"{ticker}_10k.json"
+
+
+def tables_path(ticker: str, fiscal_year: str) -> Path:
+    """Path of a filing's extracted financial tables."""
+    return FILINGS_DIR / f"{ticker}_{fiscal_year}_tables.json"
+
+
+def fiscal_year_from_report_date(report_date: str, filing_date: str) -> str:
+    """Fiscal year of a filing from its period-of-report date."""
+    if report_date:
+        return report_date[:4]
+    # Filings made early in the year usually cover the prior calendar year
+    year, month = int(filing_date[:4]), int(filing_date[5:7])
+    return str(year - 1 if month <= 4 else year)
+
+
+def infer_fiscal_year(filing: dict) -> str:
+    """Fiscal year of a stored filing, including files saved before it was recorded."""
+    if filing.get("fiscal_year"):
+        return str(filing["fiscal_year"])
+    # Inline XBRL headers carry the DocumentFiscalYearFocus as "<year>\nFY"
+    head = filing.get("sections", {}).get("full_text", "")[:300]
+    match = _DEI_FISCAL_YEAR_RE.search(head)
+    if match:
+        return match.group(1)
+    return fiscal_year_from_report_date(filing.get("report_date", ""), filing["filing_date"])
+
+
+def _stored_fiscal_year(path: Path) -> str:
+    """Fiscal year of a filing file, from its head when possible.
+
+    save_filing writes the metadata and the start of full_text first, so the
+    whole (multi-MB) file only has to be parsed for unusual legacy files.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        head = f.read(4096)
+    fields = dict(re.findall(r'"(fiscal_year|filing_date|report_date)":\s*"([^"]*)"', head))
+    text = re.search(r'"full_text":\s*"((?:[^"\\]|\\.)*)', head)
+    if "filing_date" not in fields:
+        return load_filing_file(path)["fiscal_year"]
+    full_text = text.group(1).replace("\\n", "\n") if text else ""
+    return infer_fiscal_year({**fields, "sections": {"full_text": full_text}})
+
+
+def list_filings(tickers: Optional[List[str]] = None) -> List[Tuple[str, str, Path]]:
+    """List stored filings as (ticker, fiscal_year, path), newest year first.
+
+    A legacy {ticker}_10k.json is skipped when a per-year file covers its year.
+    """
+    filings: Dict[Tuple[str, str], Path] = {}
+    legacy: List[Tuple[str, Path]] = []
+    for path in sorted(FILINGS_DIR.glob("*_10k.json")):
+        match = _YEAR_FILE_RE.match(path.stem)
+        if match:
+            if not tickers or match.group(1) in tickers:
+                filings[(match.group(1), match.group(2))] = path
+            continue
+        match = _LEGACY_FILE_RE.match(path.stem)
+        if match and (not tickers or match.group(1) in tickers):
+            legacy.append((match.group(1), path))
+
+    for ticker, path in legacy:
+        filings.setdefault((ticker, _stored_fiscal_year(path)), path)
+
+    ordered = sorted(filings, key=lambda key: (key[0], -int(key[1])))
+    return [(ticker, fiscal_year, filings[(ticker, fiscal_year)]) for ticker, fiscal_year in ordered]
+
+
+def load_filing_file(path: Path) -> dict:
+    """Load a filing file and make sure it carries its fiscal year."""
+    with open(path, "r", encoding="utf-8") as f:
+        filing = json.load(f)
+    filing["fiscal_year"] = infer_fiscal_year(filing)
+    return filing
+
+
+def load_filing(ticker: str, fiscal_year: Optional[str] = None) -> Optional[dict]:
+    """Load a company's filing for a fiscal year (default: the latest)."""
+    for _, stored_year, path in list_filings([ticker]):
+        if fiscal_year is None or stored_year == str(fiscal_year):
+            return load_filing_file(path)
+    return None
+
+
+def save_tables(ticker: str, fiscal_year: str, tables: List[FinancialTable]) -> Path:
+    """Store a filing's extracted financial tables."""
+    path = tables_path(ticker, fiscal_year)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(FilingTables(tables).to_json(), f, ensure_ascii=False)
+    return path
+
+
+def load_tables(ticker: str, fiscal_year: str) -> Optional[FilingTables]:
+    """Load a filing's financial tables, if they were extracted."""
+    path = tables_path(ticker, fiscal_year)
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return FilingTables.from_json(json.load(f))
+
+
+def lookup_reported_values(
+    ticker: str,
+    labels: List[str],
+    period: str,
+) -> Dict[str, Tuple[float, str]]:
+    """(value, unit) of table rows in a period, from the newest filing reporting each.
+
+    The FY N-1 figure is normally in the FY N-1 filing's current-year column,
+    but a later filing's comparative column (possibly restated) wins.
+    """
+    found: Dict[str, Tuple[float, str]] = {}
+    for _, fiscal_year, _ in list_filings([ticker]):
+        if fiscal_year < period or len(found) == len(labels):
+            break
+        tables = load_tables(ticker, fiscal_year)
+        if tables is None:
+            continue
+        for label in labels:
+            if label not in found:
+                value = tables.lookup(label, period)
+                if value is not None:
+                    found[label] = value
+    return found
@@ -0,0 +1,239 @@
+"""Columnar store of annual us-gaap facts from EDGAR's XBRL companyfacts API."""
+import json
+import os
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.config import FINANCIALS_DIR
+
+try:
+    import pyarrow  # noqa: F401
+    _HAS_PARQUET = True
+except ImportError:
+    _HAS_PARQUET = False
+
+
+# Metric names used in user input / YoY tables -> us-gaap concepts, in order of preference
+METRIC_CONCEPTS = {
+    "Revenue": [
+        "Revenues",
+        "RevenueFromContractWithCustomerExcludingAssessedTax",
+        "SalesRevenueNet",
+    ],
+    "Gross Profit": ["GrossProfit"],
+    "Operating Income": ["OperatingIncomeLoss"],
+    "Net Income": ["NetIncomeLoss"],
+    "Diluted EPS": ["EarningsPerShareDiluted"],
+    "Operating Cash Flow": ["NetCashProvidedByUsedInOperatingActivities"],
+    "Capital Expenditures": ["PaymentsToAcquirePropertyPlantAndEquipment"],
+    "Cash and Cash Equivalents": ["CashAndCashEquivalentsAtCarryingValue"],
+    "Total Assets": ["Assets"],
+    "Long-Term Debt": ["LongTermDebtNoncurrent", "LongTermDebt"],
+}
+
+# Lowercase keywords that identify a metric in free-form metric names
+_METRIC_KEYWORDS = [
+    ("Gross Profit", ("gross profit",)),
+    ("Operating Income", ("operating income", "operating profit")),
+    ("Net Income", ("net income", "net earnings")),
+    ("Diluted EPS", ("eps", "earnings per share")),
+    ("Operating Cash Flow", ("operating cash flow", "cash from operations", "operating activities")),
+    ("Capital Expenditures", ("capital expenditure", "capex")),
+    ("Cash and Cash Equivalents", ("cash and cash equivalents", "cash balance")),
+    ("Total Assets", ("total assets",)),
+    ("Long-Term Debt", ("long-term debt", "long term debt")),
+    ("Revenue", ("revenue", "sales")),
+]
+
+_COLUMNS = ["concept", "unit", "fiscal_year", "period_start", "period_end", "value", "accession", "filed"]
+
+
+def format_fact(value: float, unit: str) -> str:
+    """Human-readable fact value, e.g. "$61.86B"."""
+    if unit == "USD":
+        for scale, suffix in ((1e9, "B"), (1e6, "M")):
+            if abs(value) >= scale:
+                return f"${value / scale:,.2f}{suffix}"
+        return f"${value:,.0f}"
+    if unit == "USD/shares":
+        return f"${value:.2f}"
+    if unit == "%":
+        return f"{value:.1f}%"
+    return f"{value:,.0f} {unit}"
+
+
+def resolve_metric(name: str) -> Optional[str]:
+    """Map a free-form metric name (e.g. "Total revenue") to a METRIC_CONCEPTS key."""
+    lowered = name.lower()
+    if "growth" in lowered or "margin" in lowered or "%" in lowered:
+        return None
+    for metric, keywords in _METRIC_KEYWORDS:
+        if any(keyword in lowered for keyword in keywords):
+            return metric
+    return None
+
+
+def parse_companyfacts(data: dict) -> pd.DataFrame:
+    """Flatten a companyfacts JSON document into one row per annual us-gaap fact.
+
+    Only full-year 10-K values are kept (durations of about a year, or
+    balance-sheet instants). Each fact is labelled with the fiscal year of its
+    own period, not of the filing that reported it: a FY2024 10-K also reports
+    FY2023 and FY2022 comparatives. Restated values from later filings win.
+    """
+    rows = []
+    for concept, fact in data.get("facts", {}).get("us-gaap", {}).items():
+        for unit, entries in fact.get("units", {}).items():
+            for entry in entries:
+                if entry.get("form") not in ("10-K", "10-K/A") or entry.get("fp") != "FY":
+                    continue
+                rows.append((
+                    concept, unit, entry.get("fy"), entry.get("start"), entry["end"],
+                    entry["val"], entry.get("accn", ""), entry.get("filed", ""),
+                ))
+    frame = pd.DataFrame(rows, columns=_COLUMNS)
+    if frame.empty:
+        return frame
+
+    frame = frame.dropna(subset=["fiscal_year"])
+    end = pd.to_datetime(frame["period_end"])
+    start = pd.to_datetime(frame["period_start"])
+    duration = (end - start).dt.days
+    frame = frame[duration.isna() | duration.between(330, 380)].copy()
+    end = end[frame.index]
+
+    # Period fiscal year = filing fiscal year minus how many years before the filing's period it ends
+    filing_end = end.groupby(frame["accession"]).transform("max")
+    years_back = ((filing_end - end).dt.days / 365.25).round().astype(int)
+    frame["fiscal_year"] = frame["fiscal_year"].astype(int) - years_back
+
+    frame = frame.sort_values("filed").drop_duplicates(
+        subset=["concept", "unit", "fiscal_year"], keep="last"
+    )
+    frame["concept"] = frame["concept"].astype("category")
+    frame["unit"] = frame["unit"].astype("category")
+    frame["value"] = frame["value"].astype("float64")
+    return frame.reset_index(drop=True)
+
+
+class CompanyFacts:
+    """Annual facts of one company, with O(1) (concept, fiscal_year) lookups.
+
+    Values live in numpy columns; a dict maps each (concept, fiscal_year) to
+    its row, preferring USD over other units (shares, USD/shares).
+    """
+
+    def __init__(self, cik: str, frame: pd.DataFrame):
+        self.cik = cik
+        self.frame = frame
+        self.values = frame["value"].to_numpy(dtype=np.float64) if len(frame) else np.zeros(0)
+        self.units = frame["unit"].astype(str).to_numpy() if len(frame) else np.zeros(0, dtype=object)
+        self._rows: Dict[Tuple[str, int], int] = {}
+        if len(frame):
+            concepts = frame["concept"].astype(str).to_numpy()
+            years = frame["fiscal_year"].to_numpy()
+            for row in np.argsort(self.units == "USD", kind="stable"):
+                self._rows[(concepts[row], int(years[row]))] = int(row)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def get(self, concept: str, fiscal_year: int) -> Optional[Tuple[float, str]]:
+        """(value, unit) of a concept for a fiscal year."""
+        row = self._rows.get((concept, int(fiscal_year)))
+        if row is None:
+            return None
+        return float(self.values[row]), self.units[row]
+
+    def metric(self, name: str, fiscal_year: int) -> Optional[Tuple[float, str]]:
+        """(value, unit) of a METRIC_CONCEPTS metric, trying its concepts in order."""
+        for concept in METRIC_CONCEPTS.get(name, []):
+            found = self.get(concept, fiscal_year)
+            if found is not None:
+                return found
+        return None
+
+    def metrics_for_year(self, fiscal_year: int) -> Dict[str, Tuple[float, str]]:
+        """Every METRIC_CONCEPTS metric reported for a fiscal year."""
+        found = {}
+        for name in METRIC_CONCEPTS:
+            value = self.metric(name, fiscal_year)
+            if value is not None:
+                found[name] = value
+        return found
+
+    def fiscal_years(self) -> List[int]:
+        """Fiscal years with at least one fact, oldest first."""
+        return sorted({year for _, year in self._rows})
+
+
+class FinancialStore:
+    """Per-CIK columnar files of annual facts (parquet, or pickle without pyarrow)."""
+
+    def __init__(self, root: Path = FINANCIALS_DIR):
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._loaded: Dict[str, CompanyFacts] = {}
+
+    def _path(self, cik: str, suffix: str) -> Path:
+        return self.root / f"CIK{cik}{suffix}"
+
+    def save(self, cik: str, frame: pd.DataFrame) -> Path:
+        """Write a company's facts, replacing the previous file atomically."""
+        suffix = ".parquet" if _HAS_PARQUET else ".pkl"
+        path = self._path(cik, suffix)
+        tmp_path = path.with_suffix(".tmp")
+        if _HAS_PARQUET:
+            frame.to_parquet(tmp_path, index=False)
+        else:
+            frame.to_pickle(tmp_path)
+        os.replace(tmp_path, path)
+        self._loaded[cik] = CompanyFacts(cik, frame)
+        return path
+
+    def ingest(self, data: dict, cik: Optional[str] = None) -> CompanyFacts:
+        """Parse and store a companyfacts JSON document."""
+        cik = cik or str(data.get("cik", "")).zfill(10)
+        self.save(cik, parse_companyfacts(data))
+        return self._loaded[cik]
+
+    def ingest_file(self, path: Path, cik: Optional[str] = None) -> CompanyFacts:
+        """Parse and store a companyfacts JSON file (e.g. a test fixture)."""
+        with open(path, "r", encoding="utf-8") as f:
+            return self.ingest(json.load(f), cik)
+
+    def load(self, cik: str) -> Optional[CompanyFacts]:
+        """Load a company's facts (cached after the first load)."""
+        if cik in self._loaded:
+            return self._loaded[cik]
+        parquet_path, pickle_path = self._path(cik, ".parquet"), self._path(cik, ".pkl")
+        if _HAS_PARQUET and parquet_path.exists():
+            frame = pd.read_parquet(parquet_path)
+        elif pickle_path.exists():
+            frame = pd.read_pickle(pickle_path)
+        else:
+            return None
+        self._loaded[cik] = CompanyFacts(cik, frame)
+        return self._loaded[cik]
+
+    def prior_year_metrics(self, cik: str, fiscal_year: str) -> Dict[str, Tuple[float, str]]:
+        """Reported metrics of the fiscal year before the one being drafted."""
+        facts = self.load(cik)
+        if facts is None or not re.fullmatch(r"\d{4}", str(fiscal_year)):
+            return {}
+        return facts.metrics_for_year(int(fiscal_year) - 1)
+
+
+_financial_store: Optional[FinancialStore] = None
+
+
+def get_financial_store() -> FinancialStore:
+    """Get the process-wide financial store."""
+    global _financial_store
+    if _financial_store is None:
+        _financial_store = FinancialStore()
+    return _financial_store
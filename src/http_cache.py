@@ -0,0 +1,78 @@
+"""On-disk HTTP cache keyed by URL, with validators for conditional requests."""
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+from src.config import HTTP_CACHE_DIR
+
+
+@dataclass
+class CachedResponse:
+    """A cached response body and its validators."""
+    url: str
+    body: bytes
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: str
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """Headers that make the next request conditional on this copy."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class HTTPCache:
+    """Stores response bodies plus their ETag/Last-Modified validators."""
+
+    def __init__(self, root: Path = HTTP_CACHE_DIR):
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _key(self, url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()[:32]
+
+    def get(self, url: str) -> Optional[CachedResponse]:
+        """Get the cached response for a URL, if any."""
+        key = self._key(url)
+        meta_path = self.root / f"{key}.json"
+        body_path = self.root / f"{key}.body"
+        if not meta_path.exists() or not body_path.exists():
+            return None
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        return CachedResponse(
+            url=url,
+            body=body_path.read_bytes(),
+            etag=meta.get("etag"),
+            last_modified=meta.get("last_modified"),
+            fetched_at=meta.get("fetched_at", ""),
+        )
+
+    def put(
+        self,
+        url: str,
+        body: bytes,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> None:
+        """Cache a response body and its validators."""
+        key = self._key(url)
+        body_path = self.root / f"{key}.body"
+        tmp_path = body_path.with_suffix(".tmp")
+        tmp_path.write_bytes(body)
+        os.replace(tmp_path, body_path)
+        with open(self.root / f"{key}.json", "w", encoding="utf-8") as f:
+            json.dump({
+                "url": url,
+                "etag": etag,
+                "last_modified": last_modified,
+                "fetched_at": datetime.now().isoformat(),
+            }, f, indent=2)
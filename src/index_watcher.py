@@ -0,0 +1,107 @@
+"""Background hot reload of newly published vector index versions."""
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+from langchain_community.vectorstores import FAISS
+
+from src.config import INDEX_POLL_INTERVAL
+from src.document_processor import DocumentProcessor, get_published_index_version
+from src.vector_index import PartitionedIndex
+
+
+@dataclass(frozen=True)
+class IndexSnapshot:
+    """An immutable (version, vector store) pair served to generations."""
+    version: str
+    vector_store: FAISS
+    partitioned_index: Optional[PartitionedIndex] = None
+
+
+class IndexWatcher:
+    """Watches for newly published index versions and swaps them in.
+
+    New versions are loaded on a background thread; the live snapshot is then
+    replaced with a single reference assignment. Generations that already hold
+    the previous snapshot keep using it until they finish.
+    """
+
+    def __init__(self, poll_interval: float = INDEX_POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self._snapshot: Optional[IndexSnapshot] = None
+        self._load_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def version(self) -> Optional[str]:
+        """Version of the live snapshot, if any."""
+        return self._snapshot.version if self._snapshot else None
+
+    def snapshot(self) -> Optional[IndexSnapshot]:
+        """Get the live snapshot, loading the published index on first use."""
+        if self._snapshot is None:
+            self.check_for_update()
+        return self._snapshot
+
+    def check_for_update(self) -> bool:
+        """Load and swap in the published index if it changed. Returns True on swap."""
+        version = get_published_index_version()
+        if version is None or version == self.version:
+            return False
+
+        # Only one loader at a time; a concurrent caller re-checks after waiting
+        with self._load_lock:
+            if version == self.version:
+                return False
+
+            processor = DocumentProcessor()
+            store = processor.load_vector_store(version)
+            if store is None:
+                return False
+
+            # Partition off the request path too, so pinning a snapshot is free
+            partitioned_index = PartitionedIndex(store)
+            previous = self.version
+            self._snapshot = IndexSnapshot(
+                version=version,
+                vector_store=store,
+                partitioned_index=partitioned_index,
+            )
+
+        print(f"Index hot reload: {previous or 'none'} -> {version}")
+        return True
+
+    def _run(self) -> None:
+        """Polling loop executed on the background thread."""
+        while not self._stop_event.wait(self.poll_interval):
+            try:
+                self.check_for_update()
+            except Exception as e:
+                print(f"Index hot reload failed: {e}")
+
+    def start(self) -> None:
+        """Start watching in the background."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="index-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background watcher."""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=self.poll_interval + 1)
+            self._thread = None
+
+
+_index_watcher: Optional[IndexWatcher] = None
+
+
+def get_index_watcher() -> IndexWatcher:
+    """Get the process-wide index watcher."""
+    global _index_watcher
+    if _index_watcher is None:
+        _index_watcher = IndexWatcher()
+    return _index_watcher
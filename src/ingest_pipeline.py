@@ -0,0 +1,281 @@
+"""Streaming EDGAR-to-index ingestion with concurrent, bounded stages."""
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, List, Optional
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from src.config import (
+    EMBEDDING_BATCH_SIZE,
+    INDEX_WORKERS,
+    INGEST_DOWNLOAD_WORKERS,
+    INGEST_QUEUE_SIZE,
+    DEDUP_ENABLED,
+    FILING_YEARS,
+)
+from src.dedup import ChunkDeduplicator
+from src.document_processor import DocumentProcessor, chunk_id, chunk_section
+from src.sec_downloader import SECDownloader, parse_10k_html
+
+
+_DONE = object()
+
+
+@dataclass
+class StageMetrics:
+    """Throughput counters for one pipeline stage."""
+    name: str
+    workers: int
+    items_in: int = 0
+    items_out: int = 0
+    errors: int = 0
+    busy_seconds: float = 0.0  # Summed across the stage's workers
+    blocked_seconds: float = 0.0  # Time spent waiting on a full downstream queue
+
+    @property
+    def items_per_second(self) -> float:
+        """Per-worker processing rate."""
+        return self.items_in / self.busy_seconds if self.busy_seconds else 0.0
+
+
+class Stage:
+    """A pool of worker threads reading from a bounded inbox.
+
+    `fn` maps one input item to an iterable of output items, usually a
+    generator. Each output goes to the next stage's bounded inbox as soon
+    as it is produced, so downstream work overlaps with the rest of the
+    item and a slow stage applies backpressure all the way upstream (a
+    generator is paused while its output waits for room). Outputs produced
+    before an error are kept.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[Any], Iterable[Any]],
+        workers: int = 1,
+        queue_size: int = INGEST_QUEUE_SIZE,
+    ):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.inbox: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size)
+        self.downstream: Optional["Stage"] = None
+        self.metrics = StageMetrics(name=name, workers=workers)
+        self._lock = threading.Lock()
+        self._active = workers
+        self._threads: List[threading.Thread] = []
+
+    def _emit(self, item: Any) -> None:
+        if self.downstream is None:
+            return
+        start = time.perf_counter()
+        self.downstream.inbox.put(item)
+        with self._lock:
+            self.metrics.blocked_seconds += time.perf_counter() - start
+            self.metrics.items_out += 1
+
+    def _run(self) -> None:
+        while True:
+            item = self.inbox.get()
+            if item is _DONE:
+                break
+            busy = 0.0
+            start = time.perf_counter()
+            try:
+                outputs = iter(self.fn(item))
+                while True:
+                    # Busy time is time spent producing outputs, not waiting to emit them
+                    try:
+                        output = next(outputs)
+                    except StopIteration:
+                        break
+                    busy += time.perf_counter() - start
+                    self._emit(output)
+                    start = time.perf_counter()
+            except Exception as e:
+                with self._lock:
+                    self.metrics.errors += 1
+                print(f"[{self.name}] error: {e}")
+            busy += time.perf_counter() - start
+            with self._lock:
+                self.metrics.items_in += 1
+                self.metrics.busy_seconds += busy
+
+        # The last worker out tells every downstream worker to finish
+        with self._lock:
+            self._active -= 1
+            last = self._active == 0
+        if last and self.downstream is not None:
+            for _ in range(self.downstream.workers):
+                self.downstream.inbox.put(_DONE)
+
+    def start(self) -> None:
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def join(self) -> None:
+        for thread in self._threads:
+            thread.join()
+
+
+@dataclass
+class IngestResult:
+    """Outcome of an ingest run."""
+    stages: List[StageMetrics]
+    wall_seconds: float
+    filings: int
+    chunks: int
+    index_version: Optional[str]
+
+    @property
+    def slowest_stage_seconds(self) -> float:
+        """Busy time of the bottleneck stage, normalized by its worker count."""
+        return max((m.busy_seconds / m.workers for m in self.stages), default=0.0)
+
+
+class IngestPipeline:
+    """download -> parse -> chunk -> embed -> index-append, all overlapped.
+
+    Network-bound downloading runs on threads; parsing and chunking are
+    CPU-bound and are handed to a shared process pool; embedding batches
+    run while later filings are still being fetched; a single index writer
+    appends to the live store, replacing each re-ingested filing's chunks.
+    """
+
+    def __init__(
+        self,
+        download_workers: int = INGEST_DOWNLOAD_WORKERS,
+        cpu_workers: int = INDEX_WORKERS,
+        dedup: bool = DEDUP_ENABLED,
+        years: int = FILING_YEARS,
+    ):
+        self.downloader = SECDownloader()
+        self.processor = DocumentProcessor()
+        self.download_workers = max(1, download_workers)
+        self.cpu_workers = max(1, cpu_workers)
+        self.years = max(1, years)
+        self.deduplicator = ChunkDeduplicator() if dedup else None
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._replaced_filings = set()
+        self._filings = 0
+        self._chunks = 0
+
+    # Stage functions
+
+    def _download(self, ticker: str) -> Iterable[tuple]:
+        for filing_info, html_content in self.downloader.fetch_10k_history(ticker, self.years):
+            yield ticker, filing_info, html_content
+
+    def _parse(self, item: tuple) -> Iterable[dict]:
+        ticker, filing_info, html_content = item
+        sections, tables = self._executor.submit(parse_10k_html, html_content).result()
+        filing = self.downloader.save_filing(ticker, filing_info, sections, tables)
+        with self._lock:
+            self._filings += 1
+        yield filing
+
+    def _chunk(self, filing: dict) -> Iterable[List[Document]]:
+        futures = [
+            self._executor.submit(chunk_section, filing, section_key, content)
+            for section_key, content in DocumentProcessor._iter_sections(filing)
+        ]
+        for future in futures:
+            docs = future.result()
+            if self.deduplicator:
+                with self._lock:
+                    docs = [doc for doc in docs if self.deduplicator.add(doc)]
+            for start in range(0, len(docs), EMBEDDING_BATCH_SIZE):
+                yield docs[start:start + EMBEDDING_BATCH_SIZE]
+
+    def _embed(self, docs: List[Document]) -> Iterable[tuple]:
+        if docs:
+            vectors = self.processor.embeddings.embed_documents([d.page_content for d in docs])
+            yield docs, vectors
+
+    def _index(self, item: tuple) -> Iterable[None]:
+        docs, vectors = item
+        store = self.processor.vector_store
+        filings = {(d.metadata["ticker"], d.metadata["fiscal_year"]) for d in docs}
+        for ticker, fiscal_year in filings - self._replaced_filings:
+            self._remove_filing(ticker, fiscal_year)
+            self._replaced_filings.add((ticker, fiscal_year))
+
+        text_embeddings = list(zip([d.page_content for d in docs], vectors))
+        metadatas = [d.metadata for d in docs]
+        ids = [chunk_id(d.metadata) for d in docs]
+        if store is None:
+            self.processor.vector_store = FAISS.from_embeddings(
+                text_embeddings, self.processor.embeddings, metadatas=metadatas, ids=ids,
+            )
+        else:
+            store.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+        self._chunks += len(docs)
+        return ()
+
+    def _remove_filing(self, ticker: str, fiscal_year: str) -> None:
+        """Drop a filing's previously indexed chunks before re-ingesting it.
+
+        Chunks indexed before fiscal years were recorded are dropped too.
+        """
+        store = self.processor.vector_store
+        if store is None:
+            return
+        stale = []
+        for doc_id in store.index_to_docstore_id.values():
+            meta = store.docstore.search(doc_id).metadata
+            if meta.get("ticker") == ticker and meta.get("fiscal_year") in (fiscal_year, "", None):
+                stale.append(doc_id)
+        if stale:
+            store.delete(stale)
+
+    def run(self, tickers: List[str]) -> IngestResult:
+        """Ingest the given tickers into the live index and publish it."""
+        wall_start = time.perf_counter()
+        self.processor.load_vector_store()
+
+        stages = [
+            Stage("download", self._download, workers=self.download_workers),
+            Stage("parse", self._parse, workers=self.cpu_workers),
+            Stage("chunk", self._chunk, workers=self.cpu_workers),
+            Stage("embed", self._embed, workers=2),
+            Stage("index", self._index, workers=1),
+        ]
+        for upstream, downstream in zip(stages, stages[1:]):
+            upstream.downstream = downstream
+
+        with ProcessPoolExecutor(max_workers=self.cpu_workers) as executor:
+            self._executor = executor
+            for stage in stages:
+                stage.start()
+
+            # Feed the head of the pipeline; put() blocks when downloads fall behind
+            for ticker in tickers:
+                stages[0].inbox.put(ticker)
+            for _ in range(stages[0].workers):
+                stages[0].inbox.put(_DONE)
+
+            for stage in stages:
+                stage.join()
+            self._executor = None
+
+        index_version = None
+        if self._chunks:
+            if self.deduplicator:
+                self.processor._apply_provenance(self.deduplicator)
+            index_version = self.processor.save_vector_store()
+
+        return IngestResult(
+            stages=[stage.metrics for stage in stages],
+            wall_seconds=time.perf_counter() - wall_start,
+            filings=self._filings,
+            chunks=self._chunks,
+            index_version=index_version,
+        )
@@ -0,0 +1,240 @@
+"""Single-pass parser for pasted financial data (HTML tables, markdown tables, key-value text)."""
+import html
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from src.config import INPUT_PARSER_POOL_BYTES, INPUT_PARSER_WORKERS
+
+
+# Comments, tags and line breaks; the text between two tokens is content
+_HTML_TOKEN_RE = re.compile(r"<!--.*?-->|<(/?)([A-Za-z][A-Za-z0-9]*)\b[^<>]*>|\n", re.S)
+_LOOKS_LIKE_HTML_RE = re.compile(r"(?i)<(?:table|tr|td|th|div|p|br|html|body)\b")
+_WHITESPACE_RE = re.compile(r"\s+")
+_BLOCK_TAGS = {
+    "p", "div", "br", "li", "ul", "ol", "h1", "h2", "h3", "h4", "h5", "h6",
+    "section", "article", "header", "footer", "body", "html", "pre", "blockquote",
+}
+_SKIP_TAGS = {"script", "style", "head"}
+
+# Figure patterns: (key)(value)(unit?), matched anywhere outside tables
+_FIGURE_PATTERNS = [
+    r"(revenue|sales)[\s:]*\$?([\d,.]+)\s*(billion|million|B|M)?",
+    r"(growth|increase|decrease)[\s:]*(-?[\d,.]+)%?",
+    r"(operating income|net income|EBITDA)[\s:]*\$?([\d,.]+)\s*(billion|million|B|M)?",
+    r"(cash flow|FCF|free cash flow)[\s:]*\$?([\d,.]+)\s*(billion|million|B|M)?",
+    r"(margin)[\s:]*(-?[\d,.]+)%",
+]
+# Descriptive patterns: (key)(rest of the line); scanned separately so their
+# values can still contain figures
+_DESCRIPTION_PATTERNS = [
+    r"(segment|division)[\s:]+([^\n,]+)",
+    r"(launched|discontinued|acquired|partnered)[\s:]+([^\n]+)",
+]
+
+
+class _Alternation:
+    """Several (key)(value)(unit?) patterns combined into one case-insensitive regex."""
+
+    def __init__(self, patterns: List[str]):
+        self.regex = re.compile("(?i)" + "|".join(f"(?:{p})" for p in patterns))
+        self.groups = []  # (first group, group count) of each alternative
+        start = 1
+        for pattern in patterns:
+            count = re.compile(pattern).groups
+            self.groups.append((start, count))
+            start += count
+
+    def scan(self, text: str, data: Dict[str, Any]):
+        """Add the first value of every key found in text (existing keys win)."""
+        for match in self.regex.finditer(text):
+            for start, count in self.groups:
+                if match.group(start) is None:
+                    continue
+                key = match.group(start).strip()
+                value = match.group(start + 1).strip()
+                unit = (match.group(start + 2) or "").strip() if count > 2 else ""
+                if unit:
+                    value = f"{value} {unit}"
+                if key not in data:
+                    data[key] = value
+                break
+
+
+_FIGURES = _Alternation(_FIGURE_PATTERNS)
+_DESCRIPTIONS = _Alternation(_DESCRIPTION_PATTERNS)
+
+
+def _clean(text: str) -> str:
+    return _WHITESPACE_RE.sub(" ", html.unescape(text)).strip()
+
+
+def _add_row(data: Dict[str, Any], cells: List[str]):
+    """Store a table row: first cell is the metric, then current and prior year values."""
+    if len(cells) < 2:
+        return
+    metric, values = cells[0], cells[1:]
+    if metric and values[0]:
+        data[metric] = values[0]
+        if len(values) >= 2 and values[1]:
+            data[f"{metric} (Prior Year)"] = values[1]
+
+
+class _InputScanner:
+    """Walks the input once, collecting table rows and the plain text between tables."""
+
+    def __init__(self):
+        self.data: Dict[str, Any] = {}
+        self.lines: List[str] = []  # Readable rendering of the whole input
+        self.plain: List[str] = []  # Lines outside tables, for figure patterns
+        self._line: List[str] = []
+        self._markdown_header: Optional[List[str]] = None
+        # HTML table state (a stack, so nested tables don't corrupt the outer row)
+        self._tables: List[Dict[str, Any]] = []
+        self._skip_depth = 0
+
+    def text(self, content: str):
+        if self._skip_depth or not content:
+            return
+        if self._tables:
+            table = self._tables[-1]
+            if table["cell"] is not None:
+                table["cell"].append(content)
+        else:
+            self._line.append(content)
+
+    def end_line(self):
+        if self._tables:
+            return
+        line = _clean("".join(self._line))
+        self._line = []
+        if not line:
+            self._markdown_header = None
+            return
+        self.lines.append(line)
+        if "|" in line:
+            if "---" not in line:
+                cells = [c.strip() for c in line.split("|") if c.strip()]
+                if self._markdown_header is None:
+                    self._markdown_header = cells
+                else:
+                    _add_row(self.data, cells)
+            return
+        self._markdown_header = None
+        self.plain.append(line)
+
+    def tag(self, closing: bool, name: str):
+        name = name.lower()
+        if name in _SKIP_TAGS:
+            self._skip_depth += -1 if closing else 1
+            self._skip_depth = max(self._skip_depth, 0)
+            return
+        if name == "table":
+            if closing:
+                if self._tables:
+                    self._end_row(self._tables.pop())
+            else:
+                self.end_line()
+                self._tables.append({"header": None, "row": None, "cell": None})
+            return
+        if not self._tables:
+            if name in _BLOCK_TAGS:
+                self.end_line()
+            return
+        table = self._tables[-1]
+        if name == "tr":
+            self._end_row(table)
+            if not closing:
+                table["row"] = []
+        elif name in ("td", "th"):
+            self._end_cell(table)
+            if not closing and table["row"] is not None:
+                table["cell"] = []
+
+    def _end_cell(self, table: Dict[str, Any]):
+        if table["cell"] is not None:
+            table["row"].append(_clean("".join(table["cell"])))
+            table["cell"] = None
+
+    def _end_row(self, table: Dict[str, Any]):
+        self._end_cell(table)
+        cells = table["row"]
+        table["row"] = None
+        if not cells:
+            return
+        if any(cells):
+            self.lines.append(" | ".join(cells))
+        if table["header"] is None:
+            # First row with content becomes headers
+            if any(cells):
+                table["header"] = cells
+        else:
+            _add_row(self.data, cells)
+
+    def finish(self):
+        while self._tables:
+            self._end_row(self._tables.pop())
+        self.end_line()
+
+
+def parse_financial_input(text: str) -> Dict[str, Any]:
+    """Parse financial data from user input (supports Markdown, HTML, plain text).
+
+    The input is tokenized once: HTML tags drive a small table state machine,
+    markdown rows are recognized line by line, and the remaining plain text
+    goes through two combined figure/description regexes. Table rows map
+    metric -> current value (and "<metric> (Prior Year)" -> prior value);
+    key-value figures never override table values. "raw_input" holds a
+    readable rendering of the input without markup.
+    """
+    scanner = _InputScanner()
+    if _LOOKS_LIKE_HTML_RE.search(text):
+        position = 0
+        for token in _HTML_TOKEN_RE.finditer(text):
+            scanner.text(text[position:token.start()])
+            position = token.end()
+            if token.group(2):
+                scanner.tag(bool(token.group(1)), token.group(2))
+            elif token.group(0) == "\n":
+                scanner.end_line()
+        scanner.text(text[position:])
+    else:
+        for line in text.split("\n"):
+            scanner.text(line)
+            scanner.end_line()
+    scanner.finish()
+
+    data = scanner.data
+    plain = "\n".join(scanner.plain)
+    _FIGURES.scan(plain, data)
+    _DESCRIPTIONS.scan(plain, data)
+
+    # Also store the input for the LLM to process
+    if scanner.lines:
+        data["raw_input"] = "\n".join(scanner.lines)
+    return data
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def parse_in_worker(text: str) -> Dict[str, Any]:
+    """Parse input, in a worker process when it is large enough to hold the GIL for long."""
+    global _pool
+    if len(text) < INPUT_PARSER_POOL_BYTES:
+        return parse_financial_input(text)
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=INPUT_PARSER_WORKERS)
+    return _pool.submit(parse_financial_input, text).result()
+
+
+def shutdown_parser_pool():
+    """Stop the worker processes (e.g. on server shutdown)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
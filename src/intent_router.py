@@ -0,0 +1,192 @@
+"""Local intent classification of chat turns, so routine requests skip the LLM."""
+import re
+import zlib
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.config import INTENT_FEATURES, INTENT_MIN_SCORE, TARGET_COMPANIES
+
+
+# Example turns per intent; their hashed bag-of-words centroids classify turns no rule matches
+INTENT_EXAMPLES: Dict[str, List[str]] = {
+    "sources": [
+        "show the sources again", "which sources did you use", "list the citations",
+        "where did that come from", "show me the references", "what filings is this based on",
+        "can I see the sources", "what are your sources",
+    ],
+    "confidence": [
+        "what's my confidence", "how confident are you", "show the confidence score",
+        "how reliable is this draft", "what is the confidence level", "how accurate is it",
+    ],
+    "switch": [
+        "switch to _company_ _year_", "let's do _company_ instead", "change company to _company_",
+        "switch over to _company_ for _year_", "now do _company_", "move on to fiscal year _year_",
+        "switch to _year_", "do the same for _company_",
+    ],
+    "reset": [
+        "start over", "reset", "clear everything", "begin again", "start a new session",
+        "forget everything and restart",
+    ],
+    "show_business": [
+        "show the business section", "show item 1 again", "show me the business draft",
+        "print the business section", "display item 1",
+    ],
+    "show_mda": [
+        "show the md&a", "show item 7 again", "show me the md&a draft",
+        "print the md&a section", "display item 7",
+    ],
+    "audit": [
+        "save the audit log", "where is the audit log", "export the audit trail",
+        "show the audit summary",
+    ],
+    "help": [
+        "what can you do", "help", "which companies are available", "how does this work",
+        "what companies do you support",
+    ],
+    # Handled by the assistant's revision flow; listed so such turns aren't mistaken for the above
+    "revise": [
+        "revise the liquidity discussion", "update revenue to _number_", "change operating income to _number_",
+        "add that we acquired a company", "add more detail to results of operations",
+        "rewrite the overview", "incorporate this additional data",
+    ],
+}
+
+# Requests, not mentions: "what's my confidence?" but not "I'm not confident the revenue is right"
+_REQUEST = r"^\s*(?:(?:please|can you|could you)\s+)?"
+_RULES: List[Tuple[str, re.Pattern]] = [
+    ("reset", re.compile(
+        r"^\s*/?(?:reset|restart|start (?:over|again|a new session)|clear everything|begin again"
+        r"|forget everything(?: and restart)?)\s*[.!]?\s*$", re.I)),
+    # "show the sources" but not "what are the sources of revenue"
+    ("sources", re.compile(
+        _REQUEST + r"(?:(?:show|list|display|print|give)\s+(?:me\s+)?|(?:can\s+i\s+)?see\s+|what\s+are\s+)"
+        r"(?:the\s+|your\s+|all\s+(?:the\s+)?)?(?:sources|citations|references)\b(?!\s+of\b)"
+        r"|^\s*(?:which|what)\s+(?:sources|citations|references|filings)\s+did\s+you\s+use\b"
+        r"|^\s*where\s+did\s+(?:that|this|it)\s+come\s+from\b", re.I)),
+    # "show the confidence score" but not "what is the confidence interval on revenue growth"
+    ("confidence", re.compile(
+        _REQUEST + r"(?:(?:show|give|tell|display)\s+(?:me\s+)?|what(?:'s|\s+is)\s+)(?:the\s+|my\s+|your\s+)?confidence"
+        r"(?:\s+(?:score|level|rating))?(?:\s+(?:for|of|on)\s+(?:this|the|my)\s+(?:draft|section|filing))?\s*[?.!]?\s*$"
+        r"|^\s*how\s+(?:confident|sure)\s+are\s+you\b", re.I)),
+    ("audit", re.compile(
+        _REQUEST + r"(?:save|export|write|download)\s+(?:the\s+|an?\s+)?audit\s+(?:log|trail)\b"
+        r"|^\s*(?:where(?:'s|\s+is)|show(?:\s+me)?)\s+the\s+audit\s+(?:log|trail|summary)\b", re.I)),
+    ("help", re.compile(r"^\s*/?help\s*[?!.]?\s*$", re.I)),
+    ("switch", re.compile(
+        r"\b(?:switch(?:ing)?(?:\s+over)?\s+to|move\s+on\s+to|change\s+(?:the\s+)?(?:company|year)\s+to"
+        r"|(?:now|next|let'?s)\s+do|do\s+the\s+same\s+for)\s+(?:fiscal\s+(?:year\s+)?)?_(?:company|year)_")),
+]
+# Intents with side effects (writing a file, discarding the session) are only taken on a rule match
+_RULE_ONLY = {"audit", "reset", "switch"}
+_WORD_RE = re.compile(r"[a-z0-9&_']+")
+_YEAR_RE = re.compile(r"\b20\d{2}\b")
+_NUMBER_RE = re.compile(r"\$?\d[\d,.]*\s*(?:%|[bmk]\b|billion|million)?", re.I)
+_NAME_NOISE_RE = re.compile(r"\b(?:the|inc|corporation|company|companies)\b\.?|,", re.I)
+
+
+def _company_terms(ticker: str, name: str) -> List[str]:
+    """Ways a turn may name a company: "AMZN", "Amazon.com, Inc.", "Amazon.com", "Amazon"."""
+    short = " ".join(_NAME_NOISE_RE.sub(" ", name).split())
+    return list({ticker, name, short, re.split(r"[\s.]", short)[0]})
+
+_COMPANY_RE = re.compile(
+    r"\b(?:" + "|".join(
+        re.escape(term)
+        for ticker, company in TARGET_COMPANIES.items()
+        for term in sorted(_company_terms(ticker, company["name"]), key=len, reverse=True)
+    ) + r")\b",
+    re.I,
+)
+_COMPANY_TERMS = {
+    term.lower(): ticker
+    for ticker, company in TARGET_COMPANIES.items()
+    for term in _company_terms(ticker, company["name"])
+}
+
+
+def find_company(text: str) -> Optional[str]:
+    """Ticker of the first company a turn names, e.g. "AMZN" for "do amazon next"."""
+    match = _COMPANY_RE.search(text)
+    return _COMPANY_TERMS.get(match.group(0).lower()) if match else None
+
+
+@dataclass
+class Intent:
+    """A classified turn: intent name ("chat" when none is clear), score and how it was decided."""
+    name: str
+    score: float
+    method: str  # "rule", "model" or "fallback"
+
+
+@dataclass
+class RouterStats:
+    """Turns routed by one router, and how many were answered without an LLM call."""
+    turns: int = 0
+    local: int = 0
+    local_seconds: float = 0.0
+    intents: Dict[str, int] = field(default_factory=dict)
+
+    def record(self, intent: str, local: bool, seconds: float = 0.0):
+        self.turns += 1
+        self.intents[intent] = self.intents.get(intent, 0) + 1
+        if local:
+            self.local += 1
+            self.local_seconds += seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "turns": self.turns,
+            "local_turns": self.local,
+            "local_share": round(self.local / self.turns, 3) if self.turns else 0.0,
+            "mean_local_ms": round(self.local_seconds / self.local * 1000, 3) if self.local else 0.0,
+            "intents": self.intents,
+        }
+
+
+def normalize_turn(text: str) -> str:
+    """Lowercased turn with companies, years and figures replaced by placeholders."""
+    text = _COMPANY_RE.sub(" _company_ ", text)
+    text = _YEAR_RE.sub(" _year_ ", text)
+    text = _NUMBER_RE.sub(" _number_ ", text)
+    return text.lower()
+
+
+def featurize(texts: List[str], dims: int = INTENT_FEATURES) -> np.ndarray:
+    """L2-normalized hashed counts of the words and word pairs of each text."""
+    matrix = np.zeros((len(texts), dims), dtype=np.float32)
+    for i, text in enumerate(texts):
+        words = _WORD_RE.findall(normalize_turn(text))
+        for term in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            matrix[i, zlib.crc32(term.encode("utf-8")) % dims] += 1.0
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+class IntentRouter:
+    """Rules for unambiguous phrasings, then nearest intent centroid by cosine similarity."""
+
+    def __init__(
+        self,
+        examples: Optional[Dict[str, List[str]]] = None,
+        min_score: float = INTENT_MIN_SCORE,
+    ):
+        examples = examples or INTENT_EXAMPLES
+        self.intents = list(examples)
+        self.min_score = min_score
+        centroids = np.stack([featurize(examples[name]).mean(axis=0) for name in self.intents])
+        self.centroids = centroids / np.linalg.norm(centroids, axis=1, keepdims=True)
+        self.stats = RouterStats()
+
+    def classify(self, text: str) -> Intent:
+        """The intent of a chat turn."""
+        normalized = normalize_turn(text)
+        for name, pattern in _RULES:
+            if pattern.search(normalized):
+                return Intent(name, 1.0, "rule")
+        scores = self.centroids @ featurize([text])[0]
+        best = int(np.argmax(scores))
+        if scores[best] < self.min_score or self.intents[best] in _RULE_ONLY:
+            return Intent("chat", float(scores[best]), "fallback")
+        return Intent(self.intents[best], float(scores[best]), "model")
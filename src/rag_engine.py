@@ -1,63 +1,547 @@
 """RAG Engine for 10-K generation."""
-from typing import List, Optional, Dict, Any, Tuple
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional, Dict, Any, Tuple, Union
 from langchain_openai import ChatOpenAI
 from langchain_core.documents import Document
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
 from langchain_core.prompts import ChatPromptTemplate
 
-from src.config import OPENAI_API_KEY, LLM_MODEL, TOP_K_RETRIEVAL
+from src.config import (
+    OPENAI_API_KEY, LLM_MODEL, TOP_K_RETRIEVAL, FILING_YEARS, TARGET_COMPANIES,
+    PROMPT_MAX_TOKENS, USER_INPUT_MAX_TOKENS, CONTEXT_COMPRESSION, PEER_CONTEXT_MAX_TOKENS, PREFETCH_WORKERS,
+    RETRIEVAL_MIN_SCORE, RETRIEVAL_SCORE_GAP, RETRIEVAL_MIN_K, RETRIEVAL_NEIGHBOURS,
+    SUMMARY_CONTEXT, SUMMARY_PRECISE_K, CLAIM_VERIFICATION, FACT_CHECK,
+)
+from src.compression import (
+    balanced_allocation, compress_context, compress_user_input, context_overflow, fit_contents,
+    user_input_budget,
+)
 from src.document_processor import DocumentProcessor
-from src.citations import CitationManager, ConfidenceCalculator, ConfidenceScore
-from src.yoy_analysis import YoYAnalyzer
+from src.claim_verifier import ClaimVerifier
+from src.drafts import Draft, Subsection, affected_subsections
+from src.fact_checker import FactChecker
+from src.citations import Citation, CitationManager, ConfidenceCalculator, ConfidenceScore
+from src.yoy_analysis import YoYAnalyzer, YoYMetric
+from src.financial_facts import FinancialStore, format_fact, get_financial_store, resolve_metric
+from src.filing_store import lookup_reported_values
 from src.audit_logger import AuditLogger, get_audit_logger
+from src.index_watcher import IndexWatcher
+from src.summarizer import SectionSummary, SummaryStore, get_summary_store, section_source_hash
+from src.vector_index import adaptive_k, chunk_key
+from src.tokens import count_tokens, count_tokens_batch
+
+
+# Retrieval query variants per generated section, one per subsection the draft needs
+SECTION_QUERIES = {
+    "business": [
+        "company business description operations products services markets for {ticker}",
+        "{ticker} products brands and services offered and principal markets",
+        "{ticker} competition customers distribution channels and seasonality",
+        "{ticker} employees human capital intellectual property and government regulation",
+    ],
+    "mda": [
+        "management discussion analysis financial performance revenue operations results for {ticker}",
+        "{ticker} results of operations net revenues operating income by segment",
+        "{ticker} liquidity and capital resources cash flows debt dividends share repurchases",
+        "{ticker} critical accounting estimates judgments and assumptions",
+    ],
+}
+_SECTION_KEYS = {"business": "item_1_business", "mda": "item_7_mda"}
+
+
+def section_queries(section: str, ticker: str) -> List[str]:
+    """Retrieval query variants for a section ("business" or "mda")."""
+    return [query.format(ticker=ticker) for query in SECTION_QUERIES[section]]
+
+
+_prefetch_pool: Optional[ThreadPoolExecutor] = None
+_prefetch_pool_lock = threading.Lock()
+
+
+def _prefetch_executor() -> ThreadPoolExecutor:
+    """The process-wide prefetch threads, started on first use."""
+    global _prefetch_pool
+    with _prefetch_pool_lock:
+        if _prefetch_pool is None:
+            _prefetch_pool = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+        return _prefetch_pool
+
+
+def shutdown_prefetch_pool():
+    """Stop the prefetch threads (e.g. on server shutdown)."""
+    global _prefetch_pool
+    with _prefetch_pool_lock:
+        if _prefetch_pool is not None:
+            _prefetch_pool.shutdown()
+            _prefetch_pool = None
 
 
 class RAGEngine:
     """RAG Engine for generating 10-K sections."""
 
-    def __init__(self, audit_logger: Optional[AuditLogger] = None):
+    def __init__(
+        self,
+        audit_logger: Optional[AuditLogger] = None,
+        index_watcher: Optional[IndexWatcher] = None,
+        financial_store: Optional[FinancialStore] = None,
+        summary_store: Optional[SummaryStore] = None,
+    ):
         self.llm = ChatOpenAI(
             model=LLM_MODEL,
             openai_api_key=OPENAI_API_KEY,
             temperature=0.3,
         )
         self.doc_processor = DocumentProcessor()
-        self.doc_processor.load_vector_store()
+        self.index_watcher = index_watcher
+        # Background retrieval started before the user asks for generation (see prefetch)
+        self._prefetch: Optional[Future] = None
+        if index_watcher is None:
+            self.doc_processor.load_vector_store()
+        else:
+            self._pin_index()
         
         # Enhanced features
         self.citation_manager = CitationManager()
         self.confidence_calculator = ConfidenceCalculator()
         self.yoy_analyzer = YoYAnalyzer()
+        self.financial_store = financial_store or get_financial_store()
+        self.summary_store = summary_store or get_summary_store()
         self.audit_logger = audit_logger or get_audit_logger()
         
         # Store last generation metadata
         self.last_sources: List[Document] = []
         self.last_confidence: Optional[ConfidenceScore] = None
+        
+        # Session state for incremental revision: retrieval results and the latest draft of each section
+        self._retrieval_cache: Dict[Tuple, List[Document]] = {}
+        self._packing_cache: Dict[Tuple, Any] = {}
+        self.drafts: Dict[str, Draft] = {}
+
+    def clear_session(self):
+        """Forget cached retrieval results and drafts (e.g. when a conversation starts over)."""
+        self._await_prefetch()
+        self._retrieval_cache.clear()
+        self._packing_cache.clear()
+        self.drafts.clear()
+
+    def prefetch(
+        self,
+        ticker: str,
+        fiscal_year: Optional[str] = None,
+        sections: Tuple[str, ...] = ("business", "mda"),
+    ) -> Future:
+        """Start retrieval and context packing for sections of a company's filing in the background.
+
+        Without a fiscal year, the latest indexed filing is assumed to be the
+        prior year, which is what the draft will retrieve from unless the user
+        asks for an earlier year. Results land in the session caches, so the
+        generation that follows skips that work; a generation starting while
+        a prefetch runs waits for it rather than repeating it.
+        """
+        self._await_prefetch()
+        self._prefetch = _prefetch_executor().submit(self._prefetch_sections, ticker, fiscal_year, sections)
+        return self._prefetch
+
+    def _prefetch_sections(self, ticker: str, fiscal_year: Optional[str], sections: Tuple[str, ...]):
+        prior_years = self._prior_fiscal_years(ticker, fiscal_year)
+        for section in sections:
+            queries, _, _, docs = self._section_context(section, ticker, prior_years)
+            if section == "business" and CONTEXT_COMPRESSION:
+                # The MD&A query also has the user's metrics, so only its retrieval can be done ahead
+                self._compress_context(" ".join(queries), docs)
+        company = TARGET_COMPANIES.get(ticker)
+        if "mda" in sections and company:
+            self.financial_store.load(company["cik"])
+
+    def _await_prefetch(self):
+        """Let a running prefetch finish, so what follows reads its results."""
+        if self._prefetch is None:
+            return
+        try:
+            self._prefetch.result()
+        except Exception as e:
+            print(f"Prefetch failed: {e}")
+        self._prefetch = None
+
+    def _pin_index(self) -> Optional[str]:
+        """Pin the latest hot-reloaded index for the generation about to start.
+
+        Swapping only at generation boundaries means a generation always
+        retrieves from a single index version, even if a new one is published
+        while it runs. A prefetch still running finishes first.
+        """
+        self._await_prefetch()
+        if self.index_watcher:
+            snapshot = self.index_watcher.snapshot()
+            if snapshot:
+                self.doc_processor.attach_vector_store(
+                    snapshot.vector_store,
+                    snapshot.version,
+                    snapshot.partitioned_index,
+                )
+        return self.doc_processor.index_version
 
     def retrieve_context(
         self,
-        query: str,
+        query: Union[str, List[str]],
         ticker: str,
         section: Optional[str] = None,
         k: int = TOP_K_RETRIEVAL,
+        fiscal_years: Optional[List[str]] = None,
+        adaptive: bool = True,
+        neighbours: int = RETRIEVAL_NEIGHBOURS,
     ) -> List[Document]:
-        """Retrieve relevant context from vector store."""
-        return self.doc_processor.similarity_search(
+        """Retrieve relevant context from vector store, optionally for given fiscal years.
+
+        query may be a list of variants (e.g. one per subsection); they are
+        embedded and searched together, and each chunk is ranked by its best
+        similarity to any of them. k is the most chunks matched; with adaptive set, the ranking is cut
+        where similarity falls below RETRIEVAL_MIN_SCORE or drops sharply, so
+        weak matches don't pad the prompt. Each matched chunk carries its
+        similarity in metadata["relevance_score"], and is then expanded to
+        its adjacent chunks (see expand_neighbours). Results are cached for
+        the engine's session, per index version.
+        """
+        cache_key = (
+            self.doc_processor.index_version,
+            tuple(query) if isinstance(query, list) else query,
+            ticker, section, k,
+            tuple(fiscal_years) if fiscal_years else None,
+            adaptive, neighbours,
+        )
+        if cache_key in self._retrieval_cache:
+            return list(self._retrieval_cache[cache_key])
+        results = self.doc_processor.similarity_search_with_scores(
             query=query,
             k=k,
             filter_ticker=ticker,
             filter_section=section,
+            fiscal_years=fiscal_years,
         )
+        docs = self._scored_documents(results, adaptive)
+        if neighbours > 0:
+            docs = self.expand_neighbours(docs, neighbours, section)
+        self._retrieval_cache[cache_key] = docs
+        return list(docs)
+
+    @staticmethod
+    def _scored_documents(results: List[Tuple[Document, float]], adaptive: bool = True) -> List[Document]:
+        """Apply the adaptive cut and attach each chunk's similarity as metadata["relevance_score"]."""
+        if adaptive:
+            scores = [score for _, score in results]
+            results = results[:adaptive_k(scores, RETRIEVAL_MIN_K, RETRIEVAL_MIN_SCORE, RETRIEVAL_SCORE_GAP)]
+        # Copies, so the shared index documents don't carry one query's scores
+        return [
+            Document(page_content=doc.page_content, metadata={**doc.metadata, "relevance_score": round(score, 4)})
+            for doc, score in results
+        ]
+
+    @staticmethod
+    def _hit_key(metadata: Dict[str, Any], section: Optional[str] = None):
+        """Chunk position of a hit, in the searched section for collapsed duplicates."""
+        if section and metadata.get("section_key") != section:
+            for location in metadata.get("provenance") or []:
+                if location.get("section_key") == section:
+                    return chunk_key({**location, "ticker": metadata.get("ticker", "")})
+        return chunk_key(metadata)
+
+    def expand_neighbours(
+        self,
+        docs: List[Document],
+        window: int = RETRIEVAL_NEIGHBOURS,
+        section: Optional[str] = None,
+    ) -> List[Document]:
+        """Add the chunks up to window positions before and after each hit, from the adjacency table.
+
+        Each hit is followed by its neighbourhood in section order, best hit
+        first. A chunk that is already a hit, or a neighbour of an earlier
+        hit, appears once; added chunks are marked with
+        metadata["neighbour_of"] (the hit's chunk_index) and have no
+        relevance_score.
+        """
+        index = self.doc_processor.partitioned_index
+        keys = [self._hit_key(doc.metadata, section) for doc in docs]
+        hits = {}
+        for doc, key in zip(docs, keys):
+            row = index.chunk_rows.get(key) if key is not None else None
+            if row is not None:
+                hits.setdefault(row, doc)
+
+        expanded: List[Document] = []
+        placed = set()
+        for doc, key in zip(docs, keys):
+            if key is None or index.chunk_rows.get(key) is None:
+                expanded.append(doc)
+                continue
+            for row in index.neighbour_rows(key, window):
+                if row in placed:
+                    continue
+                placed.add(row)
+                if row in hits:
+                    expanded.append(hits[row])
+                else:
+                    neighbour = index.documents[row]
+                    expanded.append(Document(
+                        page_content=neighbour.page_content,
+                        metadata={**neighbour.metadata, "neighbour_of": key[3]},
+                    ))
+        return expanded
+
+    @staticmethod
+    def _retrieval_stats(docs: List[Document], k: int = TOP_K_RETRIEVAL) -> Dict[str, Any]:
+        """How many chunks the adaptive cut kept out of k, how relevant they were, and how many neighbours were added."""
+        scores = [doc.metadata["relevance_score"] for doc in docs if "relevance_score" in doc.metadata]
+        return {
+            "k": len(scores),
+            "max_k": k,
+            "neighbours": len(docs) - len(scores),
+            "top_score": max(scores) if scores else None,
+            "mean_score": round(sum(scores) / len(scores), 4) if scores else None,
+        }
+
+    def _prior_fiscal_years(
+        self,
+        ticker: str,
+        fiscal_year: Optional[str] = None,
+        count: int = 1,
+    ) -> Optional[List[str]]:
+        """The latest `count` indexed fiscal years before fiscal_year.
+
+        Falls back to the latest indexed years when nothing earlier is indexed,
+        and to None (no year filter) for indexes without fiscal years.
+        """
+        available = self.doc_processor.available_fiscal_years(ticker)
+        if not available:
+            return None
+        prior = [year for year in available if fiscal_year is None or year < str(fiscal_year)]
+        return (prior or available)[-count:]
+
+    def retrieve_section_history(
+        self,
+        query: Union[str, List[str]],
+        ticker: str,
+        section: str,
+        years: int = FILING_YEARS,
+        before: Optional[str] = None,
+        k: int = TOP_K_RETRIEVAL,
+    ) -> Dict[str, List[Document]]:
+        """Retrieve a section from each of the last N fiscal years, keyed by year.
+
+        E.g. the last three years of risk factors. Each year is searched in its
+        own partition, so recent years can't crowd out older ones.
+        """
+        history = {}
+        for fiscal_year in self._prior_fiscal_years(ticker, before, count=years) or []:
+            history[fiscal_year] = self.retrieve_context(
+                query, ticker, section=section, k=k, fiscal_years=[fiscal_year]
+            )
+        return history
+
+    def _section_summary(
+        self,
+        ticker: str,
+        fiscal_years: Optional[List[str]],
+        section_key: str,
+    ) -> Optional[SectionSummary]:
+        """Precomputed summary of a section of the latest of fiscal_years (see `summarize`), unless it is stale."""
+        if not SUMMARY_CONTEXT or not fiscal_years:
+            return None
+        summary = self.summary_store.load(ticker, fiscal_years[-1], section_key)
+        if summary is not None and summary.source_hash != section_source_hash(ticker, fiscal_years[-1], section_key):
+            print(f"Ignoring stale {section_key} summary for {ticker} FY{fiscal_years[-1]}; re-run `summarize`")
+            return None
+        return summary
+
+    def _section_context(
+        self,
+        section: str,
+        ticker: str,
+        prior_years: Optional[List[str]],
+    ) -> Tuple[List[str], Optional[SectionSummary], Dict[str, int], List[Document]]:
+        """Query variants, precomputed summary, retrieval plan and retrieved chunks for a generated section ("business" or "mda")."""
+        section_key = _SECTION_KEYS[section]
+        queries = section_queries(section, ticker)
+        summary = self._section_summary(ticker, prior_years, section_key)
+        plan = self._retrieval_plan(summary)
+        docs = self.retrieve_context(queries, ticker, section=section_key, fiscal_years=prior_years, **plan)
+        
+        if not docs:
+            # Fallback to broader search
+            docs = self.retrieve_context(queries, ticker, fiscal_years=prior_years, **plan)
+        return queries, summary, plan, docs
+
+    def _retrieval_plan(self, summary: Optional[SectionSummary]) -> Dict[str, int]:
+        """retrieve_context arguments: a few precise chunks next to a summary, else the full retrieval."""
+        if summary is None:
+            return {"k": TOP_K_RETRIEVAL, "neighbours": RETRIEVAL_NEIGHBOURS}
+        return {"k": SUMMARY_PRECISE_K, "neighbours": 0}
+
+    @staticmethod
+    def _with_summary(
+        context: str,
+        summary: Optional[SectionSummary],
+        context_tokens: Dict[str, int],
+    ) -> str:
+        """Prepend a section summary to the retrieved context, counting its tokens."""
+        if summary is None:
+            return context
+        context_tokens["summary"] = count_tokens(summary.summary)
+        return (
+            f"[Summary of the FY{summary.fiscal_year} section]\n{summary.summary}"
+            f"\n\n---\n\n{context}"
+        )
+
+    def _prior_year_financials(self, ticker: str, fiscal_year: str) -> Dict[str, Tuple[float, str]]:
+        """Prior-year figures as reported in XBRL company facts (no LLM call)."""
+        company = TARGET_COMPANIES.get(ticker)
+        if not company:
+            return {}
+        return self.financial_store.prior_year_metrics(company["cik"], fiscal_year)
+
+    def _prior_year_table_values(
+        self,
+        ticker: str,
+        fiscal_year: str,
+        metric_names: List[str],
+    ) -> Dict[str, Tuple[float, str]]:
+        """Prior-year values of the given metrics from stored 10-K financial tables."""
+        if not metric_names or not str(fiscal_year).isdigit():
+            return {}
+        return lookup_reported_values(ticker, metric_names, str(int(fiscal_year) - 1))
 
-    def format_context(self, documents: List[Document]) -> str:
-        """Format retrieved documents into context string."""
+    def format_context(
+        self,
+        documents: List[Document],
+        contents: Optional[List[str]] = None,
+        numbers: Optional[List[int]] = None,
+    ) -> str:
+        """Format retrieved documents into context string (numbered from 1 unless numbers are given)."""
         context_parts = []
-        for i, doc in enumerate(documents, 1):
+        for i, doc in enumerate(documents):
             meta = doc.metadata
-            header = f"[Source {i}: {meta.get('company_name', 'Unknown')} - {meta.get('section', 'Unknown')} - Filed: {meta.get('filing_date', 'Unknown')}]"
-            context_parts.append(f"{header}\n{doc.page_content}")
+            number = numbers[i] if numbers is not None else i + 1
+            header = f"[Source {number}: {meta.get('company_name', 'Unknown')} - {meta.get('section', 'Unknown')} - FY{meta.get('fiscal_year') or '?'} - Filed: {meta.get('filing_date', 'Unknown')}]"
+            text = contents[i] if contents is not None else doc.page_content
+            context_parts.append(f"{header}\n{text}")
         return "\n\n---\n\n".join(context_parts)
 
+    def _compress_context(self, query: str, documents: List[Document]):
+        """compress_context, cached for the session (prefetch packs context ahead of generation)."""
+        key = (query, tuple(doc.page_content for doc in documents))
+        if key not in self._packing_cache:
+            self._packing_cache[key] = compress_context(query, documents)
+        return self._packing_cache[key]
+
+    def _format_sources(
+        self,
+        query: str,
+        documents: List[Document],
+        include_citations: bool,
+        max_tokens: Optional[int] = None,
+    ) -> Tuple[str, Dict[int, Citation], Dict[str, int]]:
+        """Prompt context for retrieved chunks, compressed to the sentences relevant to query.
+
+        Returns (context, citation_map, context token counts). Chunks are never
+        dropped, so [Source N] numbering matches the citations; with
+        max_tokens, their texts are also cut to fit that many tokens.
+        """
+        contents = None
+        tokens = {}
+        if CONTEXT_COMPRESSION and documents:
+            compressed = self._compress_context(query, documents)
+            contents = compressed.contents
+            tokens = {"before": compressed.tokens_before, "after": compressed.tokens_after}
+        if max_tokens is not None and documents:
+            contents = fit_contents(contents or [doc.page_content for doc in documents], max_tokens)
+            tokens["after"] = sum(count_tokens_batch(contents))
+        
+        if include_citations:
+            context, citation_map = self.citation_manager.format_citations_for_prompt(documents, contents)
+        else:
+            context = self.format_context(documents, contents)
+            citation_map = {}
+        return context, citation_map, tokens
+
+    def _generation_metrics(
+        self,
+        prompt: str,
+        context_tokens: Dict[str, int],
+        started: float,
+        retrieved: float,
+        compressed: float,
+    ) -> Dict[str, Any]:
+        """Prompt size and per-stage latency of a generation that just finished."""
+        finished = time.perf_counter()
+        return {
+            "prompt_tokens": count_tokens(prompt),
+            "context_tokens": context_tokens,
+            "latency_seconds": {
+                "retrieval": round(retrieved - started, 3),
+                "compression": round(compressed - retrieved, 3),
+                "generation": round(finished - compressed, 3),
+                "total": round(finished - started, 3),
+            },
+        }
+
+    def _verify_claims(
+        self,
+        section: str,
+        generated_text: str,
+        documents: List[Document],
+        ticker: Optional[str] = None,
+        fiscal_year: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Check the draft's sentences against the sources they cite; unsupported ones go to the audit log."""
+        if not CLAIM_VERIFICATION:
+            return None
+        report = ClaimVerifier(documents).verify(generated_text)
+        if report.unsupported:
+            self.audit_logger.log_claim_verification(
+                section=section,
+                checked=report.checked,
+                unsupported=[s.to_dict() for s in report.unsupported],
+                ticker=ticker,
+                fiscal_year=fiscal_year,
+            )
+        return report.to_dict()
+
+    def _check_figures(
+        self,
+        generated_text: str,
+        documents: List[Document],
+        financial_data: Optional[Dict[str, Any]],
+        yoy_metrics: List[YoYMetric],
+        prior_values: Dict[str, Tuple[float, str]],
+        extra_texts: Dict[str, str],
+        ticker: str,
+        fiscal_year: str,
+    ) -> Optional[Dict[str, Any]]:
+        """Match the MD&A draft's figures against everything the prompt gave; unmatched ones go to the audit log."""
+        if not FACT_CHECK:
+            return None
+        checker = FactChecker()
+        if financial_data:
+            checker.add_financial_data(financial_data)
+        checker.add_yoy_metrics(yoy_metrics)
+        for value, unit in prior_values.values():
+            checker.add_value("prior_year", value, unit)
+        checker.add_documents(documents)
+        for source, text in extra_texts.items():
+            if text:
+                checker.add_text(source, text)
+        report = checker.check(generated_text)
+        if report.unmatched:
+            self.audit_logger.log_fact_check(
+                section="mda",
+                checked=report.checked,
+                unmatched=[figure.to_dict() for figure in report.unmatched],
+                ticker=ticker,
+                fiscal_year=fiscal_year,
+            )
+        return report.to_dict()
+
     def generate_business_section(
         self,
         ticker: str,
@@ -70,22 +554,21 @@ class RAGEngine:
         Returns:
             Tuple of (generated_text, metadata)
         """
-        # Retrieve relevant business context
-        query = f"company business description operations products services markets for {ticker}"
-        docs = self.retrieve_context(query, ticker, section="item_1_business")
+        started = time.perf_counter()
+        index_version = self._pin_index()
+        prior_years = self._prior_fiscal_years(ticker, fiscal_year)
         
-        if not docs:
-            # Fallback to broader search
-            docs = self.retrieve_context(query, ticker)
+        # Retrieve relevant business context from the prior year's filing
+        queries, summary, plan, docs = self._section_context("business", ticker, prior_years)
+        query = " ".join(queries)
         
         self.last_sources = docs
+        retrieved = time.perf_counter()
         
-        # Format context with citations
-        if include_citations:
-            context, citation_map = self.citation_manager.format_citations_for_prompt(docs)
-        else:
-            context = self.format_context(docs)
-            citation_map = {}
+        # Format context with citations, keeping each chunk's relevant sentences
+        context, citation_map, context_tokens = self._format_sources(query, docs, include_citations)
+        context = self._with_summary(context, summary, context_tokens)
+        compressed = time.perf_counter()
         
         prompt = f"""You are a securities lawyer assistant helping to draft SEC Form 10-K filings.
 
@@ -108,12 +591,14 @@ Generate the Item 1. Business section:"""
 
         response = self.llm.invoke([HumanMessage(content=prompt)])
         generated_text = response.content
+        metrics = self._generation_metrics(prompt, context_tokens, started, retrieved, compressed)
         
         # Calculate confidence
         self.last_confidence = self.confidence_calculator.calculate_confidence(
             provided_data={},
             retrieved_docs=docs,
             section="business",
+            fiscal_year=fiscal_year,
         )
         
         # Log to audit
@@ -128,7 +613,10 @@ Generate the Item 1. Business section:"""
             },
             ticker=ticker,
             fiscal_year=fiscal_year,
+            index_version=index_version,
+            metrics=metrics,
         )
+        claim_verification = self._verify_claims("business", generated_text, docs, ticker, fiscal_year)
         
         # Build metadata
         metadata = {
@@ -140,7 +628,15 @@ Generate the Item 1. Business section:"""
                 "reasoning": self.last_confidence.reasoning,
             },
             "sources_count": len(docs),
+            "retrieval": self._retrieval_stats(docs, plan["k"]),
+            "section_summary": summary.fiscal_year if summary else None,
+            "index_version": index_version,
+            "claim_verification": claim_verification,
+            **metrics,
         }
+        self.drafts["business"] = Draft.from_text(
+            "business", ticker, fiscal_year, generated_text, sources=docs, citations=metadata["citations"]
+        )
         
         return generated_text, metadata
 
@@ -158,21 +654,42 @@ Generate the Item 1. Business section:"""
         Returns:
             Tuple of (generated_text, metadata)
         """
-        # Retrieve relevant MD&A context
-        query = f"management discussion analysis financial performance revenue operations results for {ticker}"
-        docs = self.retrieve_context(query, ticker, section="item_7_mda")
+        started = time.perf_counter()
+        index_version = self._pin_index()
+        prior_years = self._prior_fiscal_years(ticker, fiscal_year)
         
-        if not docs:
-            docs = self.retrieve_context(query, ticker)
+        # Retrieve relevant MD&A context from the prior year's filing
+        queries, summary, plan, docs = self._section_context("mda", ticker, prior_years)
+        query = " ".join(queries)
         
         self.last_sources = docs
+        retrieved = time.perf_counter()
         
-        # Format context with citations
-        if include_citations:
-            context, citation_map = self.citation_manager.format_citations_for_prompt(docs)
-        else:
-            context = self.format_context(docs)
-            citation_map = {}
+        # Format context with citations, keeping the sentences relevant to MD&A and the user's metrics
+        metric_terms = " ".join(
+            key for key in (financial_data or {}) if key != "raw_input" and "(Prior Year)" not in key
+        )
+        context, citation_map, context_tokens = self._format_sources(
+            f"{query} {metric_terms}", docs, include_citations
+        )
+        context = self._with_summary(context, summary, context_tokens)
+        compressed = time.perf_counter()
+        
+        # Prior-year figures as reported, so users only need to provide the current year
+        prior_financials = self._prior_year_financials(ticker, fiscal_year)
+        missing_priors = [
+            key for key in (financial_data or {})
+            if key != "raw_input"
+            and "(Prior Year)" not in key
+            and f"{key} (Prior Year)" not in financial_data
+            and resolve_metric(key) not in prior_financials
+        ]
+        prior_table_values = self._prior_year_table_values(ticker, fiscal_year, missing_priors)
+        prior_financials_section = ""
+        if prior_financials or prior_table_values:
+            prior_financials_section = f"\nPRIOR-YEAR FINANCIALS AS REPORTED (FY{int(fiscal_year) - 1} 10-K):\n"
+            for name, (value, unit) in {**prior_table_values, **prior_financials}.items():
+                prior_financials_section += f"- {name}: {format_fact(value, unit)}\n"
         
         # Perform YoY analysis if data provided
         yoy_analysis = ""
@@ -182,7 +699,11 @@ Generate the Item 1. Business section:"""
             data_copy = dict(financial_data)
             raw_input = data_copy.pop("raw_input", None)
             
-            yoy_metrics = self.yoy_analyzer.analyze_data(data_copy)
+            yoy_metrics = self.yoy_analyzer.analyze_data(
+                data_copy,
+                prior_facts=prior_financials,
+                prior_table_values=prior_table_values,
+            )
             if yoy_metrics:
                 yoy_analysis = self.yoy_analyzer.format_yoy_table()
                 yoy_narrative = self.yoy_analyzer.generate_yoy_narrative()
@@ -191,35 +712,15 @@ Generate the Item 1. Business section:"""
             if raw_input:
                 data_copy["raw_input"] = raw_input
         
-        # Format financial data if provided
-        financial_section = ""
-        if financial_data:
-            financial_section = "\nFINANCIAL AND BUSINESS DATA PROVIDED BY USER:\n"
-            # Handle raw_input specially
-            data_for_prompt = dict(financial_data)
-            raw_input = data_for_prompt.pop("raw_input", None)
-            
-            for key, value in data_for_prompt.items():
-                financial_section += f"- {key}: {value}\n"
-            
-            if raw_input:
-                financial_section += f"\nRaw user input (extract any additional relevant data):\n{raw_input}\n"
-            
-            # Log data provided
-            self.audit_logger.log_data_provided(
-                raw_input=raw_input or str(financial_data),
-                parsed_data=data_for_prompt,
-                ticker=ticker,
-                fiscal_year=fiscal_year,
-            )
-        
-        prompt = f"""You are a securities lawyer assistant helping to draft SEC Form 10-K filings.
+        def build_prompt(financial_section: str) -> str:
+            return f"""You are a securities lawyer assistant helping to draft SEC Form 10-K filings.
 
 Based on the following context from prior 10-K filings and user-provided financial data, generate an updated "Item 7. Management's Discussion and Analysis of Financial Condition and Results of Operations" (MD&A) section for {ticker}'s Form 10-K for fiscal year {fiscal_year}.
 
 CONTEXT FROM PRIOR FILINGS:
 {context}
 {financial_section}
+{prior_financials_section}
 {f"ADDITIONAL CONTEXT:{chr(10)}{additional_context}" if additional_context else ""}
 
 INSTRUCTIONS:
@@ -240,14 +741,77 @@ INSTRUCTIONS:
 
 Generate the Item 7. MD&A section:"""
 
+        # Format financial data if provided, compressed to fit the prompt budget
+        financial_section = ""
+        input_compression = None
+        if financial_data:
+            # Handle raw_input specially
+            data_for_prompt = dict(financial_data)
+            raw_input = data_for_prompt.pop("raw_input", None)
+            
+            # Log data provided
+            self.audit_logger.log_data_provided(
+                raw_input=raw_input or str(financial_data),
+                parsed_data=data_for_prompt,
+                ticker=ticker,
+                fiscal_year=fiscal_year,
+            )
+            
+            def format_financial_section(fields: Dict[str, Any], raw_text: str) -> str:
+                section = "\nFINANCIAL AND BUSINESS DATA PROVIDED BY USER:\n"
+                for key, value in fields.items():
+                    section += f"- {key}: {value}\n"
+                if raw_text:
+                    section += f"\nRaw user input (extract any additional relevant data):\n{raw_text}\n"
+                return section
+            
+            # Prompt cap is hard: if the rest of the prompt leaves user data less than its reserve, cut the context
+            empty_section = format_financial_section({}, " ")
+            user_tokens = sum(count_tokens_batch([f"- {key}: {value}" for key, value in financial_data.items()]))
+            overflow = context_overflow(
+                count_tokens(build_prompt(empty_section)), user_tokens, PROMPT_MAX_TOKENS, USER_INPUT_MAX_TOKENS
+            )
+            if overflow:
+                content_tokens = context_tokens.get("after") or sum(
+                    count_tokens_batch([doc.page_content for doc in docs])
+                )
+                context, citation_map, context_tokens = self._format_sources(
+                    f"{query} {metric_terms}", docs, include_citations, max_tokens=max(0, content_tokens - overflow)
+                )
+                context = self._with_summary(context, summary, context_tokens)
+            budget = user_input_budget(
+                count_tokens(build_prompt(empty_section)), PROMPT_MAX_TOKENS, USER_INPUT_MAX_TOKENS
+            )
+            while True:
+                input_compression = compress_user_input(financial_data, budget)
+                financial_section = format_financial_section(input_compression.fields, input_compression.raw_input)
+                # Kept lines are counted one by one; tighten if joining and bullets pushed the prompt over
+                excess = count_tokens(build_prompt(financial_section)) - PROMPT_MAX_TOKENS
+                if excess <= 0 or budget == 0:
+                    break
+                budget = max(0, budget - excess)
+            if input_compression.compressed:
+                self.audit_logger.log_input_compression(
+                    section="mda",
+                    tokens_before=input_compression.tokens_before,
+                    tokens_after=input_compression.tokens_after,
+                    budget=budget,
+                    dropped=input_compression.dropped,
+                    ticker=ticker,
+                    fiscal_year=fiscal_year,
+                )
+        
+        prompt = build_prompt(financial_section)
         response = self.llm.invoke([HumanMessage(content=prompt)])
         generated_text = response.content
+        metrics = self._generation_metrics(prompt, context_tokens, started, retrieved, compressed)
         
         # Calculate confidence
         self.last_confidence = self.confidence_calculator.calculate_confidence(
             provided_data=financial_data or {},
             retrieved_docs=docs,
             section="mda",
+            fiscal_year=fiscal_year,
         )
         
         # Log to audit
@@ -262,6 +826,22 @@ Generate the Item 7. MD&A section:"""
             },
             ticker=ticker,
             fiscal_year=fiscal_year,
+            index_version=index_version,
+            metrics=metrics,
+        )
+        claim_verification = self._verify_claims("mda", generated_text, docs, ticker, fiscal_year)
+        fact_check = self._check_figures(
+            generated_text,
+            docs,
+            financial_data,
+            yoy_metrics,
+            {**prior_table_values, **prior_financials},
+            {
+                "summary": summary.summary if summary else "",
+                "additional_context": additional_context or "",
+            },
+            ticker,
+            fiscal_year,
         )
         
         # Build metadata
@@ -275,11 +855,310 @@ Generate the Item 7. MD&A section:"""
             },
             "yoy_analysis": self.yoy_analyzer.get_metrics_json() if yoy_metrics else [],
             "yoy_table": yoy_analysis,
+            "prior_year_financials": {
+                name: value for name, (value, _) in {**prior_table_values, **prior_financials}.items()
+            },
             "sources_count": len(docs),
+            "retrieval": self._retrieval_stats(docs, plan["k"]),
+            "section_summary": summary.fiscal_year if summary else None,
+            "index_version": index_version,
+            "claim_verification": claim_verification,
+            "fact_check": fact_check,
+            **metrics,
+        }
+        if input_compression is not None:
+            metadata["input_compression"] = {
+                "tokens_before": input_compression.tokens_before,
+                "tokens_after": input_compression.tokens_after,
+                "budget": input_compression.budget,
+                "dropped_count": len(input_compression.dropped),
+            }
+        self.drafts["mda"] = Draft.from_text(
+            "mda", ticker, fiscal_year, generated_text, sources=docs, citations=metadata["citations"]
+        )
+        
+        return generated_text, metadata
+
+    def generate_peer_comparison(
+        self,
+        tickers: List[str],
+        topic: str,
+        section: Optional[str] = None,
+        include_citations: bool = True,
+        context_budget: int = PEER_CONTEXT_MAX_TOKENS,
+    ) -> Tuple[str, Dict[str, Any]]:
+        """Generate one comparative draft on a topic (e.g. risk discussion) across companies.
+
+        Every company's latest indexed filing is searched in one batched
+        operation. Each company's chunks are compressed to the topic, then
+        the companies take turns adding chunks until context_budget tokens,
+        so no company crowds out the others. Neighbouring chunks are not
+        added here; the budget goes to more companies' hits instead.
+
+        Returns:
+            Tuple of (generated_text, metadata)
+        """
+        started = time.perf_counter()
+        index_version = self._pin_index()
+        fiscal_years = {ticker: self._prior_fiscal_years(ticker) for ticker in tickers}
+        
+        results = self.doc_processor.similarity_search_by_ticker(
+            topic,
+            tickers,
+            k=TOP_K_RETRIEVAL,
+            filter_section=section,
+            fiscal_years={ticker: years for ticker, years in fiscal_years.items() if years},
+        )
+        per_company = {ticker: self._scored_documents(results.get(ticker, [])) for ticker in tickers}
+        retrieved = time.perf_counter()
+        
+        # Compress each company's chunks to the topic, then share the budget evenly
+        contents = {}
+        for ticker, docs in per_company.items():
+            if CONTEXT_COMPRESSION and docs:
+                contents[ticker] = compress_context(topic, docs).contents
+            else:
+                contents[ticker] = [doc.page_content for doc in docs]
+        kept = balanced_allocation(
+            [count_tokens_batch(contents[ticker]) for ticker in tickers], context_budget
+        )
+        docs: List[Document] = []
+        kept_contents: List[str] = []
+        company_chunks: Dict[str, int] = {}
+        for ticker, count in zip(tickers, kept):
+            docs.extend(per_company[ticker][:count])
+            kept_contents.extend(contents[ticker][:count])
+            company_chunks[ticker] = count
+        missing = [ticker for ticker, count in company_chunks.items() if not count]
+        
+        if include_citations:
+            context, citation_map = self.citation_manager.format_citations_for_prompt(docs, kept_contents)
+        else:
+            self.citation_manager.reset()
+            context = self.format_context(docs, kept_contents)
+        context_tokens = {
+            "before": sum(count_tokens_batch([doc.page_content for doc in docs])),
+            "after": count_tokens(context),
+            "budget": context_budget,
+        }
+        self.last_sources = docs
+        compressed = time.perf_counter()
+        
+        company_names = ", ".join(
+            f"{TARGET_COMPANIES.get(ticker, {}).get('name', ticker)} ({ticker})" for ticker in tickers
+        )
+        prompt = f"""You are a securities lawyer assistant helping to compare SEC Form 10-K disclosures across peer companies.
+
+Compare how the following companies address this topic: {topic}
+Companies: {company_names}
+
+CONTEXT FROM THE COMPANIES' LATEST 10-K FILINGS:
+{context}
+
+INSTRUCTIONS:
+1. Write in the formal, objective tone expected in SEC filings
+2. Cover every company, then summarize the main similarities and differences
+3. Base every statement on the retrieved context - do NOT hallucinate facts or figures
+4. Cite the sources for each company's statements by number in brackets, e.g., [Source 1]
+{f"5. No filing content was found for {', '.join(missing)}; say so rather than guessing" if missing else ""}
+
+Generate the comparison:"""
+
+        response = self.llm.invoke([HumanMessage(content=prompt)])
+        generated_text = response.content
+        metrics = self._generation_metrics(prompt, context_tokens, started, retrieved, compressed)
+        
+        self.last_confidence = self.confidence_calculator.calculate_confidence(
+            provided_data={},
+            retrieved_docs=docs,
+            section="comparison",
+        )
+        
+        self.audit_logger.log_generation(
+            section="peer_comparison",
+            generated_text=generated_text,
+            sources_used=self.citation_manager.get_citations_json(),
+            confidence_score={
+                "overall": self.last_confidence.overall,
+                "data_coverage": self.last_confidence.data_coverage,
+                "source_quality": self.last_confidence.source_quality,
+            },
+            ticker=",".join(tickers),
+            index_version=index_version,
+            metrics=metrics,
+        )
+        claim_verification = self._verify_claims("peer_comparison", generated_text, docs, ",".join(tickers))
+        
+        citations = self.citation_manager.get_citations_json()
+        citations_by_company: Dict[str, List[int]] = {ticker: [] for ticker in tickers}
+        for citation, doc in zip(citations, docs):
+            citations_by_company[doc.metadata.get("ticker", "")].append(citation["id"])
+        metadata = {
+            "citations": citations,
+            "citations_by_company": citations_by_company,
+            "confidence": {
+                "overall": self.last_confidence.overall,
+                "data_coverage": self.last_confidence.data_coverage,
+                "source_quality": self.last_confidence.source_quality,
+                "reasoning": self.last_confidence.reasoning,
+            },
+            "fiscal_years": {ticker: (years or [None])[-1] for ticker, years in fiscal_years.items()},
+            "company_chunks": company_chunks,
+            "missing_companies": missing,
+            "sources_count": len(docs),
+            "index_version": index_version,
+            "claim_verification": claim_verification,
+            **metrics,
         }
         
         return generated_text, metadata
     
+    def _revise_subsection(
+        self,
+        draft: Draft,
+        index: int,
+        updates_text: str,
+        request: Optional[str] = None,
+    ) -> Tuple[str, int]:
+        """Regenerate one subsection of a draft for the updates; returns its new text and the prompt's tokens."""
+        subsection = draft.subsections[index]
+        cited = [n for n in draft.cited(index) if 0 < n <= len(draft.sources)]
+        sources_section = ""
+        if cited:
+            docs = [draft.sources[n - 1] for n in cited]
+            contents = None
+            if CONTEXT_COMPRESSION:
+                contents = compress_context(f"{subsection.title} {updates_text}", docs).contents
+            sources_section = f"\nSOURCES CITED IN THIS PART:\n{self.format_context(docs, contents, cited)}\n"
+        section_name = "Item 1. Business" if draft.section == "business" else "Item 7. MD&A"
+        
+        prompt = f"""You are a securities lawyer assistant helping to update SEC Form 10-K filings.
+
+Here is the "{subsection.title or 'Introduction'}" part of the {section_name} section draft for {draft.ticker}'s Form 10-K for fiscal year {draft.fiscal_year}:
+
+{subsection.body.strip()}
+
+The user has provided the following updates:
+{updates_text}
+{f"User request: {request}{chr(10)}" if request else ""}{sources_section}
+INSTRUCTIONS:
+1. Update this part only, incorporating the updates that concern it
+2. Maintain the formal, objective tone expected in SEC filings
+3. Keep accurate existing content and its [Source N] citations; do not cite sources not listed above
+4. Do NOT hallucinate financial figures - only use what is provided or already in the text
+5. Return the updated text only, without a heading
+
+Updated text:"""
+
+        response = self.llm.invoke([HumanMessage(content=prompt)])
+        return response.content.strip(), count_tokens(prompt)
+
+    def _revise_draft(
+        self,
+        draft: Draft,
+        indexes: List[int],
+        updates_text: str,
+        request: Optional[str] = None,
+    ) -> Tuple[Draft, Dict[str, Any]]:
+        """Regenerate the given subsections of a draft in parallel and splice them back in."""
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(len(indexes), 1)) as pool:
+            results = list(pool.map(
+                lambda i: self._revise_subsection(draft, i, updates_text, request), indexes
+            ))
+        subsections = list(draft.subsections)
+        for i, (text, _) in zip(indexes, results):
+            old = subsections[i]
+            leading = old.body[:len(old.body) - len(old.body.lstrip())]
+            trailing = old.body[len(old.body.rstrip()):] or "\n"
+            subsections[i] = Subsection(old.heading, old.title, leading + text + trailing)
+        revised = Draft(
+            draft.section, draft.ticker, draft.fiscal_year, subsections, draft.sources, draft.citations
+        )
+        metrics = {
+            "revised_subsections": [subsections[i].title or "(introduction)" for i in indexes],
+            "subsections_count": len(subsections),
+            "prompt_tokens": sum(tokens for _, tokens in results),
+            "latency_seconds": {"total": round(time.perf_counter() - started, 3)},
+        }
+        return revised, metrics
+
+    def revise_mda_section(
+        self,
+        ticker: str,
+        fiscal_year: str,
+        changes: Dict[str, Any],
+        previous_data: Dict[str, Any],
+        request: Optional[str] = None,
+    ) -> Tuple[str, Dict[str, Any]]:
+        """Revise the session's MD&A draft for new or changed financial data.
+
+        Only the subsections the changed fields touch (see
+        affected_subsections) are regenerated, each from its own text and the
+        sources it cites, and spliced back into the draft. Without a draft
+        for the company and year, or when every subsection is touched, the
+        section is generated again in full (retrieval comes from the session
+        cache).
+        
+        Returns:
+            Tuple of (generated_text, metadata)
+        """
+        financial_data = {**previous_data, **changes}
+        draft = self.drafts.get("mda")
+        if draft is None or (draft.ticker, draft.fiscal_year) != (ticker, str(fiscal_year)):
+            return self.generate_mda_section(ticker, fiscal_year, financial_data)
+        # Free text only decides the subsections when no figures changed
+        changed_fields = {k: v for k, v in changes.items() if k != "raw_input"} or changes
+        indexes = affected_subsections(draft.subsections, changed_fields, previous_data)
+        if len(indexes) >= sum(1 for subsection in draft.subsections if subsection.body.strip()):
+            return self.generate_mda_section(ticker, fiscal_year, financial_data)
+        
+        # Changed figures with their year-over-year change, so revised text states both consistently
+        analyzer = YoYAnalyzer()
+        yoy_metrics = analyzer.analyze_data({k: v for k, v in financial_data.items() if k != "raw_input"})
+        changed_metrics = {name.replace(" (Prior Year)", "") for name in changed_fields}
+        updates = []
+        for name, value in changed_fields.items():
+            if name == "raw_input":
+                continue
+            was = f" (previously {previous_data[name]})" if name in previous_data else ""
+            updates.append(f"- {name}: {value}{was}")
+        for metric in yoy_metrics:
+            if metric.name in changed_metrics and metric.change_percent is not None:
+                updates.append(
+                    f"- {metric.name} change vs. prior year: {metric.change_absolute:+g}{metric.unit} "
+                    f"({metric.change_percent:+.1f}%)"
+                )
+        updates_text = "\n".join(updates) or changes.get("raw_input", "")
+        
+        revised, metrics = self._revise_draft(draft, indexes, updates_text, request)
+        revised_text = "".join(revised.subsections[i].text for i in indexes)
+        claim_verification = self._verify_claims("mda", revised_text, draft.sources, ticker, fiscal_year)
+        fact_check = self._check_figures(
+            revised_text, draft.sources, financial_data, yoy_metrics,
+            self._prior_year_financials(ticker, fiscal_year),
+            {"previous_data": "\n".join(f"{k}: {v}" for k, v in previous_data.items() if k != "raw_input")},
+            ticker, fiscal_year,
+        )
+        self.audit_logger.log_revision(
+            section="mda",
+            original_text=draft.text,
+            revised_text=revised.text,
+            revision_reason=request or updates_text,
+            ticker=ticker,
+            fiscal_year=fiscal_year,
+        )
+        self.drafts["mda"] = revised
+        
+        metadata = {
+            "citations": draft.citations,
+            "sources_count": len(draft.sources),
+            "claim_verification": claim_verification,
+            "fact_check": fact_check,
+            **metrics,
+        }
+        return revised.text, metadata
+
     def get_citation_references(self) -> str:
         """Get formatted citation references."""
         return self.citation_manager.get_citation_references()
@@ -306,31 +1185,29 @@ Generate the Item 7. MD&A section:"""
         original_section: str,
         business_updates: Dict[str, Any],
     ) -> str:
-        """Update Business section with new business information."""
-        updates_text = "\nBUSINESS UPDATES PROVIDED BY USER:\n"
-        for key, value in business_updates.items():
-            updates_text += f"- {key}: {value}\n"
-        
-        prompt = f"""You are a securities lawyer assistant helping to update SEC Form 10-K filings.
-
-Here is the original Item 1. Business section draft:
-
-{original_section}
-
-The user has provided the following updates for fiscal year {fiscal_year}:
-{updates_text}
-
-INSTRUCTIONS:
-1. Update the Business section to incorporate the new information
-2. Maintain the formal, objective tone expected in SEC filings
-3. Keep the same structure but add/modify content as needed
-4. Ensure all updates are factually incorporated
-5. Do not remove existing accurate information unless contradicted
+        """Update Business section with new business information.
 
-Generate the updated Item 1. Business section:"""
-
-        response = self.llm.invoke([HumanMessage(content=prompt)])
-        return response.content
+        Only the subsections the updates touch are regenerated and spliced
+        back into the draft (the session's draft when it matches
+        original_section, so its sources stay available for citations).
+        """
+        draft = self.drafts.get("business")
+        if draft is None or draft.text != original_section:
+            draft = Draft.from_text("business", ticker, fiscal_year, original_section)
+        indexes = affected_subsections(draft.subsections, business_updates, {})
+        updates_text = "\n".join(f"- {key}: {value}" for key, value in business_updates.items())
+        
+        revised, _ = self._revise_draft(draft, indexes, updates_text)
+        self.audit_logger.log_revision(
+            section="business",
+            original_text=original_section,
+            revised_text=revised.text,
+            revision_reason=updates_text,
+            ticker=ticker,
+            fiscal_year=fiscal_year,
+        )
+        self.drafts["business"] = revised
+        return revised.text
 
     def identify_missing_data(
         self,
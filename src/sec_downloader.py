@@ -3,8 +3,9 @@ import re
 import time
 import json
 import requests
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, List, Optional, Tuple
 from bs4 import BeautifulSoup
 import html2text
 
@@ -12,8 +13,14 @@ from src.config import (
     SEC_BASE_URL,
     USER_AGENT,
     TARGET_COMPANIES,
-    FILINGS_DIR,
+    FILING_YEARS,
+    INDEX_WORKERS,
 )
+from src.filing_archive import FilingArchive
+from src.financial_facts import CompanyFacts, get_financial_store
+from src.filing_store import filing_path, fiscal_year_from_report_date, infer_fiscal_year, save_tables
+from src.table_extractor import FinancialTable, extract_tables
+from src.http_cache import HTTPCache
 
 
 class SECDownloader:
@@ -29,41 +36,96 @@ class SECDownloader:
         self.h2t.ignore_links = False
         self.h2t.ignore_images = True
         self.h2t.body_width = 0
+        self.archive = FilingArchive()
+        self.http_cache = HTTPCache()
+
+    def _conditional_get(self, url: str) -> Tuple[bytes, bool]:
+        """GET with ETag/Last-Modified revalidation. Returns (body, not_modified)."""
+        cached = self.http_cache.get(url)
+        headers = cached.conditional_headers() if cached else {}
+        
+        response = self.session.get(url, headers=headers)
+        if response.status_code == 304 and cached:
+            return cached.body, True
+        response.raise_for_status()
+        
+        self.http_cache.put(
+            url,
+            response.content,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+        )
+        return response.content, False
 
     def get_company_filings(self, cik: str) -> dict:
         """Get recent filings for a company by CIK."""
-        # Remove leading zeros for API call
-        cik_clean = cik.lstrip("0")
         url = f"https://data.sec.gov/submissions/CIK{cik}.json"
         
         try:
-            response = self.session.get(url)
-            response.raise_for_status()
-            return response.json()
+            body, not_modified = self._conditional_get(url)
+            if not_modified:
+                print(f"Submissions for CIK {cik} not modified (cached)")
+            return json.loads(body)
         except Exception as e:
             print(f"Error fetching filings for CIK {cik}: {e}")
             return {}
 
-    def find_10k_filing(self, filings_data: dict) -> Optional[dict]:
-        """Find the most recent 10-K filing from company filings data."""
-        if not filings_data or "filings" not in filings_data:
+    def download_company_facts(self, ticker: str) -> Optional[CompanyFacts]:
+        """Download a company's XBRL companyfacts and store its annual us-gaap facts."""
+        cik = TARGET_COMPANIES[ticker]["cik"]
+        url = f"https://data.sec.gov/api/xbrl/companyfacts/CIK{cik}.json"
+        store = get_financial_store()
+        
+        try:
+            body, not_modified = self._conditional_get(url)
+        except Exception as e:
+            print(f"Error fetching company facts for {ticker}: {e}")
             return None
         
+        facts = store.load(cik) if not_modified else None
+        if facts is not None:
+            print(f"Company facts for {ticker} not modified (cached)")
+            return facts
+        
+        facts = store.ingest(json.loads(body), cik)
+        print(f"Stored {len(facts)} annual facts for {ticker}")
+        return facts
+
+    def find_10k_filings(self, filings_data: dict, limit: int = FILING_YEARS) -> List[dict]:
+        """Find the 10-K filings of the most recent fiscal years, newest first."""
+        if not filings_data or "filings" not in filings_data:
+            return []
+        
         recent = filings_data["filings"].get("recent", {})
         forms = recent.get("form", [])
         accession_numbers = recent.get("accessionNumber", [])
         filing_dates = recent.get("filingDate", [])
+        report_dates = recent.get("reportDate", [""] * len(forms))
         primary_documents = recent.get("primaryDocument", [])
         
+        filings = {}
         for i, form in enumerate(forms):
-            if form == "10-K":
-                return {
-                    "form": form,
-                    "accession_number": accession_numbers[i],
-                    "filing_date": filing_dates[i],
-                    "primary_document": primary_documents[i],
-                }
-        return None
+            if form != "10-K":
+                continue
+            fiscal_year = fiscal_year_from_report_date(report_dates[i], filing_dates[i])
+            # Keep the latest original filing per fiscal year
+            if fiscal_year in filings and filings[fiscal_year]["filing_date"] >= filing_dates[i]:
+                continue
+            filings[fiscal_year] = {
+                "form": form,
+                "accession_number": accession_numbers[i],
+                "filing_date": filing_dates[i],
+                "report_date": report_dates[i],
+                "fiscal_year": fiscal_year,
+                "primary_document": primary_documents[i],
+            }
+        
+        return [filings[year] for year in sorted(filings, reverse=True)[:limit]]
+
+    def find_10k_filing(self, filings_data: dict) -> Optional[dict]:
+        """Find the most recent 10-K filing from company filings data."""
+        filings = self.find_10k_filings(filings_data, limit=1)
+        return filings[0] if filings else None
 
     def download_10k_html(self, cik: str, accession_number: str, primary_doc: str) -> Optional[str]:
         """Download the 10-K HTML filing."""
@@ -80,14 +142,25 @@ class SECDownloader:
             print(f"Error downloading 10-K: {e}")
             return None
 
+    def parse_10k_document(self, html_content: str) -> Tuple[dict, List[FinancialTable]]:
+        """Parse 10-K HTML into key sections and financial tables, in one HTML parse."""
+        soup = self._soup(html_content)
+        tables = extract_tables(soup)
+        return self._sections_from_soup(soup), tables
+
     def parse_10k_sections(self, html_content: str) -> dict:
         """Parse 10-K HTML to extract key sections."""
+        return self._sections_from_soup(self._soup(html_content))
+
+    def _soup(self, html_content: str) -> BeautifulSoup:
         soup = BeautifulSoup(html_content, "lxml")
         
         # Remove script and style elements
         for element in soup(["script", "style"]):
             element.decompose()
-        
+        return soup
+
+    def _sections_from_soup(self, soup: BeautifulSoup) -> dict:
         # Get text content
         text = soup.get_text(separator="\n", strip=True)
         
@@ -149,47 +222,110 @@ class SECDownloader:
         
         return extracted.strip()
 
-    def download_company_10k(self, ticker: str) -> Optional[dict]:
-        """Download and process 10-K for a specific company."""
+    def find_10k_history(self, ticker: str, years: int = FILING_YEARS) -> List[dict]:
+        """Look up the 10-K filing info of a company's last N fiscal years."""
         if ticker not in TARGET_COMPANIES:
             print(f"Unknown ticker: {ticker}")
-            return None
+            return []
         
         company_info = TARGET_COMPANIES[ticker]
-        cik = company_info["cik"]
         
         print(f"Fetching filings for {company_info['name']} ({ticker})...")
-        filings_data = self.get_company_filings(cik)
+        filings_data = self.get_company_filings(company_info["cik"])
         
         if not filings_data:
-            return None
+            return []
         
-        filing_info = self.find_10k_filing(filings_data)
-        if not filing_info:
+        filings = self.find_10k_filings(filings_data, limit=years)
+        if not filings:
             print(f"No 10-K filing found for {ticker}")
-            return None
+            return []
         
-        print(f"Found 10-K filed on {filing_info['filing_date']}")
+        for filing_info in filings:
+            print(f"Found FY{filing_info['fiscal_year']} 10-K filed on {filing_info['filing_date']}")
+        return filings
+
+    def find_latest_10k(self, ticker: str) -> Optional[dict]:
+        """Look up the latest 10-K filing info for a company."""
+        filings = self.find_10k_history(ticker, years=1)
+        return filings[0] if filings else None
+
+    def fetch_10k_document(self, ticker: str, filing_info: dict) -> Optional[str]:
+        """Get a 10-K primary document from the archive, downloading if needed."""
+        cik = TARGET_COMPANIES[ticker]["cik"]
+        accession_number = filing_info["accession_number"]
+        html_content = self.archive.load(accession_number)
+        if html_content is not None:
+            print(f"Using archived copy of {accession_number}")
+            return html_content
         
         html_content = self.download_10k_html(
             cik, 
-            filing_info["accession_number"],
+            accession_number,
             filing_info["primary_document"]
         )
         
         if not html_content:
             return None
         
-        print("Parsing 10-K sections...")
-        sections = self.parse_10k_sections(html_content)
+        self.archive.store(accession_number, html_content, {
+            "ticker": ticker,
+            "cik": cik,
+            **filing_info,
+        })
+        return html_content
+
+    def fetch_latest_10k(self, ticker: str) -> Optional[Tuple[dict, str]]:
+        """Find and download the latest 10-K. Returns (filing_info, html)."""
+        filing_info = self.find_latest_10k(ticker)
+        if not filing_info:
+            return None
         
-        # Save to file
-        output_file = FILINGS_DIR / f"{ticker}_10k.json"
+        html_content = self.fetch_10k_document(ticker, filing_info)
+        if not html_content:
+            return None
+        
+        return filing_info, html_content
+
+    def fetch_10k_history(self, ticker: str, years: int = FILING_YEARS) -> Iterator[Tuple[dict, str]]:
+        """Find and download the last N fiscal years of 10-Ks, newest first."""
+        for filing_info in self.find_10k_history(ticker, years=years):
+            html_content = self.fetch_10k_document(ticker, filing_info)
+            if html_content:
+                yield filing_info, html_content
+
+    def stored_accession_number(self, ticker: str, fiscal_year: Optional[str] = None) -> Optional[str]:
+        """Accession number of the filing saved on disk, read from the file head.
+
+        save_filing writes accession_number before the (large) sections, so
+        only the first few KB need to be read.
+        """
+        path = filing_path(ticker, fiscal_year)
+        if not path.exists():
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            head = f.read(4096)
+        match = re.search(r'"accession_number":\s*"([^"]+)"', head)
+        return match.group(1) if match else None
+
+    def save_filing(
+        self,
+        ticker: str,
+        filing_info: dict,
+        sections: dict,
+        tables: Optional[List[FinancialTable]] = None,
+    ) -> dict:
+        """Write a parsed filing (and its financial tables) to the filings directory, one file per fiscal year."""
+        company_info = TARGET_COMPANIES[ticker]
+        fiscal_year = infer_fiscal_year({**filing_info, "sections": sections})
+        output_file = filing_path(ticker, fiscal_year)
         result = {
             "ticker": ticker,
             "company_name": company_info["name"],
-            "cik": cik,
+            "cik": company_info["cik"],
+            "fiscal_year": fiscal_year,
             "filing_date": filing_info["filing_date"],
+            "report_date": filing_info.get("report_date", ""),
             "accession_number": filing_info["accession_number"],
             "sections": sections,
         }
@@ -197,23 +333,116 @@ class SECDownloader:
         with open(output_file, "w", encoding="utf-8") as f:
             json.dump(result, f, ensure_ascii=False, indent=2)
         
+        if tables is not None:
+            save_tables(ticker, fiscal_year, tables)
+        
         print(f"Saved to {output_file}")
         return result
 
-    def download_all_companies(self) -> list:
+    def download_company_10k(
+        self,
+        ticker: str,
+        force: bool = False,
+        filing_info: Optional[dict] = None,
+    ) -> Optional[dict]:
+        """Download and process a 10-K (default: the latest) for a specific company.
+
+        Unless force is set, a filing whose accession number is already on
+        disk is not fetched or re-parsed.
+        """
+        filing_info = filing_info or self.find_latest_10k(ticker)
+        if not filing_info:
+            return None
+        
+        stored = self.stored_accession_number(ticker, filing_info.get("fiscal_year"))
+        if not force and stored == filing_info["accession_number"]:
+            print(f"{ticker} 10-K {filing_info['accession_number']} already up to date")
+            return {
+                "ticker": ticker,
+                "fiscal_year": filing_info.get("fiscal_year"),
+                "filing_date": filing_info["filing_date"],
+                "accession_number": filing_info["accession_number"],
+                "unchanged": True,
+            }
+        
+        html_content = self.fetch_10k_document(ticker, filing_info)
+        if not html_content:
+            return None
+        
+        print("Parsing 10-K sections...")
+        sections, tables = self.parse_10k_document(html_content)
+        
+        return self.save_filing(ticker, filing_info, sections, tables)
+
+    def download_company_history(
+        self,
+        ticker: str,
+        years: int = FILING_YEARS,
+        force: bool = False,
+    ) -> List[dict]:
+        """Download and process the last N fiscal years of 10-Ks for a company."""
+        results = []
+        for filing_info in self.find_10k_history(ticker, years=years):
+            result = self.download_company_10k(ticker, force=force, filing_info=filing_info)
+            if result:
+                results.append(result)
+        return results
+
+    def download_all_companies(self, force: bool = False, years: int = FILING_YEARS) -> list:
         """Download 10-K filings for all target companies."""
         results = []
         for ticker in TARGET_COMPANIES:
             try:
-                result = self.download_company_10k(ticker)
-                if result:
-                    results.append(result)
+                results.extend(self.download_company_history(ticker, years=years, force=force))
                 time.sleep(0.5)  # Rate limiting
             except Exception as e:
                 print(f"Error processing {ticker}: {e}")
         return results
 
 
+def parse_10k_html(html_content: str) -> Tuple[dict, List[FinancialTable]]:
+    """Parse 10-K HTML into sections and financial tables.
+
+    Module-level so parsing can run in worker processes.
+    """
+    return SECDownloader().parse_10k_document(html_content)
+
+
+def _reparse_archived(entry: dict) -> str:
+    """Re-parse one archived filing and rewrite its JSON (worker process)."""
+    downloader = SECDownloader()
+    html_content = downloader.archive.load(entry["accession_number"])
+    sections, tables = downloader.parse_10k_document(html_content)
+    downloader.save_filing(entry["ticker"], entry, sections, tables)
+    return entry["ticker"]
+
+
+def reparse_archive(
+    tickers: Optional[List[str]] = None,
+    workers: int = INDEX_WORKERS,
+) -> List[str]:
+    """Re-run section extraction over the raw archive, offline, on all cores.
+
+    The latest archived filing of each company and fiscal year is re-parsed,
+    matching the per-year files download_company_history keeps on disk.
+    """
+    latest = {}
+    for entry in FilingArchive().entries():
+        ticker = entry.get("ticker")
+        if tickers and ticker not in tickers:
+            continue
+        # Entries archived before fiscal years were recorded are keyed by filing date
+        key = (ticker, entry.get("fiscal_year") or entry["filing_date"])
+        if key not in latest or entry["filing_date"] > latest[key]["filing_date"]:
+            latest[key] = entry
+    
+    if not latest:
+        return []
+    
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as executor:
+        return list(executor.map(_reparse_archived, latest.values()))
+
+
 def main():
     """Download all 10-K filings."""
     downloader = SECDownloader()
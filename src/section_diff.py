@@ -0,0 +1,245 @@
+"""Paragraph-level diff of a filing section between two fiscal years."""
+import bisect
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from src.compression import split_sentences
+from src.config import DIFF_MIN_WORDS, DIFF_MODIFIED_THRESHOLD, DIFF_SUMMARY_MAX_TOKENS
+from src.dedup import LSHIndex, MinHasher, normalize_for_hash
+from src.document_processor import SECTION_MAPPINGS
+from src.filing_store import list_filings, load_filing
+from src.tokens import count_tokens
+
+
+@dataclass
+class ParagraphChange:
+    """One changed paragraph: "added", "removed", "modified" or "moved" (unchanged text, new position)."""
+    kind: str
+    old_index: Optional[int] = None
+    new_index: Optional[int] = None
+    old_text: str = ""
+    new_text: str = ""
+    similarity: float = 1.0
+    added_sentences: List[str] = field(default_factory=list)
+    removed_sentences: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "old_index": self.old_index,
+            "new_index": self.new_index,
+            "old_text": self.old_text,
+            "new_text": self.new_text,
+            "similarity": round(self.similarity, 2),
+            "added_sentences": self.added_sentences,
+            "removed_sentences": self.removed_sentences,
+        }
+
+
+@dataclass
+class SectionDiff:
+    """Changes of one section between an old and a new filing."""
+    ticker: str
+    section_key: str
+    old_year: str
+    new_year: str
+    old_paragraphs: int
+    new_paragraphs: int
+    unchanged: int
+    changes: List[ParagraphChange]
+
+    def counts(self) -> Dict[str, int]:
+        counts = {"added": 0, "removed": 0, "modified": 0, "moved": 0}
+        for change in self.changes:
+            counts[change.kind] += 1
+        return counts
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "ticker": self.ticker,
+            "section_key": self.section_key,
+            "old_year": self.old_year,
+            "new_year": self.new_year,
+            "old_paragraphs": self.old_paragraphs,
+            "new_paragraphs": self.new_paragraphs,
+            "unchanged": self.unchanged,
+            "counts": self.counts(),
+            "changes": [change.to_dict() for change in self.changes],
+        }
+
+    def change_summary(self, max_tokens: int = DIFF_SUMMARY_MAX_TOKENS) -> str:
+        """Compact description of the changes for a prompt, most substantial first, within max_tokens."""
+        counts = self.counts()
+        lines = [
+            f"Changes in {SECTION_MAPPINGS.get(self.section_key, self.section_key)} "
+            f"from FY{self.old_year} to FY{self.new_year}: "
+            + ", ".join(f"{count} {kind}" for kind, count in counts.items())
+            + f" paragraphs ({self.unchanged} unchanged)."
+        ]
+        ranked = sorted(
+            (c for c in self.changes if c.kind != "moved"),
+            key=lambda c: ({"added": 0, "removed": 1, "modified": 2}[c.kind], c.similarity),
+        )
+        used = count_tokens(lines[0])
+        for change in ranked:
+            if change.kind == "added":
+                line = f"- Added: {_lead(change.new_text)}"
+            elif change.kind == "removed":
+                line = f"- Removed: {_lead(change.old_text)}"
+            else:
+                details = [f'new: "{_lead(s, 25)}"' for s in change.added_sentences[:2]]
+                details += [f'dropped: "{_lead(s, 25)}"' for s in change.removed_sentences[:2]]
+                line = f"- Modified: {_lead(change.new_text, 20)} ({'; '.join(details) or 'reworded'})"
+            tokens = count_tokens(line)
+            if used + tokens > max_tokens:
+                lines.append(f"- ... {len(ranked) - len(lines) + 1} more changes omitted")
+                break
+            lines.append(line)
+            used += tokens
+        return "\n".join(lines)
+
+
+def _lead(text: str, words: int = 40) -> str:
+    """The first words of a text."""
+    parts = text.split()
+    return " ".join(parts[:words]) + (" ..." if len(parts) > words else "")
+
+
+def split_paragraphs(text: str, min_words: int = DIFF_MIN_WORDS) -> List[str]:
+    """Paragraphs of stored section text: its lines, skipping page numbers and table-of-contents fragments."""
+    return [
+        line.strip() for line in text.split("\n")
+        if len(line.split()) >= min_words
+    ]
+
+
+def _increasing_run(values: List[int]) -> List[bool]:
+    """Mask of one longest strictly increasing subsequence of values (O(n log n))."""
+    tails: List[int] = []  # Smallest tail value of an increasing run of each length
+    tail_ids: List[int] = []
+    previous = [-1] * len(values)
+    for i, value in enumerate(values):
+        length = bisect.bisect_left(tails, value)
+        if length == len(tails):
+            tails.append(value)
+            tail_ids.append(i)
+        else:
+            tails[length] = value
+            tail_ids[length] = i
+        previous[i] = tail_ids[length - 1] if length else -1
+    keep = [False] * len(values)
+    i = tail_ids[-1] if tail_ids else -1
+    while i >= 0:
+        keep[i] = True
+        i = previous[i]
+    return keep
+
+
+def _sentence_changes(old: str, new: str) -> Tuple[List[str], List[str]]:
+    """Sentences only in new, and only in old (compared normalized)."""
+    old_sentences = {normalize_for_hash(s): s for s in split_sentences(old)}
+    new_sentences = {normalize_for_hash(s): s for s in split_sentences(new)}
+    added = [s for key, s in new_sentences.items() if key not in old_sentences]
+    removed = [s for key, s in old_sentences.items() if key not in new_sentences]
+    return added, removed
+
+
+def diff_paragraphs(
+    old: List[str],
+    new: List[str],
+    threshold: float = DIFF_MODIFIED_THRESHOLD,
+) -> Tuple[List[ParagraphChange], int]:
+    """Changes from old to new paragraphs, and how many paragraphs are unchanged.
+
+    Identical paragraphs (after normalization) are matched through a hash
+    map in one pass; matches that keep their relative order are unchanged,
+    the rest moved. The remaining paragraphs are paired by MinHash
+    similarity of word shingles (LSH candidates, best pairs first) as
+    modified; what is left is added or removed.
+    """
+    by_text: Dict[str, Deque[int]] = defaultdict(deque)
+    for i, paragraph in enumerate(old):
+        by_text[normalize_for_hash(paragraph)].append(i)
+    exact: List[Tuple[int, int]] = []
+    for j, paragraph in enumerate(new):
+        positions = by_text.get(normalize_for_hash(paragraph))
+        if positions:
+            exact.append((positions.popleft(), j))
+
+    changes: List[ParagraphChange] = []
+    in_order = _increasing_run([i for i, _ in exact])
+    for (i, j), kept in zip(exact, in_order):
+        if not kept:
+            changes.append(ParagraphChange("moved", i, j, old[i], new[j]))
+    unchanged = sum(in_order)
+
+    matched_old = {i for i, _ in exact}
+    matched_new = {j for _, j in exact}
+    old_left = [i for i in range(len(old)) if i not in matched_old]
+    new_left = [j for j in range(len(new)) if j not in matched_new]
+
+    # Reworded paragraphs: short shingles and many narrow bands, so candidate
+    # pairs are found well below the threshold and verified on the signatures
+    hasher = MinHasher(num_perm=64, shingle_size=3)
+    index = LSHIndex(num_perm=64, bands=32)
+    old_signatures = {}
+    for i in old_left:
+        old_signatures[index.insert(hasher.signature(old[i]))] = i
+    pairs = []
+    for j in new_left:
+        signature = hasher.signature(new[j])
+        for item_id in index.candidates(signature):
+            score = MinHasher.similarity(signature, index.signatures[item_id])
+            if score >= threshold:
+                pairs.append((score, old_signatures[item_id], j))
+    paired_old, paired_new = set(), set()
+    for score, i, j in sorted(pairs, key=lambda p: (-p[0], p[2], p[1])):
+        if i in paired_old or j in paired_new:
+            continue
+        paired_old.add(i)
+        paired_new.add(j)
+        added, removed = _sentence_changes(old[i], new[j])
+        changes.append(ParagraphChange("modified", i, j, old[i], new[j], score, added, removed))
+
+    changes.extend(ParagraphChange("removed", old_index=i, old_text=old[i], similarity=0.0)
+                   for i in old_left if i not in paired_old)
+    changes.extend(ParagraphChange("added", new_index=j, new_text=new[j], similarity=0.0)
+                   for j in new_left if j not in paired_new)
+    # Report in new-document order, removed paragraphs at their old position
+    changes.sort(key=lambda c: (c.new_index if c.new_index is not None else c.old_index, c.kind))
+    return changes, unchanged
+
+
+def diff_filing_section(
+    ticker: str,
+    section_key: str,
+    old_year: Optional[str] = None,
+    new_year: Optional[str] = None,
+) -> Optional[SectionDiff]:
+    """Diff a section of two stored filings of a company (default: its two latest years)."""
+    years = [year for _, year, _ in list_filings([ticker])]  # Newest first
+    new_year = str(new_year) if new_year else (years[0] if years else None)
+    if old_year is None:
+        older = [year for year in years if new_year and year < new_year]
+        old_year = older[0] if older else None
+    if not new_year or not old_year:
+        return None
+    old_filing = load_filing(ticker, old_year)
+    new_filing = load_filing(ticker, new_year)
+    if old_filing is None or new_filing is None:
+        return None
+
+    old = split_paragraphs(old_filing.get("sections", {}).get(section_key, ""))
+    new = split_paragraphs(new_filing.get("sections", {}).get(section_key, ""))
+    changes, unchanged = diff_paragraphs(old, new)
+    return SectionDiff(
+        ticker=ticker,
+        section_key=section_key,
+        old_year=str(old_year),
+        new_year=new_year,
+        old_paragraphs=len(old),
+        new_paragraphs=len(new),
+        unchanged=unchanged,
+        changes=changes,
+    )
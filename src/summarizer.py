@@ -0,0 +1,372 @@
+"""Offline map-reduce summaries of filing sections, used as compact generation context."""
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_openai import ChatOpenAI
+
+from src.compression import split_sentences
+from src.config import (
+    OPENAI_API_KEY, LLM_MODEL,
+    SUMMARIES_DIR, SUMMARY_WORKERS, SUMMARY_MAP_CHUNKS, SUMMARY_REDUCE_FANOUT,
+    SUMMARY_MAP_WORDS, SUMMARY_REDUCE_WORDS,
+)
+from src.document_processor import SECTION_MAPPINGS, DocumentProcessor, chunk_section
+from src.filing_store import list_filings, load_filing_file
+from src.tokens import count_tokens
+
+
+_TEXT_START = "TEXT:\n"
+_TEXT_END = "\nEND OF TEXT"
+_BLOCK_SEPARATOR = "\n\n---\n\n"  # Between the chunks or summaries of one call
+
+MAP_PROMPT = """Summarize this excerpt of {company}'s FY{fiscal_year} Form 10-K, {section}.
+Keep every figure, segment, product, market, risk and date it mentions. Write plain factual prose with no commentary, in at most {words} words.
+
+""" + _TEXT_START + "{text}" + _TEXT_END + "\n\nSummary:"
+
+REDUCE_PROMPT = """Combine these partial summaries of {company}'s FY{fiscal_year} Form 10-K, {section}, into one summary.
+Keep every figure and named item; merge repeated points. Write plain factual prose with no commentary, in at most {words} words.
+
+""" + _TEXT_START + "{text}" + _TEXT_END + "\n\nCombined summary:"
+
+SectionKey = Tuple[str, str, str]  # (ticker, fiscal_year, section_key)
+
+
+@dataclass
+class SectionSummary:
+    """Hierarchical summary of one filing section.
+
+    levels[0] summarizes consecutive groups of the section's index chunks;
+    each further level combines groups of the level below, and the last
+    level holds the single section summary.
+    """
+    ticker: str
+    fiscal_year: str
+    section_key: str
+    source_hash: str
+    levels: List[List[Optional[str]]] = field(default_factory=list)
+
+    @property
+    def complete(self) -> bool:
+        return bool(self.levels) and len(self.levels[-1]) == 1 and self.levels[-1][0] is not None
+
+    @property
+    def summary(self) -> str:
+        return self.levels[-1][0] if self.complete else ""
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "ticker": self.ticker,
+            "fiscal_year": self.fiscal_year,
+            "section_key": self.section_key,
+            "source_hash": self.source_hash,
+            "levels": self.levels,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SectionSummary":
+        return cls(
+            ticker=data["ticker"],
+            fiscal_year=data["fiscal_year"],
+            section_key=data["section_key"],
+            source_hash=data["source_hash"],
+            levels=data.get("levels", []),
+        )
+
+
+class SummaryStore:
+    """Section summaries on disk, one JSON file per (ticker, fiscal year, section).
+
+    Unfinished summaries are checkpointed to a ".partial.json" file next to
+    where the finished one will go; finished files replace it atomically.
+    """
+
+    def __init__(self, root: Path = SUMMARIES_DIR):
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _path(self, key: SectionKey, partial: bool = False) -> Path:
+        ticker, fiscal_year, section_key = key
+        suffix = ".partial.json" if partial else ".json"
+        return self.root / f"{ticker}_{fiscal_year}_{section_key}{suffix}"
+
+    def _read(self, path: Path) -> Optional[SectionSummary]:
+        if not path.exists():
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return SectionSummary.from_dict(json.load(f))
+
+    def _write(self, path: Path, summary: SectionSummary):
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(summary.to_dict(), f, indent=2)
+        os.replace(tmp_path, path)
+
+    def load(self, ticker: str, fiscal_year: str, section_key: str) -> Optional[SectionSummary]:
+        """The finished summary of a section, if one was built."""
+        return self._read(self._path((ticker, str(fiscal_year), section_key)))
+
+    def load_checkpoint(self, key: SectionKey) -> Optional[SectionSummary]:
+        return self._read(self._path(key, partial=True))
+
+    def checkpoint(self, summary: SectionSummary):
+        """Save an unfinished summary (safe to call from worker threads)."""
+        key = (summary.ticker, summary.fiscal_year, summary.section_key)
+        with self._lock:
+            self._write(self._path(key, partial=True), summary)
+
+    def save(self, summary: SectionSummary):
+        """Save a finished summary and drop its checkpoint."""
+        key = (summary.ticker, summary.fiscal_year, summary.section_key)
+        with self._lock:
+            self._write(self._path(key), summary)
+            self._path(key, partial=True).unlink(missing_ok=True)
+
+
+class ExtractiveSummaryLLM:
+    """Deterministic stand-in for the chat model: keeps the lead sentences of each input block.
+
+    Understands the map and reduce prompts of this module, so summaries can
+    be built offline and in tests without API calls.
+    """
+
+    def __init__(self, sentences_per_block: int = 2):
+        self.sentences_per_block = sentences_per_block
+
+    def invoke(self, messages: List[Any]) -> AIMessage:
+        prompt = messages[-1].content
+        text = prompt.split(_TEXT_START, 1)[-1].split(_TEXT_END, 1)[0]
+        kept = [
+            " ".join(split_sentences(block)[:self.sentences_per_block])
+            for block in text.split(_BLOCK_SEPARATOR) if block.strip()
+        ]
+        return AIMessage(content=" ".join(kept))
+
+
+@dataclass
+class SummaryJob:
+    """One filing section to summarize and its progress."""
+    key: SectionKey
+    company: str
+    section: str
+    chunks: List[str]
+    summary: SectionSummary
+
+
+@dataclass
+class SummarizeStats:
+    """Counters of one summarize run."""
+    sections: int = 0
+    already_done: int = 0
+    resumed: int = 0
+    empty: int = 0  # Sections that yield no chunks, so have nothing to summarize
+    llm_calls: int = 0
+    errors: int = 0
+    seconds: float = 0.0
+
+
+def source_hash(chunks: List[str], map_chunks: int, fanout: int) -> str:
+    """Identity of a section's input; a summary is rebuilt when its filing or grouping changes."""
+    digest = hashlib.sha1(f"{map_chunks}:{fanout}".encode("utf-8"))
+    for chunk in chunks:
+        digest.update(b"\0" + chunk.encode("utf-8"))
+    return digest.hexdigest()
+
+
+_source_hashes: Dict[Tuple[str, float, str, int, int], str] = {}
+_source_hashes_lock = threading.Lock()
+
+
+def section_source_hash(
+    ticker: str,
+    fiscal_year: str,
+    section_key: str,
+    map_chunks: int = SUMMARY_MAP_CHUNKS,
+    fanout: int = SUMMARY_REDUCE_FANOUT,
+) -> Optional[str]:
+    """source_hash of a stored filing section as it chunks now (None if the filing isn't stored).
+
+    Cached per filing file and modification time, so a re-download or a
+    change of chunking shows up while generation only chunks a filing once.
+    """
+    path = next((p for _, year, p in list_filings([ticker]) if year == str(fiscal_year)), None)
+    if path is None:
+        return None
+    key = (str(path), path.stat().st_mtime, section_key, map_chunks, fanout)
+    with _source_hashes_lock:
+        if key in _source_hashes:
+            return _source_hashes[key]
+    filing = load_filing_file(path)
+    content = dict(DocumentProcessor._iter_sections(filing)).get(section_key)
+    chunks = [doc.page_content for doc in chunk_section(filing, section_key, content)] if content else []
+    digest = source_hash(chunks, map_chunks, fanout)
+    with _source_hashes_lock:
+        _source_hashes[key] = digest
+    return digest
+
+
+class SectionSummarizer:
+    """Builds section summaries with map-reduce over the index chunks.
+
+    Map calls summarize SUMMARY_MAP_CHUNKS consecutive chunks; reduce calls
+    combine SUMMARY_REDUCE_FANOUT summaries at a time until one remains.
+    All sections advance level by level through one thread pool, so at most
+    `workers` LLM calls run at once. Every finished call is checkpointed,
+    and a rerun skips finished sections and resumes unfinished ones.
+    """
+
+    def __init__(
+        self,
+        llm: Optional[Any] = None,
+        store: Optional[SummaryStore] = None,
+        workers: int = SUMMARY_WORKERS,
+        map_chunks: int = SUMMARY_MAP_CHUNKS,
+        fanout: int = SUMMARY_REDUCE_FANOUT,
+    ):
+        if llm is None:
+            llm = ChatOpenAI(model=LLM_MODEL, openai_api_key=OPENAI_API_KEY, temperature=0)
+        self.llm = llm
+        self.store = store or SummaryStore()
+        self.workers = workers
+        self.map_chunks = map_chunks
+        self.fanout = fanout
+        self.stats = SummarizeStats()
+        self._stats_lock = threading.Lock()
+
+    def _jobs(
+        self,
+        tickers: Optional[List[str]],
+        sections: Optional[List[str]],
+        latest_only: bool,
+    ) -> List[SummaryJob]:
+        """Sections that still need work, with checkpoints restored."""
+        jobs = []
+        seen_tickers = set()
+        for ticker, fiscal_year, path in list_filings(tickers):
+            if latest_only and ticker in seen_tickers:
+                continue
+            seen_tickers.add(ticker)
+            filing = load_filing_file(path)
+            for section_key, content in DocumentProcessor._iter_sections(filing):
+                if sections and section_key not in sections:
+                    continue
+                self.stats.sections += 1
+                key = (ticker, fiscal_year, section_key)
+                chunks = [doc.page_content for doc in chunk_section(filing, section_key, content)]
+                if not chunks:
+                    self.stats.empty += 1
+                    continue
+                digest = source_hash(chunks, self.map_chunks, self.fanout)
+                done = self.store.load(*key)
+                if done is not None and done.source_hash == digest and done.complete:
+                    self.stats.already_done += 1
+                    continue
+                summary = self.store.load_checkpoint(key)
+                if summary is not None and summary.source_hash == digest:
+                    self.stats.resumed += 1
+                else:
+                    summary = SectionSummary(ticker, fiscal_year, section_key, digest)
+                jobs.append(SummaryJob(
+                    key=key,
+                    company=filing.get("company_name", ticker),
+                    section=SECTION_MAPPINGS[section_key],
+                    chunks=chunks,
+                    summary=summary,
+                ))
+        return jobs
+
+    def _inputs(self, job: SummaryJob, level: int) -> List[str]:
+        """Texts summarized by each call of a level."""
+        if level == 0:
+            size, below = self.map_chunks, job.chunks
+        else:
+            size, below = self.fanout, job.summary.levels[level - 1]
+        return [_BLOCK_SEPARATOR.join(below[i:i + size]) for i in range(0, len(below), size)]
+
+    def _call(self, job: SummaryJob, level: int, text: str) -> str:
+        template = MAP_PROMPT if level == 0 else REDUCE_PROMPT
+        prompt = template.format(
+            company=job.company, fiscal_year=job.key[1], section=job.section, text=text,
+            words=SUMMARY_MAP_WORDS if level == 0 else SUMMARY_REDUCE_WORDS,
+        )
+        response = self.llm.invoke([HumanMessage(content=prompt)])
+        with self._stats_lock:
+            self.stats.llm_calls += 1
+        return response.content.strip()
+
+    def run(
+        self,
+        tickers: Optional[List[str]] = None,
+        sections: Optional[List[str]] = None,
+        latest_only: bool = False,
+    ) -> SummarizeStats:
+        """Summarize every stored filing section (optionally only some tickers, sections, or latest years)."""
+        started = time.perf_counter()
+        self.stats = SummarizeStats()
+        pending = self._jobs(tickers, sections, latest_only)
+        level = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while pending:
+                futures = {}
+                empty = set()
+                for job in pending:
+                    inputs = self._inputs(job, level)
+                    if not inputs:
+                        # Nothing to combine at this level; the job could never finish
+                        print(f"Nothing to summarize for {' '.join(job.key)} at level {level}")
+                        empty.add(job.key)
+                        continue
+                    levels = job.summary.levels
+                    if len(levels) <= level or len(levels[level]) != len(inputs):
+                        del levels[level:]
+                        levels.append([None] * len(inputs))
+                    for i, text in enumerate(inputs):
+                        if levels[level][i] is None:
+                            futures[pool.submit(self._call, job, level, text)] = (job, i)
+                failed = set()
+                for future in as_completed(futures):
+                    job, i = futures[future]
+                    try:
+                        job.summary.levels[level][i] = future.result()
+                    except Exception as e:
+                        print(f"Summary call failed for {job.key}: {e}")
+                        failed.add(job.key)
+                        continue
+                    self.store.checkpoint(job.summary)
+
+                remaining = []
+                for job in pending:
+                    if job.key in empty:
+                        self.stats.empty += 1
+                    elif job.key in failed:
+                        self.stats.errors += 1
+                    elif job.summary.complete:
+                        self.store.save(job.summary)
+                        print(f"Summarized {' '.join(job.key)}: {len(job.chunks)} chunks, "
+                              f"{count_tokens(job.summary.summary)} summary tokens")
+                    else:
+                        remaining.append(job)
+                pending = remaining
+                level += 1
+        self.stats.seconds = time.perf_counter() - started
+        return self.stats
+
+
+_summary_store: Optional[SummaryStore] = None
+
+
+def get_summary_store() -> SummaryStore:
+    """Get the process-wide summary store."""
+    global _summary_store
+    if _summary_store is None:
+        _summary_store = SummaryStore()
+    return _summary_store
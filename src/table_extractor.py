@@ -0,0 +1,232 @@
+"""Extraction of financial tables from 10-K HTML into typed, label-indexed arrays."""
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from bs4 import BeautifulSoup, Tag
+
+from src.compression import fold_plural
+from src.dedup import normalize_for_hash
+
+
+_YEAR_RE = re.compile(r"\b(?:19|20)\d{2}\b")
+# One numeric cell value: "$ 1,234.5", "(12)", "12 %", or a dash for zero/none
+_VALUE_RE = re.compile(r"\$?\s*\(?\s*\$?\s*\d[\d,]*(?:\.\d+)?\s*\)?\s*%?|(?<!\w)[—–-](?!\w)")
+# Amount-like text that never appears in a period header row
+_AMOUNT_RE = re.compile(r"\$|\d,\d{3}")
+_SCALE_PATTERNS = [
+    (re.compile(r"(?i)in\s+billions"), 1e9),
+    (re.compile(r"(?i)in\s+millions"), 1e6),
+    (re.compile(r"(?i)in\s+thousands"), 1e3),
+]
+
+
+@dataclass
+class FinancialTable:
+    """One comparative financial table.
+
+    values[i, j] is row i in period j, normalized to absolute amounts
+    (scale already applied) except for per-share and percentage rows.
+    NaN marks a blank cell.
+    """
+    title: str
+    periods: List[str]
+    row_labels: List[str]
+    row_units: List[str]  # "USD", "USD/shares", "shares" or "%"
+    values: np.ndarray  # (rows, periods) float64
+    scale: float = 1.0
+
+    def to_dict(self) -> Dict:
+        return {
+            "title": self.title,
+            "periods": self.periods,
+            "row_labels": self.row_labels,
+            "row_units": self.row_units,
+            "values": [[None if np.isnan(v) else float(v) for v in row] for row in self.values],
+            "scale": self.scale,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "FinancialTable":
+        values = np.array(
+            [[np.nan if v is None else v for v in row] for row in data["values"]],
+            dtype=np.float64,
+        ).reshape(len(data["row_labels"]), len(data["periods"]))
+        return cls(
+            title=data["title"],
+            periods=data["periods"],
+            row_labels=data["row_labels"],
+            row_units=data["row_units"],
+            values=values,
+            scale=data.get("scale", 1.0),
+        )
+
+
+def _parse_number(token: str) -> float:
+    """Parse one numeric cell token; parentheses mean negative, dashes zero."""
+    token = token.strip()
+    if token in ("—", "–", "-"):
+        return 0.0
+    negative = "(" in token
+    number = float(re.sub(r"[^\d.]", "", token))
+    return -number if negative else number
+
+
+def _row_cells(row: Tag) -> List[str]:
+    """Non-empty cell texts of a row."""
+    cells = []
+    for cell in row.find_all(["td", "th"]):
+        text = cell.get_text(" ", strip=True).replace("\xa0", " ").strip()
+        if text:
+            cells.append(text)
+    return cells
+
+
+def _stated_scale(text: str) -> Optional[float]:
+    """Scale of an "(in millions)"-style units note, if the text has one."""
+    for pattern, scale in _SCALE_PATTERNS:
+        if pattern.search(text):
+            return scale
+    return None
+
+
+def _table_scale(table: Tag, context: str) -> float:
+    """Unit scale stated in the table or the text just before it."""
+    return _stated_scale(table.get_text(" ", strip=True)[:500] + " " + context) or 1.0
+
+
+def _preceding_text(table: Tag, limit: int = 8) -> List[str]:
+    """The few text fragments right before a table (its title, units note)."""
+    fragments = []
+    for text in table.find_all_previous(string=True, limit=limit * 4):
+        if text.find_parent("table") is not None:
+            break  # Reached the previous table
+        text = text.strip()
+        if text:
+            fragments.append(text)
+            if len(fragments) >= limit:
+                break
+    return fragments
+
+
+def _row_unit(label: str, tokens: List[str]) -> str:
+    lowered = label.lower()
+    if any(token.endswith("%") for token in tokens) or "percent" in lowered or "margin" in lowered:
+        return "%"
+    if "per share" in lowered or "per common share" in lowered:
+        return "USD/shares"
+    if "shares" in lowered:
+        return "shares"
+    return "USD"
+
+
+def extract_table(table: Tag) -> Optional[FinancialTable]:
+    """Convert one <table> into a FinancialTable, if it is a comparative numeric table."""
+    periods: List[str] = []
+    labels: List[str] = []
+    units: List[str] = []
+    rows: List[List[float]] = []
+
+    for row in table.find_all("tr"):
+        cells = _row_cells(row)
+        if not cells:
+            continue
+        if not rows:
+            # Header rows: the one listing the most years defines the period columns
+            text = " ".join(cells)
+            years = _YEAR_RE.findall(text)
+            if len(years) >= 2 and not _AMOUNT_RE.search(text):
+                if len(years) >= len(periods):
+                    periods = years
+                continue
+
+        label = cells[0]
+        if _VALUE_RE.fullmatch(label) or not re.search(r"[A-Za-z]", label):
+            continue
+        # "$", "%" and ")" are often cells of their own; rejoin before tokenizing
+        tokens = _VALUE_RE.findall(" ".join(cells[1:]))
+        tokens = [t for t in tokens if t.strip() not in ("", "$")]
+        if not periods or len(tokens) != len(periods):
+            continue
+        labels.append(label.rstrip(":").strip())
+        units.append(_row_unit(label, tokens))
+        rows.append([_parse_number(t) for t in tokens])
+
+    if len(rows) < 2 or not periods:
+        return None
+
+    fragments = _preceding_text(table)
+    scale = _table_scale(table, " ".join(fragments))
+    values = np.array(rows, dtype=np.float64)
+    # Monetary and share counts are stated in the table's scale; per-share and % are not
+    scaled = np.array([unit in ("USD", "shares") for unit in units])
+    values[scaled] *= scale
+    title = next(
+        (f for f in fragments if re.search(r"[A-Za-z]{3}", f) and _stated_scale(f) is None),
+        "",
+    )
+    return FinancialTable(
+        title=title[:200],
+        periods=periods,
+        row_labels=labels,
+        row_units=units,
+        values=values,
+        scale=scale,
+    )
+
+
+def extract_tables(soup: BeautifulSoup) -> List[FinancialTable]:
+    """Extract every comparative financial table from a parsed 10-K."""
+    tables = []
+    for table in soup.find_all("table"):
+        extracted = extract_table(table)
+        if extracted is not None:
+            tables.append(extracted)
+    return tables
+
+
+def normalize_label(label: str) -> str:
+    """Row label key: lowercase words only, plurals folded, so "Revenues" matches "revenue"."""
+    return " ".join(fold_plural(word) for word in normalize_for_hash(label).split())
+
+
+class FilingTables:
+    """The financial tables of one filing, indexed by normalized row label."""
+
+    def __init__(self, tables: List[FinancialTable]):
+        self.tables = tables
+        self._by_label: Dict[str, List[Tuple[int, int]]] = {}
+        for t, table in enumerate(tables):
+            for r, label in enumerate(table.row_labels):
+                self._by_label.setdefault(normalize_label(label), []).append((t, r))
+
+    def __len__(self) -> int:
+        return len(self.tables)
+
+    def _candidates(self, label: str) -> List[Tuple[int, int]]:
+        """Rows with exactly this label, else the shortest labels containing all its words."""
+        key = normalize_label(label)
+        if key in self._by_label:
+            return self._by_label[key]
+        words = set(key.split())
+        matches = [k for k in self._by_label if words and words <= set(k.split())]
+        matches.sort(key=len)
+        return [position for k in matches[:3] for position in self._by_label[k]]
+
+    def lookup(self, label: str, period: str) -> Optional[Tuple[float, str]]:
+        """(value, unit) of a row label in a period (e.g. "2024"), first table first."""
+        for t, r in self._candidates(label):
+            table = self.tables[t]
+            if period in table.periods:
+                value = table.values[r, table.periods.index(period)]
+                if not np.isnan(value):
+                    return float(value), table.row_units[r]
+        return None
+
+    def to_json(self) -> List[Dict]:
+        return [table.to_dict() for table in self.tables]
+
+    @classmethod
+    def from_json(cls, data: List[Dict]) -> "FilingTables":
+        return cls([FinancialTable.from_dict(table) for table in data])
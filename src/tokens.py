@@ -0,0 +1,39 @@
+"""Token counting shared by chunking and prompt budgeting."""
+from functools import lru_cache
+from typing import List
+
+import tiktoken
+
+from src.config import LLM_MODEL
+
+
+@lru_cache(maxsize=1)
+def get_encoding() -> tiktoken.Encoding:
+    """Get the tokenizer for the configured LLM (cl100k_base fallback)."""
+    try:
+        return tiktoken.encoding_for_model(LLM_MODEL)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens in a piece of text."""
+    if not text:
+        return 0
+    return len(get_encoding().encode_ordinary(text))
+
+
+def count_tokens_batch(texts: List[str]) -> List[int]:
+    """Count tokens for many texts in one tokenizer call."""
+    if not texts:
+        return []
+    return [len(ids) for ids in get_encoding().encode_ordinary_batch(texts)]
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Truncate text to at most max_tokens tokens."""
+    encoding = get_encoding()
+    ids = encoding.encode_ordinary(text)
+    if len(ids) <= max_tokens:
+        return text
+    return encoding.decode(ids[:max_tokens])
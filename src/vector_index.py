@@ -0,0 +1,191 @@
+"""Exact vector search restricted to (ticker, fiscal year, section) partitions."""
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+
+PartitionKey = Tuple[str, str, str]  # (ticker, fiscal_year, section_key)
+ChunkKey = Tuple[str, str, str, int]  # (ticker, fiscal_year, section_key, chunk_index)
+_NORM_BLOCK = 4096  # Rows reconstructed at a time to compute vector norms
+
+
+def chunk_key(metadata: Dict) -> Optional[ChunkKey]:
+    """Position of a chunk within its filing section, if its metadata records one."""
+    if metadata.get("chunk_index") is None:
+        return None
+    return (
+        metadata.get("ticker", ""),
+        str(metadata.get("fiscal_year", "")),
+        metadata.get("section_key", ""),
+        int(metadata["chunk_index"]),
+    )
+
+
+class PartitionedIndex:
+    """Row-partitioned view over a FAISS store's index.
+
+    Every chunk is assigned to the (ticker, fiscal_year, section_key)
+    partitions it belongs to (collapsed duplicates belong to every section they
+    appeared in). A filtered search runs on the store's own FAISS index with
+    an IDSelectorBatch of the matching partitions' rows, so "prior year
+    MD&A" only ranks that filing's chunks, and filters can't starve the top
+    k the way post-filtering a global search does. Vectors are not copied:
+    besides the metadata, the view holds one float32 norm per row, used to
+    report cosine similarities.
+
+    An adjacency table maps every chunk position (ticker, fiscal_year,
+    section_key, chunk_index) to its row, so a hit's neighbouring chunks are
+    a dict lookup rather than another search.
+    """
+
+    def __init__(self, store: FAISS):
+        self.store = store
+        self.size = store.index.ntotal
+        self.norms = np.zeros(self.size, dtype=np.float32)
+        for start in range(0, self.size, _NORM_BLOCK):
+            block = store.index.reconstruct_n(start, min(_NORM_BLOCK, self.size - start))
+            self.norms[start:start + len(block)] = np.linalg.norm(block, axis=1)
+        self.documents: List[Document] = [
+            store.docstore.search(store.index_to_docstore_id[row]) for row in range(self.size)
+        ]
+
+        partitions: Dict[PartitionKey, List[int]] = defaultdict(list)
+        self.chunk_rows: Dict[ChunkKey, int] = {}
+        for row, doc in enumerate(self.documents):
+            meta = doc.metadata
+            # A collapsed duplicate stands in at every position it appeared in
+            for location in meta.get("provenance") or [meta]:
+                key = chunk_key({**location, "ticker": meta.get("ticker", "")})
+                if key is not None:
+                    self.chunk_rows.setdefault(key, row)
+            section_keys = meta.get("section_keys") or [meta.get("section_key", "")]
+            for section_key in section_keys:
+                partitions[(meta.get("ticker", ""), str(meta.get("fiscal_year", "")), section_key)].append(row)
+        self.partitions: Dict[PartitionKey, np.ndarray] = {
+            key: np.asarray(rows, dtype=np.int64) for key, rows in partitions.items()
+        }
+
+    def fiscal_years(self, ticker: str) -> List[str]:
+        """Fiscal years indexed for a company, oldest first."""
+        return sorted({year for t, year, _ in self.partitions if t == ticker and year})
+
+    def neighbour_rows(self, key: ChunkKey, window: int) -> List[int]:
+        """Rows of the chunks within window positions of key (key's own row included), in section order."""
+        ticker, fiscal_year, section_key, index = key
+        rows = []
+        for position in range(index - window, index + window + 1):
+            row = self.chunk_rows.get((ticker, fiscal_year, section_key, position))
+            if row is not None:
+                rows.append(row)
+        return rows
+
+    def rows(
+        self,
+        ticker: Optional[str] = None,
+        fiscal_years: Optional[Iterable[str]] = None,
+        section: Optional[str] = None,
+    ) -> np.ndarray:
+        """Row ids of the partitions matching the filters."""
+        years = {str(y) for y in fiscal_years} if fiscal_years else None
+        selected = [
+            rows for (t, year, section_key), rows in self.partitions.items()
+            if (ticker is None or t == ticker)
+            and (years is None or year in years)
+            and (section is None or section_key == section)
+        ]
+        if not selected:
+            return np.zeros(0, dtype=np.int64)
+        # A collapsed chunk sits in several section partitions of the same year
+        return np.unique(np.concatenate(selected))
+
+    def search(
+        self,
+        query_vectors: np.ndarray,
+        k: int,
+        ticker: Optional[str] = None,
+        fiscal_years: Optional[Iterable[str]] = None,
+        section: Optional[str] = None,
+    ) -> List[List[Tuple[Document, float]]]:
+        """Top-k (document, cosine similarity) per query row, within the filters.
+
+        All query rows go to FAISS in one matrix search. OpenAI embeddings
+        are unit length, so the L2 ranking is the cosine ranking; the
+        similarity is reported as the score because it is comparable across
+        queries.
+        """
+        queries = np.atleast_2d(np.asarray(query_vectors, dtype=np.float32))
+        return self._search(queries, self.rows(ticker, fiscal_years, section), k)
+
+    def search_by_ticker(
+        self,
+        query_vectors: np.ndarray,
+        k: int,
+        tickers: List[str],
+        fiscal_years: Optional[Dict[str, Iterable[str]]] = None,
+        section: Optional[str] = None,
+    ) -> Dict[str, List[List[Tuple[Document, float]]]]:
+        """Top-k per query row for each ticker: one FAISS matrix search per ticker's partitions.
+
+        fiscal_years optionally maps each ticker to its own year filter.
+        """
+        queries = np.atleast_2d(np.asarray(query_vectors, dtype=np.float32))
+        return {
+            ticker: self._search(queries, self.rows(ticker, (fiscal_years or {}).get(ticker), section), k)
+            for ticker in tickers
+        }
+
+    def _search(self, queries: np.ndarray, rows: np.ndarray, k: int) -> List[List[Tuple[Document, float]]]:
+        """FAISS search of the query rows restricted to rows, as (document, cosine similarity), best first."""
+        if rows.size == 0 or k <= 0:
+            return [[] for _ in range(len(queries))]
+        k = min(k, rows.size)
+        params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(np.ascontiguousarray(rows, dtype=np.int64)))
+        distances, labels = self.store.index.search(queries, k, params=params)
+
+        # Inner products from the index's distances, then cosine similarities
+        query_norms = np.linalg.norm(queries, axis=1)[:, None]
+        found = labels >= 0
+        row_norms = self.norms[np.where(found, labels, 0)]
+        if self.store.index.metric_type == faiss.METRIC_INNER_PRODUCT:
+            dots = distances
+        else:
+            dots = (query_norms ** 2 + row_norms ** 2 - distances) / 2
+        scores = np.clip(dots / np.maximum(query_norms * row_norms, 1e-12), -1.0, 1.0)
+        order = np.argsort(np.where(found, -scores, np.inf), axis=1, kind="stable")
+        labels = np.take_along_axis(labels, order, axis=1)
+        scores = np.take_along_axis(scores, order, axis=1)
+
+        return [
+            [(self.documents[label], score) for label, score in zip(row_labels, row_scores) if label >= 0]
+            for row_labels, row_scores in zip(labels.tolist(), scores.tolist())
+        ]
+
+
+def fuse_results(per_query: List[List[Tuple[Document, float]]], k: int) -> List[Tuple[Document, float]]:
+    """Merge the rankings of several query variants: each chunk once, at its best similarity, top k."""
+    best: Dict[int, Tuple[Document, float]] = {}
+    for results in per_query:
+        for doc, score in results:
+            seen = best.get(id(doc))
+            if seen is None or score > seen[1]:
+                best[id(doc)] = (doc, score)
+    return sorted(best.values(), key=lambda item: -item[1])[:k]
+
+
+def adaptive_k(scores: List[float], min_k: int, min_score: float, max_gap: float) -> int:
+    """How many of the best-first scores to keep.
+
+    Results stop at the first score below min_score or after the first drop
+    of more than max_gap between neighbours (the rest are a different,
+    less related topic), but at least min_k are kept when available.
+    """
+    keep = 0
+    for i, score in enumerate(scores):
+        if score < min_score or (i and scores[i - 1] - score > max_gap):
+            break
+        keep = i + 1
+    return max(keep, min(min_k, len(scores)))
@@ -1,8 +1,26 @@
 """Year-over-year comparison and analysis logic."""
+import math
 import re
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, Iterable, List, Optional, Tuple
 from dataclasses import dataclass
 
+import numpy as np
+import pandas as pd
+
+from src.financial_facts import METRIC_CONCEPTS, CompanyFacts, resolve_metric
+
+_UNIT_SCALES = {"B": 1e9, "M": 1e6}
+# Scales a unitless amount may be stated in ("5,200" in millions), and the largest
+# current/prior ratio at which one is taken as the user's
+_IMPLIED_SCALES = (1.0, 1e3, 1e6, 1e9)
+_MAX_SCALE_RATIO = 10.0
+_TREND_THRESHOLD = 1.0  # % change beyond which a metric is trending up/down
+# "$1,234.5M", "(12)B", "-3.1%", "2 billion": the value forms parse_values matches directly
+_SIMPLE_VALUE_RE = re.compile(
+    r"\$?\s*(?P<open>\()?\s*\$?\s*(?P<number>-?\d[\d,]*(?:\.\d+)?)\s*(?P<close>\))?"
+    r"\s*(?P<unit>B|M|%|[Bb]illion|[Mm]illion)?$"
+)
+
 
 @dataclass
 class YoYMetric:
@@ -14,6 +32,93 @@ class YoYMetric:
     change_absolute: Optional[float]
     change_percent: Optional[float]
     trend: str  # "up", "down", "flat"
+    prior_source: str = "provided"  # "provided" by the user, "xbrl" company facts or a 10-K "table"
+    cagr: Optional[float] = None  # % per year over the series' full history (panel analysis)
+    peer_percentile: Optional[float] = None  # Rank among peers for the period, 0-100 (panel analysis)
+
+
+def yoy_changes(
+    current: np.ndarray, prior: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Elementwise absolute change, % change and trend of current vs. prior values.
+
+    Changes are NaN where the prior value is missing (NaN) or zero.
+    """
+    current = np.asarray(current, dtype=np.float64)
+    prior = np.asarray(prior, dtype=np.float64)
+    valid = ~np.isnan(prior) & (prior != 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change_abs = np.where(valid, current - prior, np.nan)
+        change_pct = np.where(valid, change_abs / np.abs(prior) * 100, np.nan)
+        trend = np.where(
+            change_pct > _TREND_THRESHOLD, "up",
+            np.where(change_pct < -_TREND_THRESHOLD, "down", "flat"),
+        )
+    return change_abs, change_pct, trend
+
+
+def parse_value(value_str: str) -> Tuple[float, str]:
+    """Parse a financial value string into number and unit."""
+    if not value_str:
+        return 0.0, ""
+    
+    value_str = str(value_str).strip()
+    
+    # Remove currency symbols
+    value_str = value_str.replace("$", "").replace(",", "")
+    
+    # Extract unit
+    unit = ""
+    if "billion" in value_str.lower() or value_str.endswith("B"):
+        unit = "B"
+        value_str = re.sub(r'[Bb]illion|[Bb]$', '', value_str)
+    elif "million" in value_str.lower() or value_str.endswith("M"):
+        unit = "M"
+        value_str = re.sub(r'[Mm]illion|[Mm]$', '', value_str)
+    elif "%" in value_str:
+        unit = "%"
+        value_str = value_str.replace("%", "")
+    
+    # Parse number
+    try:
+        # Handle negative values in parentheses
+        if "(" in value_str and ")" in value_str:
+            value_str = "-" + value_str.replace("(", "").replace(")", "")
+        value = float(value_str.strip())
+    except ValueError:
+        value = 0.0
+    
+    return value, unit
+
+
+def parse_values(values: Iterable[Any]) -> Tuple[np.ndarray, np.ndarray]:
+    """Batch parse_value: numbers and units ("B", "M", "%" or "") of many values.
+
+    Each distinct value is parsed once. Common forms ("$1,234.5M", "(12)B",
+    "24.7%", "3 billion") take a single regex match; anything else falls back
+    to parse_value.
+    """
+    codes, uniques = pd.factorize(pd.Series(list(values), dtype=object).fillna(""))
+    numbers = np.zeros(len(uniques), dtype=np.float64)
+    units = np.empty(len(uniques), dtype=object)
+    for i, value in enumerate(np.asarray(uniques, dtype=object).tolist()):
+        text = str(value).strip()
+        match = _SIMPLE_VALUE_RE.match(text)
+        if match and bool(match["open"]) == bool(match["close"]) and not (
+            match["open"] and match["number"].startswith("-")
+        ):
+            number = float(match["number"].replace(",", ""))
+            numbers[i] = -number if match["open"] else number
+            units[i] = match["unit"][0].upper() if match["unit"] else ""
+        else:
+            numbers[i], units[i] = parse_value(text)
+    return numbers[codes], units[codes].astype(str)
+
+
+def _optional(value: float, digits: int) -> Optional[float]:
+    """Round a float, mapping NaN to None."""
+    value = float(value)
+    return None if math.isnan(value) else round(value, digits)
 
 
 class YoYAnalyzer:
@@ -24,40 +129,60 @@ class YoYAnalyzer:
 
     def parse_value(self, value_str: str) -> Tuple[float, str]:
         """Parse a financial value string into number and unit."""
-        if not value_str:
-            return 0.0, ""
-        
-        value_str = str(value_str).strip()
-        
-        # Remove currency symbols
-        value_str = value_str.replace("$", "").replace(",", "")
-        
-        # Extract unit
-        unit = ""
-        if "billion" in value_str.lower() or value_str.endswith("B"):
-            unit = "B"
-            value_str = re.sub(r'[Bb]illion|[Bb]$', '', value_str)
-        elif "million" in value_str.lower() or value_str.endswith("M"):
-            unit = "M"
-            value_str = re.sub(r'[Mm]illion|[Mm]$', '', value_str)
-        elif "%" in value_str:
-            unit = "%"
-            value_str = value_str.replace("%", "")
-        
-        # Parse number
-        try:
-            # Handle negative values in parentheses
-            if "(" in value_str and ")" in value_str:
-                value_str = "-" + value_str.replace("(", "").replace(")", "")
-            value = float(value_str.strip())
-        except ValueError:
-            value = 0.0
-        
-        return value, unit
-
-    def analyze_data(self, financial_data: Dict[str, Any]) -> List[YoYMetric]:
-        """Analyze financial data for year-over-year changes."""
+        return parse_value(value_str)
+
+    def _prior_from_reported(
+        self,
+        metric_name: str,
+        current_value: float,
+        unit: str,
+        reported: Dict[str, Tuple[float, str]],
+    ) -> Optional[float]:
+        """Prior-year value of a metric from reported figures, in the user's unit.
+
+        Reported dollar amounts are in USD. When the user's value has no unit
+        ("5,200"), its scale is taken as the one that brings the reported
+        value closest to it, and the prior is skipped if none comes within
+        _MAX_SCALE_RATIO.
+        """
+        key = metric_name if metric_name in reported else resolve_metric(metric_name)
+        if key not in reported:
+            return None
+        value, reported_unit = reported[key]
+        if (unit == "%") != (reported_unit == "%"):
+            return None
+        if reported_unit == "USD":
+            if unit in _UNIT_SCALES:
+                value /= _UNIT_SCALES[unit]
+            else:
+                if not current_value or not value:
+                    return None
+                scale = min(
+                    _IMPLIED_SCALES,
+                    key=lambda s: abs(math.log10(abs(value / s / current_value))),
+                )
+                value /= scale
+                ratio = abs(value / current_value)
+                if max(ratio, 1 / ratio) > _MAX_SCALE_RATIO:
+                    return None
+        return round(value, 3)
+
+    def analyze_data(
+        self,
+        financial_data: Dict[str, Any],
+        prior_facts: Optional[Dict[str, Tuple[float, str]]] = None,
+        prior_table_values: Optional[Dict[str, Tuple[float, str]]] = None,
+    ) -> List[YoYMetric]:
+        """Analyze financial data for year-over-year changes.
+
+        Prior-year values the user didn't provide are filled in from reported
+        figures: prior_facts (metric -> (value, unit), see
+        FinancialStore.prior_year_metrics), then prior_table_values (metric
+        name -> (value, unit) from the prior 10-K's financial tables).
+        """
         self.metrics = []
+        prior_facts = prior_facts or {}
+        prior_table_values = prior_table_values or {}
         
         # Group current and prior year data
         current_data = {}
@@ -73,53 +198,79 @@ class YoYAnalyzer:
             else:
                 current_data[key] = value
         
-        # Calculate YoY for each metric
+        # Resolve current and prior values for each metric
+        rows = []
         for metric_name, current_value_str in current_data.items():
             current_val, unit = self.parse_value(current_value_str)
             
             prior_val = None
-            change_abs = None
-            change_pct = None
-            trend = "flat"
+            prior_source = "provided"
             
             if metric_name in prior_data:
                 prior_val, _ = self.parse_value(prior_data[metric_name])
-                
-                if prior_val != 0:
-                    change_abs = current_val - prior_val
-                    change_pct = ((current_val - prior_val) / abs(prior_val)) * 100
-                    
-                    if change_pct > 1:
-                        trend = "up"
-                    elif change_pct < -1:
-                        trend = "down"
-            
+            else:
+                prior_val = self._prior_from_reported(metric_name, current_val, unit, prior_facts)
+                prior_source = "xbrl"
+                if prior_val is None:
+                    prior_val = self._prior_from_reported(metric_name, current_val, unit, prior_table_values)
+                    prior_source = "table"
+                if prior_val is None:
+                    prior_source = "provided"
+            rows.append((metric_name, current_val, prior_val, unit, prior_source))
+        
+        if not rows:
+            return self.metrics
+        
+        # Calculate YoY for all metrics at once
+        currents = np.array([row[1] for row in rows], dtype=np.float64)
+        priors = np.array([np.nan if row[2] is None else row[2] for row in rows], dtype=np.float64)
+        change_abs, change_pct, trend = yoy_changes(currents, priors)
+        change_abs, change_pct, trend = change_abs.tolist(), change_pct.tolist(), trend.tolist()
+        
+        for i, (metric_name, current_val, prior_val, unit, prior_source) in enumerate(rows):
             self.metrics.append(YoYMetric(
                 name=metric_name,
                 current_value=current_val,
                 prior_value=prior_val,
                 unit=unit,
-                change_absolute=round(change_abs, 2) if change_abs is not None else None,
-                change_percent=round(change_pct, 1) if change_pct is not None else None,
-                trend=trend,
+                change_absolute=_optional(change_abs[i], 2),
+                change_percent=_optional(change_pct[i], 1),
+                trend=trend[i],
+                prior_source=prior_source,
             ))
         
         return self.metrics
 
+    def analyze_panel(
+        self,
+        analysis: "PanelAnalysis",
+        company: str,
+        period: Optional[str] = None,
+    ) -> List[YoYMetric]:
+        """Load one company's metrics from a panel analysis (latest period by default)."""
+        self.metrics = analysis.yoy_metrics(company, period)
+        return self.metrics
+
     def format_yoy_table(self) -> str:
         """Format YoY analysis as a markdown table."""
         if not self.metrics:
             return ""
         
+        show_cagr = any(m.cagr is not None for m in self.metrics)
+        show_peers = any(m.peer_percentile is not None for m in self.metrics)
+        
         table = "\n### Year-over-Year Analysis\n\n"
-        table += "| Metric | Current Year | Prior Year | Change | % Change | Trend |\n"
-        table += "|--------|--------------|------------|--------|----------|-------|\n"
+        table += "| Metric | Current Year | Prior Year | Change | % Change | Trend |"
+        table += " CAGR |" * show_cagr + " Peer Pctl |" * show_peers + "\n"
+        table += "|--------|--------------|------------|--------|----------|-------|"
+        table += "------|" * show_cagr + "-----------|" * show_peers + "\n"
         
         for m in self.metrics:
             current = f"{m.current_value:.1f}{m.unit}" if m.unit != "%" else f"{m.current_value:.1f}%"
             prior = f"{m.prior_value:.1f}{m.unit}" if m.prior_value is not None else "N/A"
             if m.unit == "%" and m.prior_value is not None:
                 prior = f"{m.prior_value:.1f}%"
+            prior += {"xbrl": "*", "table": "†"}.get(m.prior_source, "")
             
             change = f"{m.change_absolute:+.1f}{m.unit}" if m.change_absolute is not None else "N/A"
             if m.unit == "%":
@@ -129,7 +280,17 @@ class YoYAnalyzer:
             
             trend_icon = {"up": "📈", "down": "📉", "flat": "➡️"}.get(m.trend, "")
             
-            table += f"| {m.name} | {current} | {prior} | {change} | {pct_change} | {trend_icon} |\n"
+            table += f"| {m.name} | {current} | {prior} | {change} | {pct_change} | {trend_icon} |"
+            if show_cagr:
+                table += f" {m.cagr:+.1f}% |" if m.cagr is not None else " N/A |"
+            if show_peers:
+                table += f" {m.peer_percentile:.0f} |" if m.peer_percentile is not None else " N/A |"
+            table += "\n"
+        
+        if any(m.prior_source == "xbrl" for m in self.metrics):
+            table += "\n*Prior-year value as reported in the prior 10-K (XBRL company facts)\n"
+        if any(m.prior_source == "table" for m in self.metrics):
+            table += "\n†Prior-year value from the prior 10-K's financial tables\n"
         
         return table
 
@@ -177,7 +338,201 @@ class YoYAnalyzer:
                 "change_absolute": m.change_absolute,
                 "change_percent": m.change_percent,
                 "trend": m.trend,
+                "prior_source": m.prior_source,
+                "cagr": m.cagr,
+                "peer_percentile": m.peer_percentile,
             }
             for m in self.metrics
         ]
 
+
+@dataclass
+class MetricPanel:
+    """Financial metrics laid out as a (metrics, periods, companies) array.
+
+    Periods are ordered oldest first and NaN marks a missing value. Each
+    metric has one unit ("B", "M", "%" or "") shared by every company.
+    """
+    metrics: List[str]
+    periods: List[str]
+    companies: List[str]
+    units: List[str]
+    values: np.ndarray  # (metrics, periods, companies) float64
+
+    @classmethod
+    def from_records(cls, records: Iterable[Tuple[str, str, str, Any]]) -> "MetricPanel":
+        """Build a panel from (company, metric, period, value) rows.
+
+        Values may be numbers or strings like "$61.9B", "(1.2)M" or "24.7%",
+        all parsed in one vectorized pass. Monetary values are rescaled to
+        the metric's most common unit; later duplicates win.
+        """
+        frame = pd.DataFrame(list(records), columns=["company", "metric", "period", "value"])
+        numbers, units = parse_values(frame["value"])
+        numbers[frame["value"].isna().to_numpy()] = np.nan
+        frame = frame.assign(number=numbers, unit=units)
+
+        counts = frame.groupby(["metric", "unit"], sort=False).size().reset_index(name="rows")
+        metric_units = counts.sort_values("rows", kind="stable").drop_duplicates("metric", keep="last")
+        metric_units = metric_units.set_index("metric")["unit"]
+        target = frame["metric"].map(metric_units)
+        source_scale = frame["unit"].map(_UNIT_SCALES)
+        target_scale = target.map(_UNIT_SCALES)
+        factor = (source_scale / target_scale).fillna(1.0).to_numpy()
+
+        metrics = pd.Categorical(frame["metric"], categories=pd.unique(frame["metric"]))
+        periods = pd.Categorical(frame["period"].astype(str), categories=sorted(frame["period"].astype(str).unique()))
+        companies = pd.Categorical(frame["company"], categories=pd.unique(frame["company"]))
+        values = np.full((len(metrics.categories), len(periods.categories), len(companies.categories)), np.nan)
+        values[metrics.codes, periods.codes, companies.codes] = frame["number"].to_numpy() * factor
+        return cls(
+            metrics=list(metrics.categories),
+            periods=list(periods.categories),
+            companies=list(companies.categories),
+            units=[metric_units[m] for m in metrics.categories],
+            values=values,
+        )
+
+    @classmethod
+    def from_company_facts(
+        cls,
+        facts: Dict[str, CompanyFacts],
+        fiscal_years: Iterable[int],
+        metrics: Optional[List[str]] = None,
+    ) -> "MetricPanel":
+        """Build a panel of XBRL metrics (ticker -> CompanyFacts) for a range of fiscal years."""
+        metrics = metrics or list(METRIC_CONCEPTS)
+        years = sorted(int(y) for y in fiscal_years)
+        companies = list(facts)
+        values = np.full((len(metrics), len(years), len(companies)), np.nan)
+        reported_units: List[set] = [set() for _ in metrics]
+        for c, company in enumerate(companies):
+            for m, metric in enumerate(metrics):
+                for p, year in enumerate(years):
+                    found = facts[company].metric(metric, year)
+                    if found is not None:
+                        values[m, p, c] = found[0]
+                        reported_units[m].add(found[1])
+
+        units = []
+        for m, reported in enumerate(reported_units):
+            if reported == {"USD"}:
+                unit = "B" if np.nanmax(np.abs(values[m])) >= 1e9 else "M"
+                values[m] /= _UNIT_SCALES[unit]
+            else:
+                unit = ""  # Per-share amounts and share counts stay as reported
+            units.append(unit)
+        keep = [m for m, reported in enumerate(reported_units) if reported]
+        return cls(
+            metrics=[metrics[m] for m in keep],
+            periods=[str(y) for y in years],
+            companies=companies,
+            units=[units[m] for m in keep],
+            values=values[keep],
+        )
+
+    def add_margins(
+        self,
+        numerators: Optional[List[str]] = None,
+        denominator: str = "Revenue",
+    ) -> "MetricPanel":
+        """A panel with "<metric> Margin" rows (% of the denominator metric) appended.
+
+        By default every other monetary metric gets a margin row.
+        """
+        if denominator not in self.metrics:
+            return self
+        d = self.metrics.index(denominator)
+        if numerators is None:
+            numerators = [
+                m for m, unit in zip(self.metrics, self.units)
+                if m != denominator and unit in _UNIT_SCALES
+            ]
+        rows = [self.metrics.index(m) for m in numerators if m in self.metrics]
+        if not rows:
+            return self
+        # Bring numerators into the denominator's unit before dividing
+        scale = np.array([
+            _UNIT_SCALES.get(self.units[r], 1.0) / _UNIT_SCALES.get(self.units[d], 1.0) for r in rows
+        ])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            margins = self.values[rows] * scale[:, None, None] / self.values[d][None] * 100
+        margins[~np.isfinite(margins)] = np.nan
+        return MetricPanel(
+            metrics=self.metrics + [f"{self.metrics[r]} Margin" for r in rows],
+            periods=self.periods,
+            companies=self.companies,
+            units=self.units + ["%"] * len(rows),
+            values=np.concatenate([self.values, margins], axis=0),
+        )
+
+    def analyze(self) -> "PanelAnalysis":
+        """Compute YoY changes, CAGRs and peer percentiles for every series at once."""
+        prior = np.full_like(self.values, np.nan)
+        prior[:, 1:] = self.values[:, :-1]
+        change_abs, change_pct, trend = yoy_changes(self.values, prior)
+
+        # CAGR between each series' first and last reported periods
+        present = ~np.isnan(self.values)
+        first = np.argmax(present, axis=1)  # (metrics, companies)
+        last = self.values.shape[1] - 1 - np.argmax(present[:, ::-1], axis=1)
+        start = np.take_along_axis(self.values, first[:, None], axis=1)[:, 0]
+        end = np.take_along_axis(self.values, last[:, None], axis=1)[:, 0]
+        if all(p.isdigit() for p in self.periods):
+            positions = np.array([int(p) for p in self.periods])
+        else:
+            positions = np.arange(len(self.periods))
+        span = positions[last] - positions[first]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cagr = (np.power(end / start, 1.0 / span) - 1) * 100
+        # Growth rates need at least two years of positive values; not for % metrics
+        percent_rows = np.array([unit == "%" for unit in self.units])[:, None]
+        cagr[(span <= 0) | (start <= 0) | (end <= 0) | percent_rows | ~present.any(axis=1)] = np.nan
+
+        # Percentile rank of each company within its (metric, period) peer group
+        flat = self.values.reshape(-1, self.values.shape[2])
+        percentiles = pd.DataFrame(flat).rank(axis=1, pct=True).to_numpy() * 100
+        percentiles[(~np.isnan(flat)).sum(axis=1) < 2] = np.nan
+        return PanelAnalysis(
+            panel=self,
+            change_absolute=change_abs,
+            change_percent=change_pct,
+            trend=trend,
+            cagr=cagr,
+            peer_percentile=percentiles.reshape(self.values.shape),
+        )
+
+
+@dataclass
+class PanelAnalysis:
+    """Bulk YoY results for a MetricPanel; arrays share its (metrics, periods, companies) layout."""
+    panel: MetricPanel
+    change_absolute: np.ndarray
+    change_percent: np.ndarray
+    trend: np.ndarray
+    cagr: np.ndarray  # (metrics, companies), % per year
+    peer_percentile: np.ndarray
+
+    def yoy_metrics(self, company: str, period: Optional[str] = None) -> List[YoYMetric]:
+        """YoYMetric rows of one company for a period (latest by default)."""
+        panel = self.panel
+        c = panel.companies.index(company)
+        p = panel.periods.index(str(period)) if period is not None else len(panel.periods) - 1
+        metrics = []
+        for m, name in enumerate(panel.metrics):
+            current = panel.values[m, p, c]
+            if np.isnan(current):
+                continue
+            prior = panel.values[m, p - 1, c] if p > 0 else np.nan
+            metrics.append(YoYMetric(
+                name=name,
+                current_value=float(current),
+                prior_value=_optional(prior, 3),
+                unit=panel.units[m],
+                change_absolute=_optional(self.change_absolute[m, p, c], 2),
+                change_percent=_optional(self.change_percent[m, p, c], 1),
+                trend=str(self.trend[m, p, c]),
+                cagr=_optional(self.cagr[m, c], 1),
+                peer_percentile=_optional(self.peer_percentile[m, p, c], 0),
+            ))
+        return metrics
@@ -0,0 +1,16 @@
+"""Prompt budget split between user data and retrieved context."""
+from src.compression import context_overflow, user_input_budget
+
+
+def test_user_budget_never_exceeds_what_the_prompt_cap_leaves():
+    assert user_input_budget(5000, 12000, 3000) == 3000
+    assert user_input_budget(11000, 12000, 3000) == 1000
+    assert user_input_budget(12500, 12000, 3000) == 0
+
+
+def test_context_gives_up_tokens_for_the_user_reserve():
+    assert context_overflow(5000, 4000, 12000, 3000) == 0
+    assert context_overflow(11500, 4000, 12000, 3000) == 250
+    assert context_overflow(12500, 4000, 12000, 3000) == 1250
+    # Small user data only reserves what it needs
+    assert context_overflow(11900, 50, 12000, 3000) == 0
@@ -0,0 +1,35 @@
+"""Local intent routing: request forms go to their intent, questions that merely mention them go to chat."""
+import pytest
+
+from src.intent_router import IntentRouter
+
+
+@pytest.fixture(scope="module")
+def router():
+    return IntentRouter()
+
+
+@pytest.mark.parametrize("turn, intent", [
+    ("show the sources again", "sources"),
+    ("what are your sources", "sources"),
+    ("which sources did you use", "sources"),
+    ("what's my confidence", "confidence"),
+    ("How confident are you?", "confidence"),
+    ("show the confidence score", "confidence"),
+    ("save the audit log", "audit"),
+    ("switch to MSFT", "switch"),
+    ("start over", "reset"),
+])
+def test_requests(router, turn, intent):
+    assert router.classify(turn).name == intent
+
+
+@pytest.mark.parametrize("turn", [
+    "What are the main sources of revenue for NVIDIA?",
+    "Which sources of liquidity does the company rely on?",
+    "what is the confidence interval on revenue growth",
+    "I am not confident the revenue number is right",
+    "Is the audit log compliant?",
+])
+def test_mentions_are_chat(router, turn):
+    assert router.classify(turn).name == "chat"
@@ -0,0 +1,109 @@
+"""Offline map-reduce section summaries with the deterministic extractive LLM."""
+import json
+import os
+
+import pytest
+
+import src.filing_store as filing_store
+from src.summarizer import ExtractiveSummaryLLM, SectionSummarizer, SummaryStore, section_source_hash
+
+PARAGRAPH = (
+    "Segment {i} revenue grew {i} percent on higher volume in the period. "
+    "Management expects pricing and mix to support margins in segment {i}. "
+    "The segment faces competition from regional and global beverage companies. "
+)
+
+
+@pytest.fixture
+def filings(tmp_path, monkeypatch):
+    """A one-filing store with a long Business section and a blank Risk Factors section."""
+    monkeypatch.setattr(filing_store, "FILINGS_DIR", tmp_path)
+    business = "\n\n".join(PARAGRAPH.format(i=i) * 6 for i in range(12))
+    filing = {
+        "ticker": "KO",
+        "company_name": "The Coca-Cola Company",
+        "cik": "0000021344",
+        "filing_date": "2025-02-20",
+        "fiscal_year": "2024",
+        "sections": {"item_1_business": business, "item_1a_risk_factors": " " * 150},
+    }
+    (tmp_path / "KO_2024_10k.json").write_text(json.dumps(filing), encoding="utf-8")
+    return tmp_path
+
+
+class FailingOnce(ExtractiveSummaryLLM):
+    """Raises on one chosen call, then behaves like ExtractiveSummaryLLM."""
+
+    def __init__(self, fail_on: int):
+        super().__init__()
+        self.calls = 0
+        self.fail_on = fail_on
+
+    def invoke(self, messages):
+        self.calls += 1
+        if self.calls == self.fail_on:
+            raise RuntimeError("rate limited")
+        return super().invoke(messages)
+
+
+def _summarizer(store, llm=None):
+    return SectionSummarizer(llm=llm or ExtractiveSummaryLLM(), store=store, workers=1, map_chunks=2, fanout=2)
+
+
+def test_levels_reduce_to_one_summary(filings, tmp_path):
+    store = SummaryStore(tmp_path / "summaries")
+    stats = _summarizer(store).run(["KO"])
+    summary = store.load("KO", "2024", "item_1_business")
+
+    assert summary is not None and summary.complete
+    sizes = [len(level) for level in summary.levels]
+    assert sizes[-1] == 1 and sizes[0] > 1
+    assert all(above == -(-below // 2) for below, above in zip(sizes, sizes[1:]))
+    assert stats.llm_calls == sum(sizes)
+    assert summary.summary.startswith("Segment 0 revenue grew")
+
+
+def test_blank_section_is_skipped(filings, tmp_path):
+    stats = _summarizer(SummaryStore(tmp_path / "summaries")).run(["KO"])
+    assert stats.sections == 2
+    assert stats.empty == 1
+    assert stats.errors == 0
+
+
+def test_rerun_is_already_done(filings, tmp_path):
+    store = SummaryStore(tmp_path / "summaries")
+    _summarizer(store).run(["KO"])
+    stats = _summarizer(store).run(["KO"])
+    assert stats.already_done == 1
+    assert stats.llm_calls == 0
+
+
+def test_resume_reissues_only_failed_calls(filings, tmp_path):
+    full = _summarizer(SummaryStore(tmp_path / "full")).run(["KO"])
+
+    store = SummaryStore(tmp_path / "summaries")
+    failed = _summarizer(store, FailingOnce(fail_on=2)).run(["KO"])
+    assert failed.errors == 1
+    assert store.load("KO", "2024", "item_1_business") is None
+
+    resumed = _summarizer(store).run(["KO"])
+    assert resumed.resumed == 1
+    assert failed.llm_calls + resumed.llm_calls == full.llm_calls
+    assert store.load("KO", "2024", "item_1_business").summary == (
+        SummaryStore(tmp_path / "full").load("KO", "2024", "item_1_business").summary
+    )
+
+
+def test_source_hash_detects_a_changed_filing(filings, tmp_path):
+    store = SummaryStore(tmp_path / "summaries")
+    SectionSummarizer(llm=ExtractiveSummaryLLM(), store=store, workers=1).run(["KO"])
+    summary = store.load("KO", "2024", "item_1_business")
+    assert section_source_hash("KO", "2024", "item_1_business") == summary.source_hash
+
+    path = tmp_path / "KO_2024_10k.json"
+    filing = json.loads(path.read_text(encoding="utf-8"))
+    filing["sections"]["item_1_business"] += "\n\nThe company completed an acquisition in the year."
+    path.write_text(json.dumps(filing), encoding="utf-8")
+    os.utime(path, (os.path.getatime(path), os.path.getmtime(path) + 10))
+    assert section_source_hash("KO", "2024", "item_1_business") != summary.source_hash
+    assert section_source_hash("KO", "2025", "item_1_business") is None
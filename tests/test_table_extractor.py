@@ -0,0 +1,36 @@
+"""Prior-year row lookups in extracted 10-K financial tables."""
+from bs4 import BeautifulSoup
+
+from src.table_extractor import FilingTables, extract_tables
+
+STATEMENT = """<html><body>
+<p>CONSOLIDATED STATEMENTS OF INCOME</p>
+<p>(In millions except per share data)</p>
+<table>
+<tr><td>Year Ended December 31,</td></tr>
+<tr><td></td><td>2024</td><td></td><td>2023</td></tr>
+<tr><td>Revenues</td><td>$</td><td>47,061</td><td>$</td><td>45,754</td></tr>
+<tr><td>Cost of goods sold</td><td>$</td><td>18,324</td><td>$</td><td>18,520</td></tr>
+<tr><td>Selling, general and administrative expenses</td><td>$</td><td>13,972</td><td>$</td><td>13,231</td></tr>
+<tr><td>Diluted net income per share</td><td>$</td><td>2.46</td><td>$</td><td>2.47</td></tr>
+</table>
+</body></html>"""
+
+
+def _tables() -> FilingTables:
+    tables = FilingTables(extract_tables(BeautifulSoup(STATEMENT, "lxml")))
+    return FilingTables.from_json(tables.to_json())
+
+
+def test_singular_metric_matches_plural_row_label():
+    assert _tables().lookup("revenue", "2024") == (47061e6, "USD")
+    assert _tables().lookup("Revenues", "2023") == (45754e6, "USD")
+
+
+def test_partial_label_matches_plural_words():
+    assert _tables().lookup("SG&A expense", "2023") is None
+    assert _tables().lookup("general and administrative expense", "2023") == (13231e6, "USD")
+
+
+def test_per_share_row_is_not_scaled():
+    assert _tables().lookup("diluted net income per share", "2024") == (2.46, "USD/shares")
@@ -0,0 +1,59 @@
+"""Prior-year values filled from XBRL company facts (fixture JSON)."""
+from pathlib import Path
+
+import pytest
+
+from src.financial_facts import FinancialStore
+from src.yoy_analysis import YoYAnalyzer
+
+FIXTURE = Path(__file__).parent / "fixtures" / "companyfacts_sample.json"
+CIK = "0000021344"
+
+
+@pytest.fixture
+def prior_facts(tmp_path):
+    store = FinancialStore(tmp_path)
+    store.ingest_file(FIXTURE, CIK)
+    return store.prior_year_metrics(CIK, "2024")
+
+
+def _metric(data, prior_facts):
+    metrics = YoYAnalyzer().analyze_data(data, prior_facts=prior_facts)
+    assert len(metrics) == 1
+    return metrics[0]
+
+
+def test_prior_year_metrics_from_fixture(prior_facts):
+    assert prior_facts["Revenue"] == (45754000000.0, "USD")
+    assert prior_facts["Net Income"] == (10714000000.0, "USD")
+    assert prior_facts["Diluted EPS"] == (2.47, "USD/shares")
+
+
+def test_prior_in_users_unit(prior_facts):
+    metric = _metric({"Net income": "$10.6B"}, prior_facts)
+    assert metric.prior_value == pytest.approx(10.714)
+    assert metric.prior_source == "xbrl"
+    assert metric.change_percent == -1.1
+
+
+def test_unitless_value_takes_scale_of_prior(prior_facts):
+    metric = _metric({"Net income": "10,631"}, prior_facts)
+    assert metric.prior_value == pytest.approx(10714.0)
+    assert metric.change_percent == -0.8
+
+
+def test_unitless_value_in_millions_against_raw_usd():
+    metric = _metric({"Net income": "5200"}, {"Net Income": (4.8e9, "USD")})
+    assert metric.prior_value == pytest.approx(4800.0)
+    assert metric.change_percent == pytest.approx(8.3)
+
+
+def test_unitless_value_without_plausible_scale_gets_no_prior(prior_facts):
+    metric = _metric({"Revenue": "470"}, prior_facts)
+    assert metric.prior_value is None
+    assert metric.change_percent is None
+
+
+def test_per_share_prior_is_not_scaled(prior_facts):
+    metric = _metric({"Diluted EPS": "2.46"}, prior_facts)
+    assert metric.prior_value == pytest.approx(2.47)